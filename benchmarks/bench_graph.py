@@ -0,0 +1,204 @@
+"""End-to-end benchmark of the agent graph with the recorded scraper and OpenAI responses.
+
+The full graph runs for 1, 10 and 100 tickers with the offline stand-ins (see benchmarks/stand_ins.py), no network
+is used. For every scenario it reports the p50/p95 ticker latency, the total time, the peak memory, the event loop
+blocking time and the tokens per report. With `--check`, the checked metrics are compared to the baseline
+(benchmarks/baseline.json) and the benchmark fails if any of them regressed more than the tolerance. The event loop
+blocking time depends mostly on the speed of the machine, it is reported but not checked.
+
+Run with `uv run python -m benchmarks.bench_graph [--check | --update-baseline]`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+# the local Actor storage is used for the reports, keep it out of the project storage
+os.environ.setdefault('CRAWLEE_STORAGE_DIR', tempfile.mkdtemp(prefix='bench-graph-'))
+
+from apify import Actor
+
+import src.compaction
+import src.symbols
+import src.tools
+from benchmarks.stand_ins import ReplayChatModel, ScraperReplay, load_fixtures
+from src.batching import DEFAULT_WINDOW_SECS
+from src.graph import build_compiled_graph
+from src.llm import ChatOpenAISingleton
+from src.main import DEFAULT_MAX_CONCURRENCY
+from src.runner import run_tickers
+from src.symbols import StockIdResolver, StockIdResolverSingleton
+from src.telemetry import Telemetry, TelemetrySingleton
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+SCENARIOS = (1, 10, 100)
+DEFAULT_TIME_SCALE = 0.001
+DEFAULT_TOLERANCE = 0.5
+# metrics checked against the baseline, lower is better, the blocking time is machine noise
+CHECKED_METRICS = ('p95_latency_secs', 'peak_memory_mb', 'tokens_per_report')
+BLOCKING_CHECK_INTERVAL_SECS = 0.001
+BLOCKING_THRESHOLD_SECS = 0.005
+
+
+class LoopBlockingMonitor:
+    """Measure the time the event loop was blocked, from the lag of a periodic wake-up."""
+
+    def __init__(self) -> None:
+        self.blocking_secs = 0.0
+        self.max_blocking_secs = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(BLOCKING_CHECK_INTERVAL_SECS)
+            lag = time.perf_counter() - start - BLOCKING_CHECK_INTERVAL_SECS
+            if lag > BLOCKING_THRESHOLD_SECS:
+                self.blocking_secs += lag
+                self.max_blocking_secs = max(self.max_blocking_secs, lag)
+
+    def start(self) -> None:
+        """Start the monitoring."""
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop the monitoring."""
+        if self._task is not None:
+            self._task.cancel()
+
+
+def get_tickers(count: int) -> list[str]:
+    """Get the synthetic ticker symbols.
+
+    Returns:
+        list[str]: Ticker symbols.
+    """
+    return [f'BM{i:03d}' for i in range(count)]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Get the percentile with the linear interpolation.
+
+    Returns:
+        float: Percentile of the values.
+    """
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[round(fraction * 100) - 1]
+
+
+async def run_scenario(ticker_count: int, fixtures: dict, *, time_scale: float) -> dict[str, float]:
+    """Run the graph for the tickers with the stand-ins.
+
+    Returns:
+        dict[str, float]: Scenario metrics.
+
+    Raises:
+        RuntimeError: If any of the tickers failed, the metrics of a failed run are not comparable.
+    """
+    tickers = get_tickers(ticker_count)
+    scrapers = ScraperReplay(fixtures, time_scale=time_scale)
+    src.tools.run_actor_get_default_dataset = scrapers.run_actor_get_default_dataset
+    src.tools.iterate_actor_default_dataset = scrapers.iterate_actor_default_dataset
+    src.symbols.run_actor_get_default_dataset = scrapers.run_actor_get_default_dataset
+    # the stock details batching window is scaled with the recorded latencies to keep their proportion
+    src.tools._stock_details_coalescer.window_secs = DEFAULT_WINDOW_SECS * time_scale  # noqa: SLF001
+    StockIdResolverSingleton._instance = StockIdResolver(seed={ticker: f'{ticker}:NASDAQ' for ticker in tickers})  # noqa: SLF001
+    ChatOpenAISingleton._default_model = 'replay'  # noqa: SLF001
+    ChatOpenAISingleton._instances['replay'] = ReplayChatModel(fixtures=fixtures, time_scale=time_scale)  # type: ignore[assignment]  # noqa: SLF001
+    ChatOpenAISingleton._react_agents.clear()  # noqa: SLF001
+    ChatOpenAISingleton._structured_runnables.clear()  # noqa: SLF001
+    telemetry = TelemetrySingleton._instance = Telemetry([])  # noqa: SLF001
+    graph = build_compiled_graph()
+
+    monitor = LoopBlockingMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    results = await run_tickers(graph, tickers, max_concurrency=DEFAULT_MAX_CONCURRENCY, compare_peers=True)
+    total_secs = time.perf_counter() - start
+    monitor.stop()
+
+    failed = [result.ticker for result in results if result.error is not None]
+    if failed:
+        msg = f'Benchmark run failed for tickers: {", ".join(failed)}'
+        raise RuntimeError(msg)
+
+    latencies = sorted(span.duration_secs or 0.0 for span in telemetry.spans if span.kind == 'ticker')
+    llm_spans = [span for span in telemetry.spans if span.kind == 'llm']
+    tokens = sum(span.attributes['prompt_tokens'] + span.attributes['completion_tokens'] for span in llm_spans)
+    return {
+        'tickers': ticker_count,
+        'total_secs': round(total_secs, 3),
+        'p50_latency_secs': round(percentile(latencies, 0.5), 4),
+        'p95_latency_secs': round(percentile(latencies, 0.95), 4),
+        # peak RSS of the process, the scenarios run from the smallest, so it is the peak of the scenario
+        'peak_memory_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        'blocking_secs': round(monitor.blocking_secs, 4),
+        'max_blocking_ms': round(monitor.max_blocking_secs * 1e3, 2),
+        'tokens_per_report': round(tokens / len(results)),
+        'scraper_runs': scrapers.runs,
+    }
+
+
+def check_regressions(metrics: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Compare the metrics to the baseline.
+
+    Returns:
+        list[str]: Descriptions of the regressions.
+    """
+    regressions = []
+    for scenario, scenario_metrics in metrics.items():
+        for name in CHECKED_METRICS:
+            if (expected := baseline.get(scenario, {}).get(name)) is None:
+                continue
+            # small absolute values (for example no blocking at all) are noise
+            if scenario_metrics[name] > max(expected * (1 + tolerance), expected + 0.01):
+                regressions.append(f'{scenario} tickers: {name} {scenario_metrics[name]} > baseline {expected}')
+    return regressions
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    """Run the benchmark scenarios and check the regressions."""
+    fixtures = load_fixtures()
+    metrics: dict[str, dict] = {}
+    async with Actor:
+        for ticker_count in args.tickers:
+            metrics[str(ticker_count)] = await run_scenario(ticker_count, fixtures, time_scale=args.time_scale)
+            print(json.dumps(metrics[str(ticker_count)]))
+
+        if args.update_baseline:
+            BASELINE_PATH.write_text(json.dumps(metrics, indent=2) + '\n', encoding='utf-8')
+            print(f'Baseline updated: {BASELINE_PATH}')
+
+        if args.check:
+            baseline = json.loads(BASELINE_PATH.read_text(encoding='utf-8'))
+            if regressions := check_regressions(metrics, baseline, args.tolerance):
+                print('\n'.join(['Performance regressions:', *regressions]))
+                await Actor.exit(exit_code=1)
+            print('No performance regressions.')
+
+
+async def main() -> None:
+    """Run the benchmark scenarios."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, nargs='+', default=list(SCENARIOS), help='Ticker counts to run.')
+    parser.add_argument('--time-scale', type=float, default=DEFAULT_TIME_SCALE, help='Scale of recorded latencies.')
+    parser.add_argument('--check', action='store_true', help='Fail if the metrics regressed against the baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed relative regression.')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the metrics as the new baseline.')
+    args = parser.parse_args()
+
+    # the tokenizer encoding is downloaded on first use, the estimate keeps the token counts offline and comparable
+    with mock.patch.object(src.compaction, '_get_encoding', return_value=None):
+        await run_benchmark(args)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
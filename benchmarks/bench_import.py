@@ -0,0 +1,186 @@
+"""Cold-start import time benchmark of the Actor entry point.
+
+The entry point module is imported in fresh interpreters with `-X importtime` and the cumulative import time
+is parsed from its output. It reports the median import time and the slowest modules. The Apify SDK, the only
+heavy import of the entry point, is imported alone in the same runs as the reference, so the ratio of the two
+medians does not depend on the speed of the machine. With `--check`, the ratio is compared to the baseline
+(benchmarks/import_baseline.json) and the benchmark fails if it regressed more than the tolerance, or if any of
+the heavy agent modules is imported eagerly again.
+
+Run with `uv run python -m benchmarks.bench_import [--check | --update-baseline]`.
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess  # noqa: S404 - the fresh interpreters measure the cold import time
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).parent / 'import_baseline.json'
+ENTRY_MODULE = 'src.main'
+REFERENCE_MODULE = 'apify'
+DEFAULT_RUNS = 5
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_TOP = 15
+# modules imported only once the input is validated, see src/main.py
+LAZY_MODULES = (
+    'langgraph',
+    'langchain_openai',
+    'langchain_community',
+    'openai',
+    'src.agents',
+    'src.graph',
+    'src.tools',
+)
+
+_IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+@dataclass
+class ImportTime:
+    """Import time of a module, as reported by `-X importtime`."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(output: str) -> list[ImportTime]:
+    """Parse the `-X importtime` output.
+
+    Args:
+        output (str): Standard error output of the interpreter.
+
+    Returns:
+        list[ImportTime]: Import times of the modules in the import order.
+    """
+    import_times = []
+    for line in output.splitlines():
+        if match := _IMPORT_TIME_PATTERN.match(line):
+            self_us, cumulative_us, indent, module = match.groups()
+            import_times.append(ImportTime(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return import_times
+
+
+def measure_import(module: str) -> list[ImportTime]:
+    """Import the module in a fresh interpreter.
+
+    Returns:
+        list[ImportTime]: Import times of all the imported modules.
+    """
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    return parse_import_times(completed.stderr)
+
+
+def get_cumulative_ms(import_times: list[ImportTime], module: str) -> float:
+    """Get the cumulative import time of the module.
+
+    Returns:
+        float: Import time in milliseconds, including the modules it imported.
+    """
+    return next(item.cumulative_us for item in import_times if item.module == module) / 1e3
+
+
+def run_benchmark(runs: int) -> tuple[dict[str, float], list[ImportTime]]:
+    """Measure the entry point import time and the reference import time, the runs are interleaved.
+
+    Returns:
+        tuple[dict[str, float], list[ImportTime]]: Metrics and the import times of the last entry point run.
+    """
+    totals_ms = []
+    reference_totals_ms = []
+    import_times: list[ImportTime] = []
+    for _ in range(runs):
+        import_times = measure_import(ENTRY_MODULE)
+        totals_ms.append(get_cumulative_ms(import_times, ENTRY_MODULE))
+        reference_totals_ms.append(get_cumulative_ms(measure_import(REFERENCE_MODULE), REFERENCE_MODULE))
+    median_ms = statistics.median(totals_ms)
+    reference_median_ms = statistics.median(reference_totals_ms)
+    metrics = {
+        'median_ms': round(median_ms, 1),
+        'min_ms': round(min(totals_ms), 1),
+        'reference_median_ms': round(reference_median_ms, 1),
+        'ratio': round(median_ms / reference_median_ms, 3),
+        'modules': len(import_times),
+    }
+    return metrics, import_times
+
+
+def get_direct_imports(import_times: list[ImportTime], module: str) -> list[ImportTime]:
+    """Get the modules imported directly by the module, the slowest first.
+
+    The imports of a module are reported before the module itself, one level deeper.
+
+    Returns:
+        list[ImportTime]: Import times of the direct imports.
+    """
+    index = next(index for index, item in enumerate(import_times) if item.module == module)
+    depth = import_times[index].depth
+    direct_imports = []
+    for item in reversed(import_times[:index]):
+        if item.depth <= depth:
+            break
+        if item.depth == depth + 1:
+            direct_imports.append(item)
+    return sorted(direct_imports, key=lambda item: -item.cumulative_us)
+
+
+def get_eager_modules(import_times: list[ImportTime]) -> list[str]:
+    """Get the lazily imported modules (or their submodules) that were imported with the entry point.
+
+    Returns:
+        list[str]: Eagerly imported modules.
+    """
+    return sorted(
+        {
+            item.module
+            for item in import_times
+            for lazy_module in LAZY_MODULES
+            if item.module == lazy_module or item.module.startswith(f'{lazy_module}.')
+        }
+    )
+
+
+def main() -> None:
+    """Run the benchmark and check the regressions."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='Number of fresh interpreter runs.')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Number of the slowest modules to report.')
+    parser.add_argument('--check', action='store_true', help='Fail if the import time regressed against the baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed relative regression.')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the metrics as the new baseline.')
+    args = parser.parse_args()
+
+    metrics, import_times = run_benchmark(args.runs)
+    print(json.dumps(metrics))
+    for item in get_direct_imports(import_times, ENTRY_MODULE)[: args.top]:
+        print(f'{item.cumulative_us / 1e3:10.1f} ms  {item.module}')
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps(metrics, indent=2) + '\n', encoding='utf-8')
+        print(f'Baseline updated: {BASELINE_PATH}')
+
+    if args.check:
+        regressions = [f'{module} is imported eagerly' for module in get_eager_modules(import_times)]
+        # the absolute times depend on the machine, only the ratio to the reference is compared
+        expected = json.loads(BASELINE_PATH.read_text(encoding='utf-8'))['ratio']
+        if metrics['ratio'] > expected * (1 + args.tolerance):
+            regressions.append(f'ratio {metrics["ratio"]} > baseline {expected}')
+        if regressions:
+            print('\n'.join(['Import time regressions:', *regressions]))
+            sys.exit(1)
+        print('No import time regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Microbenchmark of building the agent runnables per invocation vs reusing the cached ones.
+
+Run with `uv run python -m benchmarks.bench_runnables`, no OpenAI API calls are made.
+"""
+
+import os
+import timeit
+
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from langgraph.prebuilt import create_react_agent
+
+from src.agents import REPORT_JSON_SCHEMA
+from src.llm import ChatOpenAISingleton
+from src.models import OutputTickerReport
+from src.tools import tool_get_google_news, tool_get_google_ticker_info
+
+ITERATIONS = 50
+TOOLS = [tool_get_google_ticker_info, tool_get_google_news]
+
+
+def build_uncached() -> None:
+    """Build the runnables the way the agents did before caching."""
+    llm = ChatOpenAISingleton.get_instance()
+    create_react_agent(llm, TOOLS)
+    llm.with_structured_output(OutputTickerReport)
+
+
+def build_cached() -> None:
+    """Get the cached runnables."""
+    ChatOpenAISingleton.get_react_agent(TOOLS)
+    ChatOpenAISingleton.get_structured_instance(REPORT_JSON_SCHEMA, streaming=True)
+
+
+def main() -> None:
+    """Run the benchmark and print the per-invocation times."""
+    ChatOpenAISingleton.create_get_instance(model='gpt-4o-mini')
+    build_cached()  # warm up the cache
+
+    for name, func in (('uncached', build_uncached), ('cached', build_cached)):
+        total = timeit.timeit(func, number=ITERATIONS)
+        print(f'{name:>8}: {total / ITERATIONS * 1e3:8.3f} ms per invocation')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Offline stand-ins replaying the recorded scraper and OpenAI responses.
+
+The recorded responses are in `benchmarks/fixtures/recorded.json`, the "{ticker}" and "{stock_id}" placeholders
+are replaced by the requested ticker. The recorded latencies are simulated with `asyncio.sleep`, scaled by
+the time scale, so the concurrency of the graph is exercised without waiting for the real durations.
+"""
+
+import asyncio
+import json
+import re
+from collections.abc import AsyncGenerator, AsyncIterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.compaction import count_tokens
+
+FIXTURES_PATH = Path(__file__).parent / 'fixtures' / 'recorded.json'
+TICKER_PLACEHOLDER = '{ticker}'
+STOCK_ID_PLACEHOLDER = '{stock_id}'
+
+_TICKER_PATTERN = re.compile(r'Ticker: (\S+)')
+
+
+def load_fixtures(path: Path = FIXTURES_PATH) -> dict:
+    """Load the recorded responses.
+
+    Returns:
+        dict: Recorded responses.
+    """
+    fixtures: dict = json.loads(path.read_text(encoding='utf-8'))
+    return fixtures
+
+
+def render(value: object, ticker: str, stock_id: str | None = None) -> Any:  # noqa: ANN401
+    """Replace the placeholders of the recorded response.
+
+    Returns:
+        Any: Recorded response for the ticker.
+    """
+    text = json.dumps(value).replace(TICKER_PLACEHOLDER, ticker)
+    text = text.replace(STOCK_ID_PLACEHOLDER, stock_id or f'{ticker}:NASDAQ')
+    return json.loads(text)
+
+
+class ScraperReplay:
+    """Stand-in for the scraper Actor runs replaying the recorded datasets."""
+
+    def __init__(self, fixtures: dict, *, time_scale: float) -> None:
+        self.fixtures = fixtures
+        self.time_scale = time_scale
+        self.runs = 0
+
+    async def _wait(self, name: str) -> None:
+        self.runs += 1
+        await asyncio.sleep(self.fixtures['latency_secs'][name] * self.time_scale)
+
+    async def run_actor_get_default_dataset(
+        self,
+        actor_id: str,  # noqa: ARG002
+        run_input: dict,
+        **_: object,
+    ) -> tuple[str, list[dict]]:
+        """Replay the Google Finance stock details or stock search run.
+
+        Returns:
+            tuple[str, list[dict]]: Dataset ID and dataset items.
+        """
+        await self._wait('google_finance')
+        if run_input.get('action') == 'search_stocks':
+            ticker = run_input['search_stocks']
+            return 'replay', [{'ticker': ticker, 'stock_id': f'{ticker}:NASDAQ'}]
+        items = [
+            render(self.fixtures['google_finance_stock_details'], stock_id.split(':')[0], stock_id)
+            for stock_id in run_input['stocks']
+        ]
+        return 'replay', items
+
+    async def iterate_actor_default_dataset(
+        self,
+        actor_id: str,  # noqa: ARG002
+        run_input: dict,
+        **_: object,
+    ) -> AsyncGenerator[dict]:
+        """Replay the Google News run.
+
+        Yields:
+            dict: Dataset item.
+        """
+        await self._wait('google_news')
+        for item in render(self.fixtures['google_news'], run_input['query']):
+            yield item
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model replaying the recorded analysis and report responses.
+
+    The structured output (the report) is returned as a tool call, as with the OpenAI function calling.
+    The prompt tokens are counted from the actual messages, so the prompt size regressions are measured.
+    """
+
+    fixtures: dict
+    time_scale: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'replay'
+
+    def bind_tools(
+        self,
+        tools: Sequence[Any],
+        *,
+        tool_choice: str | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> Runnable[LanguageModelInput, BaseMessage]:
+        """Bind the tools, the structured output binds its schema with a tool choice.
+
+        Returns:
+            Runnable[LanguageModelInput, BaseMessage]: Model with the bound tools.
+        """
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _create_message(self, messages: list[BaseMessage], **kwargs: Any) -> AIMessage:  # noqa: ANN401
+        prompt = '\n'.join(str(message.content) for message in messages)
+        ticker = match.group(1) if (match := _TICKER_PATTERN.search(prompt)) else 'UNKNOWN'
+        if kwargs.get('tool_choice') and (tools := kwargs.get('tools')):
+            report = render(self.fixtures['llm_report'], ticker)
+            tool_call = {'name': tools[0]['function']['name'], 'args': report, 'id': 'call_report'}
+            message = AIMessage(content='', tool_calls=[tool_call])
+            completion = json.dumps(report)
+        else:
+            # the analysis is answered directly from the prefetched data, without tool calls
+            completion = render(self.fixtures['llm_analysis'], ticker)
+            message = AIMessage(content=completion)
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(completion)
+        message.usage_metadata = {
+            'input_tokens': prompt_tokens,
+            'output_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+        return message
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: CallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._create_message(messages, **kwargs))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> ChatResult:
+        await self._wait(**kwargs)
+        return ChatResult(generations=[ChatGeneration(message=self._create_message(messages, **kwargs))])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,  # noqa: ARG002
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Stream the recorded response as a single chunk.
+
+        Yields:
+            ChatGenerationChunk: Response chunk.
+        """
+        await self._wait(**kwargs)
+        message = self._create_message(messages, **kwargs)
+        tool_call_chunks = [
+            {'name': tool_call['name'], 'args': json.dumps(tool_call['args']), 'id': tool_call['id'], 'index': 0}
+            for tool_call in message.tool_calls
+        ]
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=message.content,
+                tool_call_chunks=tool_call_chunks,
+                usage_metadata=message.usage_metadata,
+            )
+        )
+
+    async def _wait(self, **kwargs: Any) -> None:  # noqa: ANN401
+        name = 'llm_report' if kwargs.get('tool_choice') else 'llm_analysis'
+        await asyncio.sleep(self.fixtures['latency_secs'][name] * self.time_scale)
@@ -2,24 +2,35 @@
 
 They are the building blocks of the graph and are used to perform specific tasks. For example,
 in this case, the supervisor node controls the flow of the agents and determines the next appropriate action.
-The other two agents are used to analyze the stock ticker and create a report based on the analysis for the user.
+The prefetch node gathers the ticker data with all the known tools concurrently, the other two agents are used
+to analyze the stock ticker and create a report based on the analysis for the user. With the incremental monitoring
+enabled, only the changes since the last run are analyzed and the report is reused if nothing material changed.
 
 Resources:
 - https://langchain-ai.github.io/langgraph/concepts/multi_agent/
 """
 
+import asyncio
 import datetime
+import json
 import logging
-from typing import Literal
+import time
+from typing import Any, Literal
 
+from apify import Actor
+from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_core.messages import ToolMessage
-from langchain_core.runnables.config import RunnableConfig
-from langgraph.prebuilt import create_react_agent
+from langchain_core.runnables.config import RunnableConfig, merge_configs
+from langchain_core.utils.json import parse_partial_json
 from langgraph.types import Command
 
+from src.analytics import compute_ticker_metrics, format_ticker_metrics
+from src.compaction import TOOL_TOKEN_BUDGETS, compact_news, compact_ticker_info, compact_tool, fit_token_budget
 from src.llm import ChatOpenAISingleton
-from src.models import OutputTickerReport
+from src.models import NEWS_LOOKBACK_DAYS, OutputTickerReport
+from src.snapshots import TickerSnapshotStoreSingleton, create_ticker_snapshot, diff_ticker_data
 from src.state import State
+from src.tool_executor import resilient_tool, run_tool
 from src.tools import (
     tool_get_google_news,
     tool_get_google_ticker_info,
@@ -27,6 +38,115 @@ from src.tools import (
 
 logger = logging.getLogger('apify')
 
+REPORT_PROGRESS_INTERVAL_SECS = 2.0
+# structured output of the JSON schema (instead of the Pydantic model) is a plain dict, validated once it is complete
+REPORT_JSON_SCHEMA = OutputTickerReport.model_json_schema()
+METRICS_HEADER = (
+    'Financial metrics computed from the Google Finance data (exact, use them as they are, do not recompute them)'
+)
+# tool outputs are compacted before they enter the ReAct agent context
+# tool calls have deadlines and are retried by the executor, failed tools do not stall the analysis
+ANALYSIS_TOOLS = [
+    # Yahoo tools (src/yahoo_tools.py) are currently excluded - scraper is not working
+    compact_tool(resilient_tool(tool_get_google_ticker_info)),
+    compact_tool(resilient_tool(tool_get_google_news)),
+]
+
+
+async def prefetch(state: State) -> dict:
+    """Node to prefetch the ticker data before the analysis.
+
+    All the known data-gathering tools are run concurrently as soon as the ticker is known, so the analyst
+    starts with the data already in context and does not need an extra LLM round-trip to request it.
+    Failed tools are left out, the analyst can still call them itself. If there is a snapshot of the ticker
+    from the last run, the prefetched data is diffed against it.
+
+    Returns:
+        dict: graph state update with the prefetched data and the changes since the last snapshot.
+    """
+    ticker = state['ticker']
+    date_from = datetime.datetime.now(tz=datetime.UTC) - datetime.timedelta(days=NEWS_LOOKBACK_DAYS)
+
+    async def get_ticker_info() -> object:
+        # a batch run fetches the ticker info of all its tickers upfront
+        if (ticker_info := state.get('ticker_info')) is not None:
+            return ticker_info
+        return await run_tool(tool_get_google_ticker_info, {'ticker': ticker})
+
+    results: tuple = await asyncio.gather(
+        get_ticker_info(),
+        run_tool(tool_get_google_news, {'query': ticker, 'date_from': date_from.strftime('%Y-%m-%d')}),
+        return_exceptions=True,
+    )
+    ticker_info, news = results
+
+    if isinstance(ticker_info, BaseException):
+        logger.warning('Failed to prefetch Google Finance info for ticker "%s": %s', ticker, ticker_info)
+        ticker_info = None
+    if isinstance(news, BaseException):
+        logger.warning('Failed to prefetch Google News for ticker "%s": %s', ticker, news)
+        news = None
+
+    snapshot = delta = None
+    if (snapshot_store := TickerSnapshotStoreSingleton.get_instance()) is not None:
+        snapshot = await snapshot_store.get(ticker)
+    if snapshot is not None:
+        delta = diff_ticker_data(snapshot, ticker_info, news)
+        logger.info(
+            'Ticker "%s" changes since %s: %d changed info fields, %d new news, material: %s',
+            ticker,
+            snapshot.updated_at,
+            len(delta.changed_info),
+            len(delta.new_news),
+            delta.is_material,
+        )
+
+    metrics = None
+    if ticker_info is not None:
+        metrics = compute_ticker_metrics(ticker, ticker_info, peer_pe_median=state.get('peer_pe_median'))
+    return {
+        'prefetched': True,
+        'ticker_info': ticker_info,
+        'news': news,
+        'metrics': metrics,
+        'snapshot': snapshot,
+        'delta': delta,
+    }
+
+
+def format_prefetched_data(state: State) -> str:
+    """Format the prefetched ticker data for the LLM context.
+
+    If there is a snapshot from the last run, only the changed data and the previous analysis are included.
+    The locally computed financial metrics are always included.
+
+    Returns:
+        str: Prefetched data as text, empty if nothing was prefetched.
+    """
+    metrics_parts = []
+    if metrics := state.get('metrics'):
+        metrics_parts.append(f'{METRICS_HEADER}:\n{format_ticker_metrics(metrics)}')
+
+    if (snapshot := state.get('snapshot')) and (delta := state.get('delta')):
+        parts = [f'Previous analysis from {snapshot.updated_at}:\n{snapshot.analysis}', *metrics_parts]
+        if delta.changed_info:
+            lines = [f'{field}: {json.dumps(value, default=str)}' for field, value in delta.changed_info.items()]
+            info = fit_token_budget(lines, TOOL_TOKEN_BUDGETS['tool_get_google_ticker_info'])
+            parts.append(f'Changed Google Finance ticker info fields (tool_get_google_ticker_info):\n{info}')
+        if delta.new_news:
+            news_table = compact_news(delta.new_news, token_budget=TOOL_TOKEN_BUDGETS['tool_get_google_news'])
+            parts.append(f'New Google News since the previous analysis (tool_get_google_news):\n{news_table}')
+        return '\n\n'.join(parts)
+
+    parts = []
+    if ticker_info := state.get('ticker_info'):
+        info = compact_ticker_info(ticker_info, token_budget=TOOL_TOKEN_BUDGETS['tool_get_google_ticker_info'])
+        parts.append(f'Google Finance ticker info (tool_get_google_ticker_info):\n{info}')
+    if news := state.get('news'):
+        news_table = compact_news(news, token_budget=TOOL_TOKEN_BUDGETS['tool_get_google_news'])
+        parts.append(f'Google News (tool_get_google_news, last {NEWS_LOOKBACK_DAYS} days):\n{news_table}')
+    return '\n\n'.join([*parts, *metrics_parts])
+
 
 async def agent_analysis(state: State, config: RunnableConfig) -> dict:
     """Agent to analyze the stock ticker.
@@ -37,13 +157,7 @@ async def agent_analysis(state: State, config: RunnableConfig) -> dict:
     Returns:
         dict: graph state update with the analysis.
     """
-    llm = ChatOpenAISingleton.get_instance()
-    tools = [
-        # Yahoo tools are currently excluded - scraper is not working
-        tool_get_google_ticker_info,
-        tool_get_google_news,
-    ]
-    subgraph = create_react_agent(llm, tools)
+    subgraph = ChatOpenAISingleton.get_react_agent(ANALYSIS_TOOLS, node='agent_analysis')
 
     messages = [
         (
@@ -56,13 +170,38 @@ async def agent_analysis(state: State, config: RunnableConfig) -> dict:
                 'Gather information from as many sources as you have access to. '
                 'For example if you have tools available for news from Yahoo, Google, and X.com, use all of them. '
                 'If you have a source URL link available, for example for news, you must include it in the summary. '
-                'If for some reason any tool fails, try to rerun it once more.'
+                'Failed tools are retried automatically, if a tool still fails, do not call it again '
+                'and continue with the data you already have.'
                 '\n'
                 f'Ticker: {state["ticker"]}\n'
                 f"Today's date: {datetime.datetime.now(tz=datetime.UTC).strftime('%Y-%m-%d')}"
             ),
         )
     ]
+    if state.get('delta') is not None and (prefetched_data := format_prefetched_data(state)):
+        messages.append(
+            (
+                'user',
+                (
+                    'The ticker was already analyzed in a previous run. The following is the previous analysis '
+                    'and only the data that changed since then. Update the previous analysis with the changes, '
+                    'keep the parts that are still valid and include the source URLs of the new news. '
+                    'Use the tools only to get data that is missing here.\n\n'
+                    f'{prefetched_data}'
+                ),
+            )
+        )
+    elif prefetched_data := format_prefetched_data(state):
+        messages.append(
+            (
+                'user',
+                (
+                    'The following data was already gathered for you using the tools. '
+                    'Use the tools only to get data that is missing here or to answer follow-up questions.\n\n'
+                    f'{prefetched_data}'
+                ),
+            )
+        )
 
     debug = config.get('configurable', {}).get('debug', False)
     if debug:
@@ -88,10 +227,74 @@ async def agent_analysis(state: State, config: RunnableConfig) -> dict:
     return {'analysis': response['messages'][-1].content}
 
 
-def agent_report(state: State) -> dict:
+def get_report_progress_key(report_key: str) -> str:
+    """Get the key-value store key for the partial report, kept apart from the final report.
+
+    Args:
+        report_key (str): Key-value store key for the final report.
+
+    Returns:
+        str: Key-value store key for the partial report.
+    """
+    return f'{report_key.removesuffix(".md")}-progress.md'
+
+
+class ReportProgress(AsyncCallbackHandler):
+    """Pushes the partially streamed report to the Actor status message and the key-value store.
+
+    The handler receives the streamed tokens of the structured report JSON, the partial JSON is parsed and the report
+    field pushed. Updates are throttled, so the streaming is not slowed down by the storage writes and the JSON
+    parsing. The partial report is stored under its own key and deleted once the report node finishes, so a failed
+    or timed out run never leaves a truncated report under the final report key.
+    """
+
+    def __init__(self, report_key: str | None, *, batch: bool = False) -> None:
+        self.progress_key = get_report_progress_key(report_key) if report_key else None
+        self.batch = batch
+        self._last_update = 0.0
+        self._last_length = 0
+        self._tokens: list[str] = []
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Collect the streamed token and push the partial report if enough time passed since the last update."""
+        self._tokens.append(token)
+        if time.monotonic() - self._last_update < REPORT_PROGRESS_INTERVAL_SECS:
+            return
+        partial_report = parse_partial_json(''.join(self._tokens))
+        if isinstance(partial_report, dict):
+            await self.update(partial_report.get('report'))
+
+    async def update(self, partial_report: str | None) -> None:
+        """Push the partial report if enough time passed since the last update."""
+        if not partial_report or len(partial_report) == self._last_length:
+            return
+        now = time.monotonic()
+        if now - self._last_update < REPORT_PROGRESS_INTERVAL_SECS:
+            return
+        self._last_update = now
+        self._last_length = len(partial_report)
+
+        if not self.batch:
+            await Actor.set_status_message(f'Agent: creating report... ({len(partial_report)} characters written)')
+        if self.progress_key:
+            store = await Actor.open_key_value_store()
+            await store.set_value(self.progress_key, partial_report)
+
+    async def clear(self) -> None:
+        """Delete the partial report from the key-value store."""
+        if self.progress_key and self._last_length:
+            store = await Actor.open_key_value_store()
+            await store.set_value(self.progress_key, None)
+            self._last_length = 0
+
+
+async def agent_report(state: State, config: RunnableConfig) -> dict:
     """Agent to create a report based on the analysis.
 
-    This agent generates a report about the stock ticker using the ticker data summary.
+    This agent generates a report about the stock ticker using the ticker data summary. The structured report
+    is streamed, the partial report is pushed to the Actor status message and the progress record of the key-value
+    store as it arrives. The streamed report is stored in the LLM cache, a cached report is returned at once.
+    The ticker snapshot for the incremental monitoring is updated with the new report.
 
     Returns:
         dict: graph state update with the report.
@@ -99,8 +302,9 @@ def agent_report(state: State) -> dict:
     Raises:
         ValueError: If analysis is missing.
     """
-    llm = ChatOpenAISingleton.get_instance()
-    llm_structured = llm.with_structured_output(OutputTickerReport)
+    llm_structured = ChatOpenAISingleton.get_structured_instance(
+        REPORT_JSON_SCHEMA, node='agent_report', streaming=True
+    )
 
     if not state.get('analysis'):
         msg = 'Analysis is missing!'
@@ -119,7 +323,8 @@ def agent_report(state: State) -> dict:
                 "- Executive summary - a brief overview of the news from the analysis and the company's "
                 'financial health.\n'
                 '- Financials - current financial data.\n'
-                '- Yearly financials highlights - highlights of the yearly financials from previous years.\n'
+                '- Yearly financials highlights - highlights of the yearly financials from previous years, '
+                'use the provided financial metrics.\n'
                 '- Conclusion - final thoughts on the stock and its future prospects.\n'
                 '- News - recent news and events that may have affected the stock price.\n'
                 f'Ticker: {state["ticker"]}\n'
@@ -128,23 +333,58 @@ def agent_report(state: State) -> dict:
         ),
         ('user', f'Here is the ticker news and analysis:\n{state["analysis"]}'),
     ]
-    return {'report': llm_structured.invoke(messages)}
+    if metrics := state.get('metrics'):
+        messages.append(('user', f'{METRICS_HEADER}:\n{format_ticker_metrics(metrics)}'))
+
+    configurable = config.get('configurable', {})
+    progress = ReportProgress(report_key=configurable.get('report_key'), batch=configurable.get('batch', False))
+    try:
+        report = await llm_structured.ainvoke(messages, merge_configs(config, {'callbacks': [progress]}))
+    finally:
+        await progress.clear()
+
+    output_report = OutputTickerReport.model_validate(report)
+    if (snapshot_store := TickerSnapshotStoreSingleton.get_instance()) is not None:
+        snapshot = create_ticker_snapshot(
+            state['ticker'],
+            previous=state.get('snapshot'),
+            ticker_info=state.get('ticker_info'),
+            news=state.get('news'),
+            analysis=state['analysis'],
+            report=output_report,
+        )
+        await snapshot_store.set(snapshot)
+    return {'report': output_report}
 
 
 # this can be an agent if the graph gets more complex
-def supervisor(state: State) -> Command[Literal['agent_analysis', 'agent_report']]:
+def supervisor(state: State) -> Command[Literal['prefetch', 'agent_analysis', 'agent_report', '__end__']]:
     """Supervisor node to control the flow of the agents.
 
     This node supervises the agents and determines the next appropriate action based on the current state and
-    updates the state accordingly for the user.
+    updates the state accordingly for the user. If nothing material changed since the last snapshot,
+    the previous report is reused and the graph ends without any LLM calls.
 
     Returns:
         Command: Command with status update and go to next agent.
     """
+    prefetch_done = bool(state.get('prefetched'))
     analysis_done = bool(state.get('analysis'))
+    snapshot = state.get('snapshot')
+    delta = state.get('delta')
 
-    if not analysis_done:
-        status = 'gathering and analyzing data...'
+    next_agent: Literal['prefetch', 'agent_analysis', 'agent_report']
+    if not prefetch_done:
+        status = 'gathering data...'
+        next_agent = 'prefetch'
+    elif snapshot is not None and delta is not None and not delta.is_material:
+        status = 'no material changes since the last run, reusing the previous report...'
+        # the '__end__' node is the graph END
+        return Command(
+            goto='__end__', update={'status': status, 'analysis': snapshot.analysis, 'report': snapshot.report}
+        )
+    elif not analysis_done:
+        status = 'analyzing data...'
         next_agent = 'agent_analysis'
     else:
         status = 'creating report...'
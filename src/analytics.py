@@ -0,0 +1,226 @@
+"""This module contains the deterministic local computation of the ticker financial metrics.
+
+Deriving the financials highlights (year-over-year changes, growth rates, trends) from the raw yearly financials
+is slow and token-heavy for the LLM and its arithmetic is unreliable. The metrics are computed with NumPy array
+operations over the yearly financials of the ticker, as soon as the ticker info is prefetched, and injected into
+the prompts as compact tables, the LLM only interprets them.
+
+In a batch run, the P/E ratio of every ticker is also compared to the median P/E ratio of the other tickers of
+the batch (the watchlist), the medians are computed for the whole batch at once before the tickers are analyzed.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+import numpy.typing as npt
+
+from src.compaction import format_table
+from src.models import GoogleTickerInfo
+
+FINANCIAL_FIELDS = (
+    'earning_per_share',
+    'net_profit_margin',
+    'return_on_capital',
+    'return_on_assets',
+    'price_to_book',
+    'effective_tax_rate',
+)
+MIN_TREND_YEARS = 2
+MIN_PEERS = 2
+
+
+@dataclass
+class TickerMetrics:
+    """Financial metrics of a ticker computed from its Google Finance info."""
+
+    ticker: str
+    latest_year: int | None = None
+    """Latest year with the financials."""
+    previous_year: int | None = None
+    """Year before the latest year with the financials."""
+    latest: dict[str, float | None] = field(default_factory=dict)
+    """Financials of the latest year."""
+    previous: dict[str, float | None] = field(default_factory=dict)
+    """Financials of the previous year."""
+    yoy_change: dict[str, float | None] = field(default_factory=dict)
+    """Absolute change of the financials between the previous and the latest year."""
+    eps_cagr: float | None = None
+    """Compound annual growth rate of the earnings per share over the available years."""
+    eps_cagr_years: tuple[int, int] | None = None
+    """First and last year of the EPS CAGR."""
+    net_margin_trend: float | None = None
+    """Least-squares slope of the net profit margin in percentage points per year."""
+    price_range_position: float | None = None
+    """Position of the current price in the 52-week range, 0 is the low and 1 is the high."""
+    pe_ratio: float | None = None
+    """Price to earnings ratio."""
+    earnings_yield: float | None = None
+    """Inverse of the P/E ratio."""
+    peer_pe_median: float | None = None
+    """Median P/E ratio of the other tickers of the batch, None if there are not enough of them."""
+    pe_vs_peers: float | None = None
+    """P/E ratio relative to the median P/E ratio of the other tickers of the batch."""
+
+
+def _to_optional(value: float) -> float | None:
+    return None if np.isnan(value) else float(value)
+
+
+type FloatArray = npt.NDArray[np.float64]
+
+
+def _get_yearly_values(ticker_info: GoogleTickerInfo) -> tuple[list[int], FloatArray]:
+    """Get the yearly financials of the ticker as an array.
+
+    Returns:
+        tuple[list[int], FloatArray]: Sorted years and the (field, year) array of the financials, missing values
+            are NaN.
+    """
+    years = sorted({financial.year for financial in ticker_info.yerly_financials})
+    year_index = {year: i for i, year in enumerate(years)}
+    values = np.full((len(FINANCIAL_FIELDS), len(years)), np.nan)
+    for financial in ticker_info.yerly_financials:
+        for f, field_name in enumerate(FINANCIAL_FIELDS):
+            if (value := getattr(financial, field_name)) is not None:
+                values[f, year_index[financial.year]] = value
+    return years, values
+
+
+def _set_year_over_year(metrics: TickerMetrics, years: list[int], values: FloatArray) -> None:
+    """Set the financials of the latest and the previous year with any financials and their changes."""
+    year_indexes = np.flatnonzero((~np.isnan(values)).any(axis=0))
+    if not len(year_indexes):
+        return
+    latest = values[:, year_indexes[-1]]
+    previous = values[:, year_indexes[-2]] if len(year_indexes) > 1 else np.full(len(FINANCIAL_FIELDS), np.nan)
+    yoy_change = latest - previous
+    metrics.latest_year = years[year_indexes[-1]]
+    metrics.previous_year = years[year_indexes[-2]] if len(year_indexes) > 1 else None
+    metrics.latest = {name: _to_optional(latest[f]) for f, name in enumerate(FINANCIAL_FIELDS)}
+    metrics.previous = {name: _to_optional(previous[f]) for f, name in enumerate(FINANCIAL_FIELDS)}
+    metrics.yoy_change = {name: _to_optional(yoy_change[f]) for f, name in enumerate(FINANCIAL_FIELDS)}
+
+
+def _set_growth(metrics: TickerMetrics, years: list[int], values: FloatArray) -> None:
+    """Set the EPS compound annual growth rate and the least-squares trend of the net profit margin."""
+    year_values = np.array(years, dtype=float)
+
+    eps = values[FINANCIAL_FIELDS.index('earning_per_share')]
+    eps_indexes = np.flatnonzero(~np.isnan(eps))
+    if len(eps_indexes) > 1:
+        first, last = eps_indexes[0], eps_indexes[-1]
+        if eps[first] > 0 and eps[last] > 0:
+            metrics.eps_cagr = float((eps[last] / eps[first]) ** (1 / (year_values[last] - year_values[first])) - 1)
+            metrics.eps_cagr_years = (years[first], years[last])
+
+    margin = values[FINANCIAL_FIELDS.index('net_profit_margin')]
+    has_margin = ~np.isnan(margin)
+    if has_margin.sum() >= MIN_TREND_YEARS:
+        metrics.net_margin_trend = float(np.polyfit(year_values[has_margin], margin[has_margin], 1)[0])
+
+
+def _set_price_context(metrics: TickerMetrics, ticker_info: GoogleTickerInfo) -> None:
+    """Set the position of the price in the 52-week range and the P/E context."""
+    if ticker_info.price_year_range is not None:
+        low, high = ticker_info.price_year_range
+        if high > low:
+            metrics.price_range_position = (ticker_info.current_price - low) / (high - low)
+    metrics.pe_ratio = ticker_info.pe_ratio
+    if ticker_info.pe_ratio is not None and ticker_info.pe_ratio > 0:
+        metrics.earnings_yield = 1 / ticker_info.pe_ratio
+
+
+def compute_peer_pe_medians(pe_ratios: Mapping[str, float | None]) -> dict[str, float]:
+    """Compute the median P/E ratio of the other tickers of the batch for every ticker.
+
+    Missing and negative P/E ratios are left out. The medians of all the tickers are computed at once over
+    a (ticker, peer) array with the own P/E ratios masked out.
+
+    Args:
+        pe_ratios (Mapping[str, float | None]): P/E ratio of every ticker of the batch.
+
+    Returns:
+        dict[str, float]: Median P/E ratio of the peers, the tickers with less than MIN_PEERS peers are missing.
+    """
+    tickers = list(pe_ratios)
+    values = np.array([np.nan if pe is None or pe <= 0 else pe for pe in pe_ratios.values()], dtype=float)
+    peers = np.tile(values, (len(values), 1))
+    np.fill_diagonal(peers, np.nan)
+    enough_peers = np.flatnonzero((~np.isnan(peers)).sum(axis=1) >= MIN_PEERS)
+    if not len(enough_peers):
+        return {}
+    medians = np.nanmedian(peers[enough_peers], axis=1)
+    return {tickers[i]: float(median) for i, median in zip(enough_peers, medians, strict=True)}
+
+
+def compute_ticker_metrics(
+    ticker: str, ticker_info: GoogleTickerInfo, *, peer_pe_median: float | None = None
+) -> TickerMetrics:
+    """Compute the financial metrics of the ticker.
+
+    Args:
+        ticker (str): Ticker symbol.
+        ticker_info (GoogleTickerInfo): Google Finance info of the ticker.
+        peer_pe_median (float | None): Median P/E ratio of the other tickers of the batch, see
+            `compute_peer_pe_medians`.
+
+    Returns:
+        TickerMetrics: Metrics of the ticker.
+    """
+    metrics = TickerMetrics(ticker=ticker)
+    years, values = _get_yearly_values(ticker_info)
+    _set_year_over_year(metrics, years, values)
+    _set_growth(metrics, years, values)
+    _set_price_context(metrics, ticker_info)
+    if peer_pe_median is not None and metrics.pe_ratio is not None and metrics.pe_ratio > 0:
+        metrics.peer_pe_median = peer_pe_median
+        metrics.pe_vs_peers = metrics.pe_ratio / peer_pe_median
+    return metrics
+
+
+def _format_number(value: float | None, *, percent: bool = False, signed: bool = False) -> str:
+    if value is None:
+        return ''
+    if percent:
+        return f'{value * 100:+.1f}%' if signed else f'{value * 100:.1f}%'
+    return f'{value:+.2f}' if signed else f'{value:.2f}'
+
+
+def format_ticker_metrics(metrics: TickerMetrics) -> str:
+    """Format the ticker metrics as compact tables for the LLM context.
+
+    Args:
+        metrics (TickerMetrics): Ticker metrics.
+
+    Returns:
+        str: Metrics as compact tables.
+    """
+    rows: list[tuple[str, str]] = [
+        ('price_52w_range_position', _format_number(metrics.price_range_position)),
+        ('pe_ratio', _format_number(metrics.pe_ratio)),
+        ('earnings_yield', _format_number(metrics.earnings_yield, percent=True)),
+        ('watchlist_pe_median', _format_number(metrics.peer_pe_median)),
+        ('pe_vs_watchlist_median', _format_number(metrics.pe_vs_peers)),
+    ]
+    if metrics.eps_cagr_years is not None:
+        first_year, last_year = metrics.eps_cagr_years
+        rows.append((f'eps_cagr_{first_year}_{last_year}', _format_number(metrics.eps_cagr, percent=True)))
+    rows.append(('net_margin_trend_pp_per_year', _format_number(metrics.net_margin_trend, signed=True)))
+    lines = format_table(('metric', 'value'), [row for row in rows if row[1]])
+
+    if metrics.latest_year is not None:
+        yoy_rows = [
+            (
+                name,
+                _format_number(metrics.previous.get(name)),
+                _format_number(metrics.latest.get(name)),
+                _format_number(metrics.yoy_change.get(name), signed=True),
+            )
+            for name in FINANCIAL_FIELDS
+            if metrics.latest.get(name) is not None
+        ]
+        lines.extend(
+            format_table(('financial', str(metrics.previous_year or ''), str(metrics.latest_year), 'change'), yoy_rows)
+        )
+    return '\n'.join(lines)
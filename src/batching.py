@@ -0,0 +1,98 @@
+"""This module contains the request coalescing layer for batching scraper requests.
+
+Scraper Actors that accept a list of inputs (for example multiple Google Finance stock IDs) pay the Actor start-up
+and proxy session cost only once per run. The coalescer collects concurrent lookups within a short time window
+and resolves them with a single batched call, then splits the results back to the individual callers.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+
+logger = logging.getLogger('apify')
+
+DEFAULT_WINDOW_SECS = 0.5
+DEFAULT_MAX_BATCH_SIZE = 20
+
+
+class RequestCoalescer[K: Hashable, V]:
+    """Coalesce concurrent lookups into batched calls.
+
+    Concurrent lookups of the same key share one result. A batch is dispatched when the time window after its first
+    lookup elapses or when it reaches the maximum batch size, whichever comes first.
+
+    The batched calls are shielded from the cancellation of the callers (for example by a tool timeout), a lookup
+    of a key whose batch is still running joins it instead of starting a new batched call.
+    """
+
+    def __init__(
+        self,
+        fetch_batch: Callable[[list[K]], Awaitable[dict[K, V]]],
+        *,
+        window_secs: float = DEFAULT_WINDOW_SECS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ) -> None:
+        self.fetch_batch = fetch_batch
+        self.window_secs = window_secs
+        self.max_batch_size = max_batch_size
+
+        self._pending: dict[K, asyncio.Future[V]] = {}
+        self._in_flight: dict[K, asyncio.Future[V]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get(self, key: K) -> V:
+        """Get the result for the key, the lookup is batched with other concurrent lookups.
+
+        Args:
+            key (K): Lookup key.
+
+        Returns:
+            V: Result for the key.
+        """
+        if (future := self._pending.get(key) or self._in_flight.get(key)) is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_secs, self._dispatch)
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        """Dispatch all the pending lookups as a single batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        self._in_flight.update(batch)
+        task = asyncio.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: dict[K, asyncio.Future[V]]) -> None:
+        """Run the batched call and resolve the futures of the individual lookups."""
+        logger.debug('Running batched request for %d keys: %s', len(batch), list(batch))
+        try:
+            results = await self.fetch_batch(list(batch))
+        except Exception as e:  # noqa: BLE001
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        else:
+            for key, future in batch.items():
+                if future.done():
+                    continue
+                if key in results:
+                    future.set_result(results[key])
+                else:
+                    future.set_exception(RuntimeError(f'Batched request did not return any result for "{key}"!'))
+        finally:
+            for key, future in batch.items():
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
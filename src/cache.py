@@ -0,0 +1,236 @@
+"""This module contains the persistent cache for the scraper Actor results.
+
+The cache is content-addressed, the key is a hash of the Actor ID and the canonicalized run input. This way
+the same Actor run input fetched by another ticker run, a retry or a previous Actor run is served from the cache
+instead of starting a new remote Actor run. Entries expire after a per-Actor TTL and the least recently used
+entries are evicted when the cache exceeds its size limits.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import TypedDict
+
+from src.storage import StorageBackend
+
+logger = logging.getLogger('apify')
+
+CACHE_STORE_NAME = 'finance-monitoring-agent-cache'
+INDEX_KEY = 'INDEX'
+
+DEFAULT_TTL_SECS = 60 * 60
+ACTOR_TTL_SECS = {
+    'lhotanova/google-news-scraper': 60 * 60,
+    'scraped_org/google-finance-scraper': 60 * 60,
+}
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class CacheIndexEntry(TypedDict):
+    """Metadata about a single cached Actor result."""
+
+    expires_at: float
+    last_access: float
+    size: int
+
+
+class CacheStats(TypedDict):
+    """Cache hit/miss counters."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+
+def make_cache_key(actor_id: str, run_input: dict) -> str:
+    """Create a content-addressed cache key from the Actor ID and the run input.
+
+    The run input is canonicalized (sorted keys, no whitespace) so the key does not depend on the key order.
+
+    Args:
+        actor_id (str): Actor ID.
+        run_input (dict): Actor run input.
+
+    Returns:
+        str: Cache key.
+    """
+    canonical = json.dumps({'actor_id': actor_id, 'run_input': run_input}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ActorResultCache:
+    """Persistent TTL cache for the Actor run dataset items.
+
+    The cache index (entry expiration, last access and size) is kept in memory and persisted in the storage
+    backend next to the entries, so the size limits can be enforced without listing the whole storage.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        *,
+        default_ttl_secs: float = DEFAULT_TTL_SECS,
+        actor_ttl_secs: dict[str, float] | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.backend = backend
+        self.default_ttl_secs = default_ttl_secs
+        self.actor_ttl_secs = ACTOR_TTL_SECS if actor_ttl_secs is None else actor_ttl_secs
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._index: dict[str, CacheIndexEntry] | None = None
+        self._lock = asyncio.Lock()
+
+    def get_ttl_secs(self, actor_id: str) -> float:
+        """Get the TTL for the Actor results.
+
+        Args:
+            actor_id (str): Actor ID.
+
+        Returns:
+            float: TTL in seconds.
+        """
+        return self.actor_ttl_secs.get(actor_id, self.default_ttl_secs)
+
+    async def _get_index(self) -> dict[str, CacheIndexEntry]:
+        if self._index is None:
+            self._index = await self.backend.get_value(INDEX_KEY) or {}
+        return self._index
+
+    async def get(self, actor_id: str, run_input: dict) -> tuple[str, list[dict]] | None:
+        """Get the cached Actor run result.
+
+        Args:
+            actor_id (str): Actor ID.
+            run_input (dict): Actor run input.
+
+        Returns:
+            tuple[str, list[dict]] | None: Dataset ID and dataset items or None on cache miss.
+        """
+        key = make_cache_key(actor_id, run_input)
+        now = time.time()
+        async with self._lock:
+            index = await self._get_index()
+            entry = index.get(key)
+            if entry is None or entry['expires_at'] <= now:
+                if entry is not None:
+                    await self._delete(key)
+                self.misses += 1
+                return None
+
+            value = await self.backend.get_value(key)
+            if value is None:
+                # the entry was deleted from the storage, but the index was not updated
+                index.pop(key, None)
+                self.misses += 1
+                return None
+
+            entry['last_access'] = now
+            self.hits += 1
+        logger.debug('Cache hit for Actor %s, key %s', actor_id, key)
+        return value['dataset_id'], value['items']
+
+    async def set(self, actor_id: str, run_input: dict, dataset_id: str, items: list[dict]) -> None:
+        """Store the Actor run result in the cache.
+
+        Args:
+            actor_id (str): Actor ID.
+            run_input (dict): Actor run input.
+            dataset_id (str): Dataset ID of the Actor run.
+            items (list[dict]): Dataset items.
+        """
+        key = make_cache_key(actor_id, run_input)
+        value = {'actor_id': actor_id, 'dataset_id': dataset_id, 'items': items}
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            logger.debug('Skipping caching of Actor %s result, it is too large (%d bytes)', actor_id, size)
+            return
+
+        now = time.time()
+        async with self._lock:
+            index = await self._get_index()
+            await self.backend.set_value(key, value)
+            index[key] = CacheIndexEntry(expires_at=now + self.get_ttl_secs(actor_id), last_access=now, size=size)
+            await self._evict(now)
+            await self.backend.set_value(INDEX_KEY, index)
+
+    async def _delete(self, key: str) -> None:
+        index = await self._get_index()
+        index.pop(key, None)
+        await self.backend.delete_value(key)
+
+    async def _evict(self, now: float) -> None:
+        """Evict the expired entries and then the least recently used ones until the limits are met."""
+        index = await self._get_index()
+        for key in [key for key, entry in index.items() if entry['expires_at'] <= now]:
+            await self._delete(key)
+            self.evictions += 1
+
+        total_bytes = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_access']):
+            if len(index) <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            total_bytes -= index[key]['size']
+            await self._delete(key)
+            self.evictions += 1
+
+    def stats(self) -> CacheStats:
+        """Get the cache statistics.
+
+        Returns:
+            CacheStats: Cache hit/miss counters and size.
+        """
+        index = self._index or {}
+        return CacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            entries=len(index),
+            bytes=sum(entry['size'] for entry in index.values()),
+        )
+
+
+class ActorResultCacheSingleton:
+    """Singleton class for the ActorResultCache instance.
+
+    The cache is optional. If the instance is not created, the Actor results are not cached.
+    """
+
+    _instance: ActorResultCache | None = None
+
+    @classmethod
+    def create_get_instance(
+        cls,
+        backend: StorageBackend,
+        *,
+        default_ttl_secs: float = DEFAULT_TTL_SECS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> ActorResultCache:
+        """Creates and returns ActorResultCache instance, used for creating the singleton instance.
+
+        Returns:
+            ActorResultCache: ActorResultCache instance.
+        """
+        if cls._instance is None:
+            cls._instance = ActorResultCache(backend, default_ttl_secs=default_ttl_secs, max_entries=max_entries)
+        return cls._instance
+
+    @classmethod
+    def get_instance(cls) -> ActorResultCache | None:
+        """Gets ActorResultCache instance.
+
+        Returns:
+            ActorResultCache | None: ActorResultCache instance or None if the cache is disabled.
+        """
+        return cls._instance
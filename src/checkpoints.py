@@ -0,0 +1,314 @@
+"""This module contains the durable LangGraph checkpointer backed by a persistent storage backend.
+
+The graph checkpoints are kept in memory as with the in-memory saver and the latest checkpoint of every thread
+is persisted to the storage backend (the key-value store of the Actor run). If the Actor migrates, times out
+or crashes in the middle of a ticker, the restarted run resumes the ticker thread from the last completed node,
+so the scraped data and the finished LLM calls are not lost and repeated. A finished thread is replaced by a small
+"done" record with the final values of the thread, so a restarted run does not repeat the finished tickers.
+
+Only the latest checkpoint of each namespace (with its channel values) and its pending writes are persisted.
+The writes are batched: a thread is flushed at most once per flush interval however many steps it made,
+so the persistence adds little overhead per step.
+"""
+
+import asyncio
+import base64
+import contextlib
+import logging
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.storage import StorageBackend, sanitize_key
+
+logger = logging.getLogger('apify')
+
+DEFAULT_FLUSH_INTERVAL_SECS = 2.0
+CHECKPOINT_FORMAT_VERSION = 2
+
+
+def get_checkpoint_key(thread_id: str) -> str:
+    """Get the storage key of the thread checkpoint, the thread IDs like "^GSPC" are sanitized.
+
+    Args:
+        thread_id (str): Graph thread ID.
+
+    Returns:
+        str: Storage key.
+    """
+    return sanitize_key(f'CHECKPOINT-{thread_id}')
+
+
+def _encode(value: object) -> object:
+    """Encode the serialized checkpoint data to JSON, tuples become lists and bytes become base64 objects.
+
+    Returns:
+        object: JSON serializable value.
+    """
+    if isinstance(value, bytes):
+        return {'b64': base64.b64encode(value).decode()}
+    if isinstance(value, tuple | list):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: object) -> Any:  # noqa: ANN401
+    """Decode the checkpoint data encoded by `_encode`.
+
+    Returns:
+        Any: Serialized checkpoint data.
+    """
+    if isinstance(value, dict):
+        return base64.b64decode(value['b64'])
+    if isinstance(value, list):
+        return tuple(_decode(item) for item in value)
+    return value
+
+
+class PersistentCheckpointSaver(BaseCheckpointSaver[int]):
+    """Checkpoint saver persisting the latest checkpoints of the threads to a storage backend.
+
+    Every thread is kept in its own in-memory saver, the thread is restored from the backend when it is accessed
+    for the first time. The saver is built only on the public checkpointer API of the in-memory savers, so it does
+    not depend on their internal storage layout. Only the async checkpointer API, used by the async graph methods,
+    is supported.
+    """
+
+    def __init__(self, backend: StorageBackend, *, flush_interval_secs: float = DEFAULT_FLUSH_INTERVAL_SECS) -> None:
+        super().__init__()
+        self.backend = backend
+        self.flush_interval_secs = flush_interval_secs
+        self._savers: dict[str, MemorySaver] = {}
+        self._dirty_threads: set[str] = set()
+        self._restore_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._flush_requested = asyncio.Event()
+
+    async def dump_thread(self, thread_id: str) -> dict | None:
+        """Dump the latest checkpoint of every namespace of the thread with its pending writes.
+
+        Args:
+            thread_id (str): Graph thread ID.
+
+        Returns:
+            dict | None: JSON serializable thread data, None if the thread has no checkpoints.
+        """
+        if (saver := self._savers.get(thread_id)) is None:
+            return None
+        namespaces = {}
+        # checkpoints of every namespace are listed from the latest one
+        async for checkpoint_tuple in saver.alist({'configurable': {'thread_id': thread_id}}):
+            checkpoint_ns = checkpoint_tuple.config['configurable'].get('checkpoint_ns', '')
+            if checkpoint_ns in namespaces:
+                continue
+            parent_config = checkpoint_tuple.parent_config or {}
+            namespaces[checkpoint_ns] = {
+                'checkpoint': _encode(self.serde.dumps_typed(checkpoint_tuple.checkpoint)),
+                'metadata': _encode(self.serde.dumps_typed(checkpoint_tuple.metadata)),
+                'parent_checkpoint_id': parent_config.get('configurable', {}).get('checkpoint_id'),
+                'writes': _encode(
+                    [
+                        (task_id, channel, self.serde.dumps_typed(value))
+                        for task_id, channel, value in checkpoint_tuple.pending_writes or []
+                    ]
+                ),
+            }
+        if not namespaces:
+            return None
+        return {'version': CHECKPOINT_FORMAT_VERSION, 'namespaces': namespaces}
+
+    async def load_thread(self, saver: MemorySaver, thread_id: str, data: dict) -> None:
+        """Load the thread data dumped by `dump_thread` into the in-memory saver of the thread.
+
+        Args:
+            saver (MemorySaver): In-memory saver of the thread.
+            thread_id (str): Graph thread ID.
+            data (dict): Thread data.
+        """
+        if data.get('version') != CHECKPOINT_FORMAT_VERSION:
+            logger.warning('Ignoring the checkpoint of thread "%s" with an unknown format', thread_id)
+            return
+        for checkpoint_ns, namespace in data['namespaces'].items():
+            checkpoint: Checkpoint = self.serde.loads_typed(_decode(namespace['checkpoint']))
+            config: RunnableConfig = {
+                'configurable': {
+                    'thread_id': thread_id,
+                    'checkpoint_ns': checkpoint_ns,
+                    'checkpoint_id': namespace['parent_checkpoint_id'],
+                }
+            }
+            saved_config = await saver.aput(
+                config,
+                checkpoint,
+                self.serde.loads_typed(_decode(namespace['metadata'])),
+                checkpoint['channel_versions'],
+            )
+            task_writes: dict[str, list[tuple[str, Any]]] = {}
+            for task_id, channel, value in _decode(namespace['writes']):
+                task_writes.setdefault(task_id, []).append((channel, self.serde.loads_typed(value)))
+            for task_id, writes in task_writes.items():
+                await saver.aput_writes(saved_config, writes, task_id)
+
+    async def _get_saver(self, config: RunnableConfig) -> MemorySaver:
+        """Get the in-memory saver of the thread, the thread is restored from the backend when accessed first.
+
+        Returns:
+            MemorySaver: In-memory saver of the thread.
+        """
+        thread_id = config['configurable']['thread_id']
+        if (saver := self._savers.get(thread_id)) is not None:
+            return saver
+        async with self._restore_lock:
+            if (saver := self._savers.get(thread_id)) is None:
+                saver = MemorySaver(serde=self.serde)
+                # a finished thread starts over when it is run again
+                if (data := await self.backend.get_value(get_checkpoint_key(thread_id))) and not data.get('done'):
+                    await self.load_thread(saver, thread_id, data)
+                    logger.info('Restored the checkpoint of thread "%s"', thread_id)
+                self._savers[thread_id] = saver
+        return saver
+
+    def _mark_dirty(self, config: RunnableConfig) -> None:
+        """Mark the thread for the next batched flush."""
+        self._dirty_threads.add(config['configurable']['thread_id'])
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        # the flush waits for the interval, unless it is requested sooner
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval_secs)
+        self._flush_requested.clear()
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Persist the threads changed since the last flush.
+
+        The scheduled flush is woken up and awaited, so no task is left pending after the flush.
+        """
+        if (flush_task := self._flush_task) is not None and flush_task is not asyncio.current_task():
+            self._flush_requested.set()
+            await flush_task
+        async with self._flush_lock:
+            while self._dirty_threads:
+                thread_id = self._dirty_threads.pop()
+                try:
+                    if (data := await self.dump_thread(thread_id)) is not None:
+                        await self.backend.set_value(get_checkpoint_key(thread_id), data)
+                except Exception:
+                    logger.exception('Failed to persist the checkpoint of thread "%s"', thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get the checkpoint tuple, the thread is restored from the backend first.
+
+        Returns:
+            CheckpointTuple | None: Checkpoint tuple or None if not found.
+        """
+        saver = await self._get_saver(config)
+        return await saver.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List the checkpoints, the thread is restored from the backend first.
+
+        Without the config, the checkpoints of the threads accessed in this run are listed.
+
+        Yields:
+            CheckpointTuple: Checkpoint tuples.
+        """
+        savers = list(self._savers.values()) if config is None else [await self._get_saver(config)]
+        for saver in savers:
+            async for checkpoint_tuple in saver.alist(config, filter=filter, before=before, limit=limit):
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save the checkpoint and schedule the thread flush.
+
+        Returns:
+            RunnableConfig: Config of the saved checkpoint.
+        """
+        saver = await self._get_saver(config)
+        saved_config = await saver.aput(config, checkpoint, metadata, new_versions)
+        self._mark_dirty(config)
+        return saved_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = '',
+    ) -> None:
+        """Save the pending writes of the task and schedule the thread flush."""
+        saver = await self._get_saver(config)
+        await saver.aput_writes(config, writes, task_id, task_path)
+        self._mark_dirty(config)
+
+    async def mark_thread_done(self, thread_id: str, values: dict[str, Any]) -> None:
+        """Replace the checkpoints of the finished thread by a "done" record with the final values of the thread.
+
+        The thread is dropped from the memory. The record is written under the flush lock, so a running flush does
+        not overwrite it with the last checkpoint of the thread.
+
+        Args:
+            thread_id (str): Graph thread ID.
+            values (dict[str, Any]): Final values of the thread, returned by `aget_done_values`.
+        """
+        async with self._flush_lock:
+            self._dirty_threads.discard(thread_id)
+            self._savers.pop(thread_id, None)
+            data = {
+                'version': CHECKPOINT_FORMAT_VERSION,
+                'done': True,
+                'values': _encode(self.serde.dumps_typed(values)),
+            }
+            await self.backend.set_value(get_checkpoint_key(thread_id), data)
+
+    async def aget_done_values(self, thread_id: str) -> dict[str, Any] | None:
+        """Get the final values of the thread marked as done by `mark_thread_done`.
+
+        Args:
+            thread_id (str): Graph thread ID.
+
+        Returns:
+            dict[str, Any] | None: Final values of the thread, None if the thread is not done.
+        """
+        if thread_id in self._savers:
+            return None
+        data = await self.backend.get_value(get_checkpoint_key(thread_id))
+        if not data or not data.get('done') or data.get('version') != CHECKPOINT_FORMAT_VERSION:
+            return None
+        values: dict[str, Any] = self.serde.loads_typed(_decode(data['values']))
+        return values
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete the thread from the memory and from the backend."""
+        self._dirty_threads.discard(thread_id)
+        self._savers.pop(thread_id, None)
+        await self.backend.delete_value(get_checkpoint_key(thread_id))
@@ -0,0 +1,231 @@
+"""This module contains the compaction of the tool outputs before they enter the LLM context.
+
+Tool outputs are serialized into the message history of the ReAct agent loop and re-sent on every LLM turn.
+The compaction groups the syndicated news stories, keeps only the recent financial years and encodes
+the data as compact pipe-separated tables instead of JSON. Every tool output is cut to fit its token budget,
+the tokens are counted with the local tiktoken tokenizer.
+"""
+
+import functools
+import logging
+from collections.abc import Sequence
+
+import tiktoken
+from langchain_core.tools import BaseTool, StructuredTool
+
+from src.dedup import cluster_news
+from src.models import GoogleTickerInfo, PriceSeriesStats, TickerNewsEntry
+
+logger = logging.getLogger('apify')
+
+TOKENIZER_ENCODING = 'o200k_base'
+DEFAULT_TOKEN_BUDGET = 1000
+TOOL_TOKEN_BUDGETS = {
+    'tool_get_google_news': 1000,
+    'tool_get_google_ticker_info': 600,
+}
+MAX_FINANCIAL_YEARS = 3
+MAX_ABOUT_CHARS = 400
+PRICE_SERIES_COLUMNS = (
+    'series',
+    'period',
+    'last',
+    'low-high',
+    'change_pct',
+    'volatility_pct',
+    'annual_volatility_pct',
+    'max_drawdown_pct',
+    'moving_averages',
+)
+
+
+@functools.cache
+def _get_encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:  # noqa: BLE001
+        # the encoding is downloaded on first use, fall back to the estimate if it is not available (offline)
+        logger.warning('Failed to load the %s tokenizer, estimating token counts: %s', TOKENIZER_ENCODING, e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count the LLM tokens of the text.
+
+    Args:
+        text (str): Text.
+
+    Returns:
+        int: Number of tokens, estimated from the text length if the tokenizer is not available.
+    """
+    if (encoding := _get_encoding()) is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def fit_token_budget(lines: Sequence[str], token_budget: int, *, min_lines: int = 1) -> str:
+    """Join the lines, the trailing lines that do not fit the token budget are left out.
+
+    Args:
+        lines (Sequence[str]): Lines in the priority order.
+        token_budget (int): Maximum number of tokens.
+        min_lines (int): Number of leading lines (for example a table header) always included.
+
+    Returns:
+        str: Joined lines with a note about the omitted lines.
+    """
+    included: list[str] = []
+    tokens = 0
+    for line in lines:
+        line_tokens = count_tokens(line) + 1
+        if len(included) >= min_lines and tokens + line_tokens > token_budget:
+            break
+        included.append(line)
+        tokens += line_tokens
+
+    if omitted := len(lines) - len(included):
+        included.append(f'({omitted} more rows omitted)')
+    return '\n'.join(included)
+
+
+def _format_value(value: object) -> str:
+    if value is None:
+        return ''
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+
+def format_table(columns: Sequence[str], rows: Sequence[Sequence[object]]) -> list[str]:
+    """Format the rows as a compact pipe-separated table.
+
+    Args:
+        columns (Sequence[str]): Column names.
+        rows (Sequence[Sequence[object]]): Table rows.
+
+    Returns:
+        list[str]: Table lines, the first line is the header.
+    """
+    return ['|'.join(columns), *('|'.join(_format_value(value) for value in row) for row in rows)]
+
+
+def compact_news(news: Sequence[TickerNewsEntry], *, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Compact the news for the LLM context, the most recent news are kept.
+
+    Only the number of the other sources of the syndicated stories is included, not their URLs.
+
+    Args:
+        news (Sequence[TickerNewsEntry]): News entries.
+        token_budget (int): Maximum number of tokens.
+
+    Returns:
+        str: News as a compact table.
+    """
+    entries = sorted(cluster_news(news), key=lambda entry: entry.published_at, reverse=True)
+    rows = [(entry.published_at, entry.provider, entry.title, entry.url, len(entry.sources)) for entry in entries]
+    columns = ('published_at', 'provider', 'title', 'url', 'other_sources')
+    return fit_token_budget(format_table(columns, rows), token_budget)
+
+
+def format_price_series_row(name: str, stats: PriceSeriesStats) -> tuple[object, ...]:
+    """Format the price series statistics as a table row, see PRICE_SERIES_COLUMNS.
+
+    Args:
+        name (str): Series name.
+        stats (PriceSeriesStats): Series statistics.
+
+    Returns:
+        tuple[object, ...]: Table row.
+    """
+    moving_averages = ' '.join(f'{key}={value}' for key, value in stats.moving_averages.items())
+    return (
+        name,
+        f'{stats.start}..{stats.end}',
+        stats.last,
+        f'{stats.low}-{stats.high}',
+        stats.change_pct,
+        stats.volatility_pct,
+        stats.annualized_volatility_pct,
+        stats.max_drawdown_pct,
+        moving_averages,
+    )
+
+
+def compact_ticker_info(ticker_info: GoogleTickerInfo, *, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Compact the ticker info for the LLM context, only the recent financial years are kept.
+
+    Args:
+        ticker_info (GoogleTickerInfo): Ticker info.
+        token_budget (int): Maximum number of tokens.
+
+    Returns:
+        str: Ticker info as compact key-value lines and a table of the yearly financials.
+    """
+    about = ticker_info.about
+    if len(about) > MAX_ABOUT_CHARS:
+        about = f'{about[:MAX_ABOUT_CHARS].rsplit(" ", 1)[0]}...'
+    price_year_range = '-'.join(_format_value(price) for price in ticker_info.price_year_range or ())
+
+    lines = [
+        f'current_price: {ticker_info.current_price}',
+        f'pe_ratio: {_format_value(ticker_info.pe_ratio)}',
+        f'price_year_range: {price_year_range}',
+        f'ceo: {ticker_info.ceo}',
+        f'founded: {ticker_info.founded}',
+        f'about: {about}',
+    ]
+    price_series = {'intraday': ticker_info.intraday_prices, 'last_30_days': ticker_info.last_30_days_prices}
+    if price_rows := [format_price_series_row(name, stats) for name, stats in price_series.items() if stats]:
+        lines.extend(['price_series:', *format_table(PRICE_SERIES_COLUMNS, price_rows)])
+    financials = sorted(ticker_info.yerly_financials, key=lambda financial: financial.year, reverse=True)
+    if financials := financials[:MAX_FINANCIAL_YEARS]:
+        columns = tuple(financials[0].model_dump())
+        rows = [tuple(financial.model_dump().values()) for financial in financials]
+        lines.extend(['yearly_financials:', *format_table(columns, rows)])
+    return fit_token_budget(lines, token_budget)
+
+
+def compact_tool_output(tool_name: str, output: object, *, token_budget: int | None = None) -> str:
+    """Compact the tool output for the LLM context.
+
+    Outputs of the tools without a specific compaction are only cut to fit the token budget.
+
+    Args:
+        tool_name (str): Tool name.
+        output (object): Tool output.
+        token_budget (int | None): Maximum number of tokens, the tool default if not set.
+
+    Returns:
+        str: Compacted tool output.
+    """
+    if token_budget is None:
+        token_budget = TOOL_TOKEN_BUDGETS.get(tool_name, DEFAULT_TOKEN_BUDGET)
+
+    if isinstance(output, GoogleTickerInfo):
+        return compact_ticker_info(output, token_budget=token_budget)
+    if isinstance(output, list) and all(isinstance(entry, TickerNewsEntry) for entry in output):
+        return compact_news(output, token_budget=token_budget)
+    return fit_token_budget(str(output).splitlines(), token_budget)
+
+
+def compact_tool(tool: BaseTool, *, token_budget: int | None = None) -> BaseTool:
+    """Wrap the tool, so its output is compacted before it enters the LLM context.
+
+    The wrapped tool keeps the name, the description and the arguments of the original tool.
+
+    Args:
+        tool (BaseTool): Tool to wrap.
+        token_budget (int | None): Maximum number of tokens of the tool output, the tool default if not set.
+
+    Returns:
+        BaseTool: Tool with the compacted output.
+    """
+
+    async def _run(**kwargs: object) -> str:
+        output = await tool.ainvoke(kwargs)
+        return compact_tool_output(tool.name, output, token_budget=token_budget)
+
+    return StructuredTool.from_function(
+        coroutine=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
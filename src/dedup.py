@@ -0,0 +1,160 @@
+"""This module contains the near-duplicate detection of the news headlines.
+
+Google News returns the same story syndicated by many providers. The headlines are split into character shingles
+and summarized by MinHash signatures, the locality-sensitive hashing (LSH) over the signature bands finds
+the candidate duplicates without comparing all the pairs. Candidates with the estimated similarity over
+the threshold are grouped into one story, the first entry represents the story and lists the source URLs
+of the others. Entries are compared only to the story representatives, so the stories do not chain together.
+
+The signatures use the one permutation hashing: every shingle is hashed only once and the hash selects
+the signature bin and the value, so computing a signature is linear in the number of shingles. Short headlines
+leave some of the bins empty, the empty bins carry no information and are left out of the comparison.
+"""
+
+import hashlib
+import re
+from collections.abc import Sequence
+
+from src.models import TickerNewsEntry
+
+SHINGLE_SIZE = 4
+NUM_BANDS = 8
+ROWS_PER_BAND = 4
+SIGNATURE_SIZE = NUM_BANDS * ROWS_PER_BAND
+SIMILARITY_THRESHOLD = 0.6
+
+_EMPTY_BIN = -1
+_NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_title(title: str) -> str:
+    """Normalize the news headline for the comparison.
+
+    The publisher suffix (for example " - Reuters"), the letter case and the punctuation are removed.
+
+    Args:
+        title (str): News headline.
+
+    Returns:
+        str: Normalized headline.
+    """
+    if ' - ' in title:
+        title = title.rsplit(' - ', 1)[0]
+    return _NON_WORD_PATTERN.sub(' ', title.lower()).strip()
+
+
+def get_shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    """Split the text into overlapping character shingles.
+
+    Args:
+        text (str): Text.
+        size (int): Shingle length.
+
+    Returns:
+        set[str]: Unique shingles, the whole text for texts shorter than the shingle.
+    """
+    if len(text) <= size:
+        return {text}
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def get_minhash_signature(shingles: set[str]) -> tuple[int, ...]:
+    """Compute the MinHash signature of the shingles.
+
+    Args:
+        shingles (set[str]): Shingles.
+
+    Returns:
+        tuple[int, ...]: MinHash signature with SIGNATURE_SIZE values.
+    """
+    # the built-in string hash is randomized per process, the signatures must not depend on the process
+    signature = [_EMPTY_BIN] * SIGNATURE_SIZE
+    for shingle in shingles:
+        shingle_hash = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest())
+        value, bin_index = divmod(shingle_hash, SIGNATURE_SIZE)
+        if signature[bin_index] == _EMPTY_BIN or value < signature[bin_index]:
+            signature[bin_index] = value
+    return tuple(signature)
+
+
+def estimate_similarity(signature: Sequence[int], other: Sequence[int]) -> float:
+    """Estimate the Jaccard similarity of the shingle sets from their MinHash signatures.
+
+    The bins empty in both signatures are not counted.
+
+    Args:
+        signature (Sequence[int]): MinHash signature.
+        other (Sequence[int]): Other MinHash signature.
+
+    Returns:
+        float: Estimated Jaccard similarity, 0 if all the bins are empty.
+    """
+    matches = bins = 0
+    for a, b in zip(signature, other, strict=True):
+        if a == b == _EMPTY_BIN:
+            continue
+        bins += 1
+        matches += a == b
+    return matches / bins if bins else 0.0
+
+
+def cluster_titles(titles: Sequence[str], *, similarity_threshold: float = SIMILARITY_THRESHOLD) -> list[list[int]]:
+    """Group the near-duplicate titles.
+
+    Args:
+        titles (Sequence[str]): Titles.
+        similarity_threshold (float): Minimal estimated similarity of the near-duplicate titles.
+
+    Returns:
+        list[list[int]]: Groups of the title indexes, in the order of their first title.
+    """
+    signatures = [get_minhash_signature(get_shingles(normalize_title(title))) for title in titles]
+    # index of the group representative, titles are compared only to the representatives to avoid chaining
+    representatives = list(range(len(titles)))
+
+    buckets: dict[tuple[int, ...], list[int]] = {}
+    for i, signature in enumerate(signatures):
+        bands = [(band, *signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]) for band in range(NUM_BANDS)]
+        # all-empty bands would make all the short titles candidates of each other
+        band_keys = [band_key for band_key in bands if any(row != _EMPTY_BIN for row in band_key[1:])]
+        candidates = {j for band_key in band_keys for j in buckets.get(band_key, ())}
+        for j in sorted(candidates):
+            if estimate_similarity(signature, signatures[j]) >= similarity_threshold:
+                representatives[i] = j
+                break
+        else:
+            # only the representatives are added to the buckets, so the buckets stay small
+            for band_key in band_keys:
+                buckets.setdefault(band_key, []).append(i)
+
+    groups: dict[int, list[int]] = {}
+    for i, representative in enumerate(representatives):
+        groups.setdefault(representative, []).append(i)
+    return list(groups.values())
+
+
+def cluster_news(
+    news: Sequence[TickerNewsEntry], *, similarity_threshold: float = SIMILARITY_THRESHOLD
+) -> list[TickerNewsEntry]:
+    """Group the syndicated news stories, each story is represented by its first entry.
+
+    The URLs of the other entries of the story (and their sources) are added to the sources of the representative.
+
+    Args:
+        news (Sequence[TickerNewsEntry]): News entries.
+        similarity_threshold (float): Minimal estimated similarity of the headlines of the same story.
+
+    Returns:
+        list[TickerNewsEntry]: One entry per story.
+    """
+    stories = []
+    for group in cluster_titles([entry.title for entry in news], similarity_threshold=similarity_threshold):
+        representative, *duplicates = (news[i] for i in group)
+        if duplicates:
+            sources = [*representative.sources]
+            for duplicate in duplicates:
+                sources.extend([duplicate.url, *duplicate.sources])
+            sources = [url for url in dict.fromkeys(sources) if url != representative.url]
+            representative = representative.model_copy(update={'sources': sources})
+        stories.append(representative)
+    return stories
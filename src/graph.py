@@ -5,28 +5,33 @@ Resources:
     - https://langchain-ai.github.io/langgraph/concepts/low_level/#graphs
 """
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 from langgraph.graph.state import CompiledStateGraph
 
-from src.agents import agent_analysis, agent_report, supervisor
+from src.agents import agent_analysis, agent_report, prefetch, supervisor
 from src.state import State
 
 
-def build_compiled_graph() -> CompiledStateGraph:
+def build_compiled_graph(checkpointer: BaseCheckpointSaver | None = None) -> CompiledStateGraph:
     """Build the compiled state graph for the agent.
 
+    Args:
+        checkpointer (BaseCheckpointSaver | None): Graph checkpointer, the checkpoints are kept in memory if not set.
+
     Returns:
         CompiledStateGraph: Compiled graph.
     """
     builder = StateGraph(State)
     builder.add_node(supervisor)
+    builder.add_node(prefetch)
     builder.add_node(agent_analysis)
     builder.add_node(agent_report)
 
     builder.set_entry_point('supervisor')
+    builder.add_edge('prefetch', 'supervisor')
     builder.add_edge('agent_analysis', 'supervisor')
     builder.add_edge('agent_report', END)
 
-    memory = MemorySaver()
-    return builder.compile(checkpointer=memory)
+    return builder.compile(checkpointer=checkpointer or MemorySaver())
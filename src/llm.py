@@ -1,40 +1,154 @@
-"""This module contains the singleton class for ChatOpenAI instance."""
+"""This module contains the singleton class for ChatOpenAI instances."""
 
+from collections.abc import Mapping, Sequence
+from typing import Any, ClassVar
+
+from langchain_core.caches import BaseCache
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
 from langchain_openai import ChatOpenAI
+from langgraph.prebuilt import create_react_agent
+from langgraph.pregel import Pregel
+
+from src.transport import AdaptiveRateLimiter, create_http_client
+
+OPENAI_MAX_IN_FLIGHT = 16
 
 
 class ChatOpenAISingleton:
-    """Singleton class for ChatOpenAI instance.
+    """Singleton class for ChatOpenAI instances.
+
+    To use the singleton class, call the create_get_instance method to create the instances and get the default
+    instance. After creating the instances, you can get them using the get_instance method. For example, you can create
+    the instances in the main function and get the instance in the agents.
+
+    The instances are kept in a registry keyed by the model name. The default model is used by all the graph nodes
+    unless the node has its own model configured, for example the mechanical tool-calling loop of the analysis can
+    run on a cheaper and faster model than the report.
 
-    To use the singleton class, call the create_get_instance method to create the instance and get the instance.
-    After creating the instance, you can get the instance using the get_instance method. For example, you can create the
-    instance in the main function and get the instance in the agents.
+    Runnables derived from the instances (the ReAct agent subgraphs and the structured output runnables) are built once
+    and cached, so the graph compilation and the JSON schema generation are not repeated for every invocation.
+
+    The OpenAI requests of all the tickers share one pooled HTTP client per model, capped to `OPENAI_MAX_IN_FLIGHT`
+    requests in flight and paced by the rate limit headers of the OpenAI responses (see src/transport.py), the rate
+    limits are per model.
+
+    Optionally, the LLM responses are cached by the LLM cache (see src/llm_cache.py), the cache key covers the messages,
+    the model and the bound tools/output schema.
     """
 
-    _instance: ChatOpenAI | None = None
+    _instances: ClassVar[dict[str, ChatOpenAI]] = {}
+    _default_model: str | None = None
+    _node_models: ClassVar[dict[str, str]] = {}
+    _rate_limiters: ClassVar[dict[str, AdaptiveRateLimiter]] = {}
+    _react_agents: ClassVar[dict[tuple[str, ...], Pregel]] = {}
+    _structured_runnables: ClassVar[dict[tuple[str, str, bool], Runnable]] = {}
 
     @classmethod
-    def create_get_instance(cls, model: str) -> ChatOpenAI:
-        """Creates and returns ChatOpenAI instance, used for creating the singleton instance.
+    def create_get_instance(
+        cls, model: str, *, cache: BaseCache | None = None, node_models: Mapping[str, str] | None = None
+    ) -> ChatOpenAI:
+        """Creates the ChatOpenAI instances and returns the default one, used for creating the singleton instances.
+
+        Args:
+            model (str): Default OpenAI model name.
+            cache (BaseCache | None): LLM response cache, the responses are not cached if not set.
+            node_models (Mapping[str, str] | None): OpenAI model names of the graph nodes not using the default model.
 
         Returns:
-            ChatOpenAI: ChatOpenAI instance
+            ChatOpenAI: Default ChatOpenAI instance
         """
-        if cls._instance is None:
-            cls._instance = ChatOpenAI(model=model)
-        return cls._instance
+        if cls._default_model is None:
+            cls._default_model = model
+            cls._node_models.update(node_models or {})
+            for model_name in {model, *cls._node_models.values()}:
+                rate_limiter = cls._rate_limiters[model_name] = AdaptiveRateLimiter()
+                http_client = create_http_client(max_in_flight=OPENAI_MAX_IN_FLIGHT, rate_limiter=rate_limiter)
+                cls._instances[model_name] = ChatOpenAI(model=model_name, cache=cache, http_async_client=http_client)
+        return cls.get_instance()
 
     @classmethod
-    def get_instance(cls) -> ChatOpenAI:
-        """Gets ChatOpenAI instance.
+    def get_model_name(cls, node: str | None = None) -> str:
+        """Gets the OpenAI model name of the graph node.
+
+        Args:
+            node (str | None): Graph node name, the default model name is returned if not set.
 
         Returns:
-            ChatOpenAI: ChatOpenAI instance.
+            str: OpenAI model name.
 
         Raises:
-            ValueError: If instance is not created yet.
+            ValueError: If instances are not created yet.
         """
-        if cls._instance is None:
+        if cls._default_model is None:
             msg = 'ChatOpenAI instance not created yet!'
             raise ValueError(msg)
-        return cls._instance
+        if node is None:
+            return cls._default_model
+        return cls._node_models.get(node, cls._default_model)
+
+    @classmethod
+    def get_instance(cls, node: str | None = None) -> ChatOpenAI:
+        """Gets ChatOpenAI instance of the graph node.
+
+        Args:
+            node (str | None): Graph node name, the default instance is returned if not set.
+
+        Returns:
+            ChatOpenAI: ChatOpenAI instance.
+        """
+        return cls._instances[cls.get_model_name(node)]
+
+    @classmethod
+    def get_rate_limiters(cls) -> dict[str, AdaptiveRateLimiter]:
+        """Gets the rate limiters of the OpenAI requests.
+
+        Returns:
+            dict[str, AdaptiveRateLimiter]: Rate limiters by the model name.
+        """
+        return dict(cls._rate_limiters)
+
+    @classmethod
+    def get_react_agent(cls, tools: Sequence[BaseTool], *, node: str | None = None) -> Pregel:
+        """Gets the ReAct agent subgraph with the tools bound to the ChatOpenAI instance of the graph node.
+
+        Args:
+            tools (Sequence[BaseTool]): Tools available to the agent.
+            node (str | None): Graph node name, the default instance is used if not set.
+
+        Returns:
+            Pregel: Compiled ReAct agent subgraph.
+        """
+        model_name = cls.get_model_name(node)
+        key = (model_name, *(tool.name for tool in tools))
+        if (agent := cls._react_agents.get(key)) is None:
+            agent = cls._react_agents[key] = create_react_agent(cls._instances[model_name], tools)
+        return agent
+
+    @classmethod
+    def get_structured_instance(
+        cls, schema: dict[str, Any], *, node: str | None = None, streaming: bool = False
+    ) -> Runnable:
+        """Gets the ChatOpenAI instance of the graph node with the structured output for the JSON schema.
+
+        The streaming instance streams the response from OpenAI on the cache miss, the tokens are passed
+        to the `on_llm_new_token` callbacks and the whole response is still cached. Cached responses are returned
+        at once.
+
+        Args:
+            schema (dict[str, Any]): JSON schema of the output, the schema title is used as the cache key.
+            node (str | None): Graph node name, the default instance is used if not set.
+            streaming (bool): Whether to stream the response.
+
+        Returns:
+            Runnable: ChatOpenAI instance with structured output.
+        """
+        model_name = cls.get_model_name(node)
+        key = (model_name, schema['title'], streaming)
+        if (runnable := cls._structured_runnables.get(key)) is None:
+            llm = cls._instances[model_name]
+            if streaming:
+                # the token usage is not included in the streamed response by default
+                llm = llm.model_copy(update={'streaming': True, 'stream_usage': True})
+            runnable = cls._structured_runnables[key] = llm.with_structured_output(schema)
+        return runnable
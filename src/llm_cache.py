@@ -0,0 +1,237 @@
+"""This module contains the LLM response cache for the analysis and report calls.
+
+Re-running the same ticker on the same day (retries, re-scheduled runs, debug reruns) sends the same prompts
+to OpenAI again. The cache stores the LLM responses in a local SQLite database keyed on the normalized messages,
+the model and the bound tools/output schema (both are part of the LangChain "llm_string"). Entries expire after
+a TTL and the least recently used entries are evicted when the cache is full.
+
+Cache hits are returned with zeroed token usage, so they are not counted (and charged) as OpenAI token usage.
+The tokens saved by the cache hits are reported separately in the cache statistics.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import TypedDict
+
+from apify import Actor
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+logger = logging.getLogger('apify')
+
+LLM_CACHE_DB_KEY = 'LLM_CACHE_DB'
+DEFAULT_LLM_CACHE_PATH = Path('storage/llm_cache.sqlite')
+DEFAULT_TTL_SECS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+# message fields that differ between otherwise identical conversations
+_VOLATILE_MESSAGE_FIELDS = ('id', 'response_metadata', 'usage_metadata')
+
+
+class LLMCacheStats(TypedDict):
+    """LLM cache hit/miss counters."""
+
+    hits: int
+    misses: int
+    evictions: int
+    saved_tokens: int
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize the serialized prompt messages, so the volatile message fields do not affect the cache key.
+
+    Args:
+        prompt (str): Serialized prompt messages.
+
+    Returns:
+        str: Normalized prompt.
+    """
+    try:
+        messages = json.loads(prompt)
+    except json.JSONDecodeError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+
+    for message in messages:
+        if isinstance(message, dict) and isinstance(kwargs := message.get('kwargs'), dict):
+            for field in _VOLATILE_MESSAGE_FIELDS:
+                kwargs.pop(field, None)
+    return json.dumps(messages, sort_keys=True, separators=(',', ':'))
+
+
+def make_llm_cache_key(prompt: str, llm_string: str) -> str:
+    """Create the cache key from the prompt and the LLM string (model, parameters, tools).
+
+    Args:
+        prompt (str): Serialized prompt messages.
+        llm_string (str): Serialized LLM configuration.
+
+    Returns:
+        str: Cache key.
+    """
+    return hashlib.sha256(f'{llm_string}\0{normalize_prompt(prompt)}'.encode()).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """LLM response cache with TTL and LRU eviction backed by a local SQLite database."""
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_LLM_CACHE_PATH,
+        *,
+        ttl_secs: float = DEFAULT_TTL_SECS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_tokens = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # the async cache methods run the sync ones in a thread pool
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._connection.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        """Look up the cached LLM response.
+
+        Returns:
+            RETURN_VAL_TYPE | None: Cached generations or None on cache miss.
+        """
+        key = make_llm_cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute('SELECT value, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] + self.ttl_secs <= now:
+                self.misses += 1
+                return None
+            self._connection.execute('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key))
+            self._connection.commit()
+            self.hits += 1
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            generations = [loads(value) for value in json.loads(row[0])]
+        logger.debug('LLM cache hit for key %s', key)
+        return [self._mark_cache_hit(generation) for generation in generations]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the LLM response in the cache."""
+        key = make_llm_cache_key(prompt, llm_string)
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)',
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def clear(self, **_: object) -> None:
+        """Clear the cache."""
+        with self._lock:
+            self._connection.execute('DELETE FROM llm_cache')
+            self._connection.commit()
+
+    def dump(self) -> bytes:
+        """Dump the database, the cache stays open and consistent while it is dumped.
+
+        Returns:
+            bytes: Database file content.
+        """
+        with self._lock:
+            return self._connection.serialize()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def stats(self) -> LLMCacheStats:
+        """Get the cache statistics.
+
+        Returns:
+            LLMCacheStats: Cache hit/miss counters and the tokens saved by the cache hits.
+        """
+        return LLMCacheStats(
+            hits=self.hits, misses=self.misses, evictions=self.evictions, saved_tokens=self.saved_tokens
+        )
+
+    def _evict(self, now: float) -> None:
+        """Evict the expired entries and then the least recently used ones over the limit."""
+        cursor = self._connection.execute('DELETE FROM llm_cache WHERE created_at + ? <= ?', (self.ttl_secs, now))
+        self.evictions += cursor.rowcount
+        cursor = self._connection.execute(
+            'DELETE FROM llm_cache WHERE key IN '
+            '(SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        )
+        self.evictions += cursor.rowcount
+
+    def _mark_cache_hit(self, generation: Generation) -> Generation:
+        """Zero out the token usage of the cached generation, so the cache hit is not charged.
+
+        Returns:
+            Generation: Cached generation with zero token usage.
+        """
+        if not isinstance(generation, ChatGeneration) or not isinstance(generation.message, AIMessage):
+            return generation
+
+        message = generation.message
+        if message.usage_metadata:
+            self.saved_tokens += message.usage_metadata.get('total_tokens', 0)
+        generation.message = message.model_copy(
+            update={
+                'usage_metadata': {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0},
+                'response_metadata': {**message.response_metadata, 'token_usage': {}, 'llm_cache_hit': True},
+            }
+        )
+        return generation
+
+
+async def restore_llm_cache_db(path: str | Path, store_name: str) -> None:
+    """Restore the LLM cache database file from the named key-value store, so the cache persists across Actor runs.
+
+    Args:
+        path (str | Path): Local database path.
+        store_name (str): Key-value store name.
+    """
+    store = await Actor.open_key_value_store(name=store_name)
+    if (data := await store.get_value(LLM_CACHE_DB_KEY)) is None:
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+async def persist_llm_cache_db(cache: SQLiteLLMCache, store_name: str) -> None:
+    """Persist the LLM cache database file into the named key-value store.
+
+    The cache can still be used after it is persisted, for example by the standby server persisting it
+    before the Actor migrates.
+
+    Args:
+        cache (SQLiteLLMCache): LLM cache.
+        store_name (str): Key-value store name.
+    """
+    store = await Actor.open_key_value_store(name=store_name)
+    await store.set_value(LLM_CACHE_DB_KEY, cache.dump(), content_type='application/octet-stream')
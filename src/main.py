@@ -1,22 +1,308 @@
+"""This module contains the Actor entry point.
+
+Only the Apify SDK is imported at the module level. The agent modules (LangGraph, LangChain, the OpenAI client)
+take the most of the start-up time, so they are imported only once the input is validated and only the ones
+the input enables, an invalid input fails fast and the standby server imports them just once.
+"""
+
+import datetime
+import functools
 import logging
 from typing import TYPE_CHECKING
 
-from apify import Actor
-from langchain_community.callbacks import get_openai_callback
+from apify import Actor, Event
 
-from src.graph import build_compiled_graph
-from src.llm import ChatOpenAISingleton
-from src.ppe_utils import charge_for_actor_start, charge_for_model_tokens
+from src.ppe_utils import MODEL_PPE_EVENT
 
 if TYPE_CHECKING:
-    from langchain_core.runnables.config import RunnableConfig
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+    from langgraph.graph.state import CompiledStateGraph
 
-    from src.models import OutputTickerReport
+    from src.llm_cache import SQLiteLLMCache
+    from src.scheduler import Watchlist
+    from src.usage import UsageMeter
 
 logger = logging.getLogger('apify')
 
+STANDBY_META_ORIGIN = 'STANDBY'
+DEFAULT_MAX_CONCURRENCY = 5
+
+
+def get_input_tickers(actor_input: dict) -> list[str]:
+    """Get the list of tickers to analyze from the Actor input.
+
+    Both the single "ticker" and the "tickers" list attributes are supported, duplicates are removed.
+
+    Args:
+        actor_input (dict): Actor input.
+
+    Returns:
+        list[str]: Unique ticker symbols in the input order.
+    """
+    tickers = []
+    if ticker := actor_input.get('ticker'):
+        tickers.append(ticker)
+    tickers.extend(actor_input.get('tickers') or [])
+    return list(dict.fromkeys(ticker.strip().upper() for ticker in tickers if ticker and ticker.strip()))
+
+
+def get_input_models(actor_input: dict) -> tuple[str, str | None]:
+    """Get the OpenAI models from the Actor input, only the models with a charged event are supported.
+
+    Args:
+        actor_input (dict): Actor input.
+
+    Returns:
+        tuple[str, str | None]: Model and the analysis model, None if the analysis runs on the model.
+
+    Raises:
+        ValueError: If a model is not supported, its tokens could not be charged.
+    """
+    model = actor_input.get('model', 'gpt-4o-mini')  # Default model if not provided
+    analysis_model = actor_input.get('analysisModel')
+    for model_name in (model, analysis_model):
+        if model_name is not None and model_name not in MODEL_PPE_EVENT:
+            msg = f'Unsupported model "{model_name}" in input, supported models are: {", ".join(MODEL_PPE_EVENT)}!'
+            raise ValueError(msg)
+    return model, analysis_model
+
+
+async def setup_llm_cache() -> 'SQLiteLLMCache':
+    """Set up the LLM response cache, the cache database is restored from the previous Actor runs.
+
+    Returns:
+        SQLiteLLMCache: LLM response cache.
+    """
+    from src.cache import CACHE_STORE_NAME
+    from src.llm_cache import DEFAULT_LLM_CACHE_PATH, SQLiteLLMCache, restore_llm_cache_db
+
+    await restore_llm_cache_db(DEFAULT_LLM_CACHE_PATH, CACHE_STORE_NAME)
+    return SQLiteLLMCache(DEFAULT_LLM_CACHE_PATH)
+
+
+def setup_agent(  # noqa: PLR0913
+    model: str,
+    *,
+    analysis_model: str | None = None,
+    use_scraper_cache: bool = True,
+    llm_cache: 'SQLiteLLMCache | None' = None,
+    incremental: bool = False,
+    checkpointer: 'BaseCheckpointSaver | None' = None,
+) -> 'CompiledStateGraph':
+    """Set up the shared agent resources and build the graph.
+
+    Args:
+        model (str): OpenAI model name.
+        analysis_model (str | None): OpenAI model name of the analysis tool-calling loop, the model is used if not set.
+        use_scraper_cache (bool): Whether to cache the scraper Actor results.
+        llm_cache (SQLiteLLMCache | None): LLM response cache, the responses are not cached if not set.
+        incremental (bool): Whether to analyze only the changes since the last run of the ticker.
+        checkpointer (BaseCheckpointSaver | None): Graph checkpointer, the checkpoints are kept in memory if not set.
+
+    Returns:
+        CompiledStateGraph: Compiled agent graph.
+    """
+    from src.cache import CACHE_STORE_NAME, ActorResultCacheSingleton
+    from src.graph import build_compiled_graph
+    from src.llm import ChatOpenAISingleton
+    from src.snapshots import SNAPSHOT_STORE_NAME, TickerSnapshotStoreSingleton
+    from src.storage import KeyValueStoreBackend
+    from src.symbols import StockIdResolverSingleton
+
+    # Create ChatOpenAI singleton instances, the analysis can run on its own (cheaper) model
+    node_models = {'agent_analysis': analysis_model} if analysis_model else None
+    ChatOpenAISingleton.create_get_instance(model=model, cache=llm_cache, node_models=node_models)
+
+    # Cache the scraper Actor results across tickers and Actor runs
+    if use_scraper_cache:
+        ActorResultCacheSingleton.create_get_instance(KeyValueStoreBackend(CACHE_STORE_NAME))
+    StockIdResolverSingleton.create_get_instance(KeyValueStoreBackend(CACHE_STORE_NAME))
+    # Keep the per-ticker snapshots for the incremental monitoring
+    if incremental:
+        TickerSnapshotStoreSingleton.create_get_instance(KeyValueStoreBackend(SNAPSHOT_STORE_NAME))
+
+    # Create the graph, it is shared by all the tickers
+    return build_compiled_graph(checkpointer=checkpointer)
+
+
+async def setup_agent_from_input(
+    actor_input: dict, *, checkpointer: 'BaseCheckpointSaver | None' = None
+) -> tuple['CompiledStateGraph', 'SQLiteLLMCache | None']:
+    """Set up the LLM response cache and build the graph configured by the Actor input.
+
+    Args:
+        actor_input (dict): Actor input.
+        checkpointer (BaseCheckpointSaver | None): Graph checkpointer, the checkpoints are kept in memory if not set.
+
+    Returns:
+        tuple[CompiledStateGraph, SQLiteLLMCache | None]: Compiled agent graph and the LLM cache, None if disabled.
+    """
+    model, analysis_model = get_input_models(actor_input)
+    llm_cache = await setup_llm_cache() if actor_input.get('useLlmCache', True) else None
+    graph = setup_agent(
+        model,
+        analysis_model=analysis_model,
+        use_scraper_cache=actor_input.get('useScraperCache', True),
+        llm_cache=llm_cache,
+        incremental=actor_input.get('incrementalMonitoring', True),
+        checkpointer=checkpointer,
+    )
+    return graph, llm_cache
+
+
+def setup_usage_meter(max_total_tokens: int | None = None) -> 'UsageMeter':
+    """Set up the usage meter charging the LLM tokens as they are used.
+
+    The pending tokens are charged before the Actor migrates or is aborted, so the billing data is not lost.
+
+    Args:
+        max_total_tokens (int | None): Token limit of the run, no more LLM calls are made once it is reached.
+
+    Returns:
+        UsageMeter: Usage meter.
+    """
+    from src.usage import UsageMeterSingleton
+
+    meter = UsageMeterSingleton.create_get_instance(max_total_tokens=max_total_tokens)
+    for event in (Event.MIGRATING, Event.ABORTING):
+        Actor.on(event, functools.partial(meter.flush, final=True))
+    return meter
+
+
+async def plan_scheduled_run(actor_input: dict, max_concurrency: int) -> tuple['Watchlist', list[str]]:
+    """Load the persistent watchlist and select the tickers due for a refresh within the run budget.
 
-async def main() -> None:
+    The watchlist of the input replaces the watched tickers, the history of the tickers kept on it is preserved.
+
+    Args:
+        actor_input (dict): Actor input.
+        max_concurrency (int): Maximum number of tickers analyzed at the same time.
+
+    Returns:
+        tuple[Watchlist, list[str]]: Watchlist and the selected tickers, the most urgent first.
+
+    Raises:
+        ValueError: If the watchlist is empty.
+    """
+    from src.scheduler import (
+        DEFAULT_REFRESH_INTERVAL_SECS,
+        WATCHLIST_STORE_NAME,
+        Watchlist,
+        get_input_watchlist,
+        select_tickers,
+    )
+    from src.storage import KeyValueStoreBackend
+
+    watchlist = Watchlist(KeyValueStoreBackend(WATCHLIST_STORE_NAME))
+    await watchlist.load()
+    if (priorities := get_input_watchlist(actor_input)) is not None:
+        watchlist.sync(priorities)
+    if not watchlist.entries:
+        msg = 'Missing "watchlist" attribute in input and no watchlist is stored!'
+        raise ValueError(msg)
+
+    refresh_interval_hours = actor_input.get('refreshIntervalHours')
+    refresh_interval_secs = (
+        refresh_interval_hours * 60 * 60 if refresh_interval_hours else DEFAULT_REFRESH_INTERVAL_SECS
+    )
+    tickers = select_tickers(
+        watchlist.entries.values(),
+        now=datetime.datetime.now(tz=datetime.UTC),
+        refresh_interval_secs=refresh_interval_secs,
+        max_concurrency=max_concurrency,
+        time_budget_secs=actor_input.get('timeBudgetSecs'),
+        token_budget=actor_input.get('tokenBudget'),
+    )
+    logger.info('Scheduled %d of %d watched tickers: %s', len(tickers), len(watchlist.entries), ', '.join(tickers))
+    return watchlist, tickers
+
+
+async def get_run_tickers(actor_input: dict, max_concurrency: int) -> tuple['Watchlist | None', list[str]]:
+    """Get the tickers to analyze in this run.
+
+    In the scheduler mode, only the watched tickers due for a refresh are analyzed, otherwise the input tickers.
+
+    Args:
+        actor_input (dict): Actor input.
+        max_concurrency (int): Maximum number of tickers analyzed at the same time.
+
+    Returns:
+        tuple[Watchlist | None, list[str]]: Watchlist in the scheduler mode, None otherwise, and the tickers.
+
+    Raises:
+        ValueError: If the input has no tickers outside the scheduler mode.
+    """
+    if not actor_input.get('scheduler'):
+        if not (tickers := get_input_tickers(actor_input)):
+            msg = 'Missing "ticker" or "tickers" attribute in input!'
+            raise ValueError(msg)
+        return None, tickers
+
+    watchlist, tickers = await plan_scheduled_run(actor_input, max_concurrency)
+    if not tickers:
+        await watchlist.save()
+        logger.info('No watched ticker is due for a refresh, nothing to do')
+    return watchlist, tickers
+
+
+def log_shared_resource_stats() -> None:
+    """Log the statistics of the scraper cache, the OpenAI rate limiter and the usage meter shared by the tickers."""
+    from src.cache import ActorResultCacheSingleton
+    from src.llm import ChatOpenAISingleton
+    from src.usage import UsageMeterSingleton
+
+    if cache := ActorResultCacheSingleton.get_instance():
+        logger.info('Scraper cache stats: %s', cache.stats())
+    for model, rate_limiter in ChatOpenAISingleton.get_rate_limiters().items():
+        logger.info('OpenAI rate limiter stats (%s): %s', model, rate_limiter.stats())
+    if meter := UsageMeterSingleton.get_instance():
+        logger.info('LLM usage stats: %s', meter.stats())
+
+
+async def serve_standby(actor_input: dict) -> None:
+    """Keep the agent warm and accept the ticker jobs over HTTP in the Actor standby mode.
+
+    The rest of the token usage is charged and the LLM cache is persisted when the server shuts down and before
+    the Actor migrates or is aborted.
+
+    Args:
+        actor_input (dict): Actor input.
+    """
+    from src.cache import CACHE_STORE_NAME
+    from src.checkpoints import PersistentCheckpointSaver
+    from src.llm_cache import persist_llm_cache_db
+    from src.ppe_utils import charge_for_actor_start
+    from src.server import serve
+    from src.storage import MemoryBackend
+    from src.utils import setup_apify_http_client
+
+    await charge_for_actor_start()
+    await setup_apify_http_client()
+    usage_meter = setup_usage_meter(actor_input.get('maxTotalTokens'))
+    # the request threads are deleted when the requests finish, they do not need to survive the server
+    checkpointer = PersistentCheckpointSaver(MemoryBackend())
+    graph, llm_cache = await setup_agent_from_input(actor_input, checkpointer=checkpointer)
+    persist_llm_cache = None
+    if llm_cache is not None:
+        persist_llm_cache = functools.partial(persist_llm_cache_db, llm_cache, CACHE_STORE_NAME)
+        for event in (Event.MIGRATING, Event.ABORTING):
+            Actor.on(event, persist_llm_cache)
+
+    port = Actor.config.standby_port or Actor.config.web_server_port
+    try:
+        await serve(
+            graph,
+            port=port,
+            debug=actor_input.get('debug', False),
+            max_concurrency=actor_input.get('maxConcurrency', DEFAULT_MAX_CONCURRENCY),
+        )
+    finally:
+        await usage_meter.flush(final=True)
+        if persist_llm_cache is not None:
+            await persist_llm_cache()
+
+
+async def main() -> None:  # noqa: PLR0915
     """Actor entry point.
 
     Raises:
@@ -24,72 +310,79 @@ async def main() -> None:
     """
     async with Actor:
         # Handle input
-        actor_input = await Actor.get_input()
-        ticker = actor_input.get('ticker')
-        model = actor_input.get('model', 'gpt-4o-mini')  # Default model if not provided
+        actor_input = await Actor.get_input() or {}
+        max_total_tokens = actor_input.get('maxTotalTokens')
+        max_concurrency = actor_input.get('maxConcurrency', DEFAULT_MAX_CONCURRENCY)
+        use_telemetry = actor_input.get('telemetry', True)
         debug = actor_input.get('debug', False)
         if debug:
             logger.setLevel(logging.DEBUG)
-        if not ticker:
-            msg = 'Missing "ticker" attribute in input!'
-            raise ValueError(msg)
+        # an unsupported model fails before the Actor start is charged
+        get_input_models(actor_input)
+
+        # In the standby mode, keep the agent warm and accept ticker jobs over HTTP
+        if Actor.config.meta_origin == STANDBY_META_ORIGIN:
+            await serve_standby(actor_input)
+            return
+
+        # In the scheduler mode, analyze only the watched tickers due for a refresh
+        watchlist, tickers = await get_run_tickers(actor_input, max_concurrency)
+        if not tickers:
+            return
+
+        from src.cache import CACHE_STORE_NAME
+        from src.checkpoints import PersistentCheckpointSaver
+        from src.llm_cache import persist_llm_cache_db
+        from src.ppe_utils import charge_for_actor_start
+        from src.runner import run_tickers
+        from src.storage import KeyValueStoreBackend
+        from src.symbols import StockIdResolverSingleton
+        from src.telemetry import TelemetrySingleton, create_span_exporters
+        from src.utils import setup_apify_http_client
 
         # Charge for actor start
         await charge_for_actor_start()
+        # Share the pooled connections of the Apify API calls between the tickers
+        await setup_apify_http_client()
+        # Charge the LLM tokens as they are used, the spend ceiling stops the LLM calls
+        usage_meter = setup_usage_meter(max_total_tokens)
 
-        # Create ChatOpenAI singleton instance
-        ChatOpenAISingleton.create_get_instance(model=model)
-
-        # Create the graph
-        config: RunnableConfig = {'configurable': {'thread_id': '1', 'debug': debug}}
-        graph = build_compiled_graph()
-        graph.update_state(config, {'ticker': ticker})
-
-        # Run the graph and track token usage
-        inputs: dict = {'messages': []}
-        report: OutputTickerReport | None = None
-        actor_status = None
-        total_tokens = 0
-        with get_openai_callback() as callback:
-            async for state in graph.astream(inputs, config, stream_mode='values'):
-                logger.debug('-------- State --------')
-                logger.debug('State: %s', state)
-                status = state.get('status')
-                if status and status != actor_status:
-                    await Actor.set_status_message(f'Agent: {status}')
-                    logger.info('Agent: %s', status)
-                    actor_status = status
-
-                if report := state.get('report'):
-                    break
-
-        if not report:
-            msg = 'Failed to generate the report!'
-            raise ValueError(msg)
+        # Record the spans of the graph nodes, LLM turns, tools and scrapers
+        telemetry = TelemetrySingleton.create_get_instance(create_span_exporters()) if use_telemetry else None
 
-        logger.info('-------- Report --------')
-        logger.info('Report: %s', report)
+        # Persist the graph checkpoints in the run key-value store, a migrated or restarted run resumes the tickers
+        checkpointer = PersistentCheckpointSaver(KeyValueStoreBackend())
+        Actor.on(Event.MIGRATING, checkpointer.flush)
+        graph, llm_cache = await setup_agent_from_input(actor_input, checkpointer=checkpointer)
 
-        # Charge for total token usage
-        total_tokens = callback.total_tokens
-        await charge_for_model_tokens(model, total_tokens)
+        # Resolve Google Finance stock ids of all the tickers upfront, unknown tickers are searched concurrently
+        try:
+            await StockIdResolverSingleton.get_instance().resolve_many(tickers)
+        except RuntimeError as e:
+            logger.warning('Failed to resolve some of the tickers in Google Finance: %s', e)
 
-        # Add report disclaimer
-        output_report = (
-            f'{report.report}'
-            '\n\n\n---\n\n\nThis report is generated by an AI agent and should not be considered as financial advice.\n'
-        )
+        # Run the graph for all the tickers and track token usage, the P/E ratios are compared across the tickers
+        results = await run_tickers(graph, tickers, debug=debug, max_concurrency=max_concurrency, compare_peers=True)
+        # Charge the rest of the token usage of all the tickers, the failed ones included
+        await usage_meter.flush(final=True)
+        await checkpointer.flush()
+        if watchlist is not None:
+            watchlist.record_results(results, datetime.datetime.now(tz=datetime.UTC))
+            await watchlist.save()
+        if telemetry is not None:
+            await telemetry.flush()
+            logger.info('Telemetry summary (most time consuming first): %s', telemetry.summary())
 
-        store = await Actor.open_key_value_store()
-        await store.set_value('report.md', output_report)
-        logger.info('Saved the "report.md" file into the key-value store!')
-
-        await Actor.push_data(
-            {
-                'ticker': report.ticker,
-                'sentiment': report.sentiment,
-                'sentiment_reason': report.sentiment_reason,
-                'report': output_report,
-            }
-        )
-        logger.info('Pushed the report to the dataset!')
+        log_shared_resource_stats()
+        if llm_cache is not None:
+            # cache hits are not counted in the token usage, they are not charged
+            logger.info('LLM cache stats: %s', llm_cache.stats())
+            await persist_llm_cache_db(llm_cache, CACHE_STORE_NAME)
+
+        failed = [result for result in results if result.error is not None]
+        if len(failed) == len(results):
+            msg = 'Failed to generate the report!'
+            raise ValueError(msg)
+
+        if failed:
+            logger.warning('Failed to generate reports for tickers: %s', ', '.join(r.ticker for r in failed))
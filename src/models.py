@@ -5,6 +5,9 @@ These models are used mainly for the structured tool and LLM outputs.
 
 from pydantic import BaseModel, Field
 
+# news of the last days are prefetched for the report, the scheduler derives the news velocity from their count
+NEWS_LOOKBACK_DAYS = 7
+
 
 class GoogleTickerInfoYearlyFinancials(BaseModel):
     """Yearly financials for a ticker from Google Finance."""
@@ -18,6 +21,25 @@ class GoogleTickerInfoYearlyFinancials(BaseModel):
     price_to_book: float | None = Field(None, description='Price to book ratio')
 
 
+class PriceSeriesStats(BaseModel):
+    """Summary statistics of a price series, computed locally from the scraped prices."""
+
+    points: int = Field(..., description='Number of prices in the series')
+    start: str = Field(..., description='Time of the first price')
+    end: str = Field(..., description='Time of the last price')
+    first: float = Field(..., description='First price')
+    last: float = Field(..., description='Last price')
+    low: float = Field(..., description='Lowest price')
+    high: float = Field(..., description='Highest price')
+    change_pct: float = Field(..., description='Price change over the series in percent')
+    volatility_pct: float | None = Field(None, description='Standard deviation of the period returns in percent')
+    annualized_volatility_pct: float | None = Field(None, description='Annualized volatility in percent')
+    max_drawdown_pct: float = Field(..., description='Maximum drawdown from a previous peak in percent')
+    moving_averages: dict[str, float] = Field(
+        default_factory=dict, description='Simple moving averages of the last prices, for example sma_5'
+    )
+
+
 class GoogleTickerInfo(BaseModel):
     """Information about a ticker from Google Finance."""
 
@@ -28,6 +50,10 @@ class GoogleTickerInfo(BaseModel):
     price_year_range: tuple[float, float] | None = Field(None, description='52-week price range')
     pe_ratio: float | None = Field(None, description='PE ratio')
     yerly_financials: list[GoogleTickerInfoYearlyFinancials] = Field(..., description='Yearly financials')
+    intraday_prices: PriceSeriesStats | None = Field(None, description='Statistics of the intraday prices')
+    last_30_days_prices: PriceSeriesStats | None = Field(
+        None, description='Statistics of the daily prices of the last 30 days'
+    )
 
 
 class TickerPriceTarget(BaseModel):
@@ -56,6 +82,7 @@ class TickerNewsEntry(BaseModel):
     published_at: str
     summary: str | None = None
     url: str
+    sources: list[str] = Field(default_factory=list, description='URLs of the same story from other providers')
 
 
 class TickerRecommendationEntry(BaseModel):
@@ -82,3 +109,39 @@ class OutputTickerReport(BaseModel):
         description=('Reason for the sentiment analysis. Short reasoning about the sentiment (1-2 sentences at most).'),
     )
     report: str = Field(..., description='Financial monitoring report')
+
+
+class TickerSnapshot(BaseModel):
+    """Snapshot of the ticker data and analysis from the last run, used for the incremental monitoring."""
+
+    ticker: str
+    updated_at: str = Field(..., description='ISO timestamp of the snapshot')
+    ticker_info: GoogleTickerInfo | None = None
+    news_urls: list[str] = Field(default_factory=list, description='URLs of the already analyzed news')
+    analysis: str
+    report: OutputTickerReport
+
+
+class TickerDelta(BaseModel):
+    """Changes in the ticker data since the last snapshot."""
+
+    changed_info: dict[str, object] = Field(
+        default_factory=dict, description='Changed Google Finance ticker info fields with the new values'
+    )
+    new_news: list[TickerNewsEntry] = Field(default_factory=list, description='News not analyzed yet')
+    price_change: float | None = Field(None, description='Relative change of the current price')
+    is_material: bool = Field(..., description='Whether the changes require a new analysis and report')
+
+
+class WatchlistEntry(BaseModel):
+    """Ticker of the scheduler watchlist with its refresh history and activity signals."""
+
+    ticker: str
+    priority: float = Field(1.0, description='Priority weight of the ticker, higher is refreshed more often')
+    last_report_at: str | None = Field(None, description='ISO timestamp of the last report, None if never reported')
+    last_attempt_at: str | None = Field(None, description='ISO timestamp of the last run, successful or not')
+    failures: int = Field(0, description='Number of consecutive failed runs')
+    volatility_pct: float | None = Field(None, description='Annualized 30-day volatility in percent at the last run')
+    news_velocity: float | None = Field(None, description='New news per day at the last run')
+    avg_duration_secs: float | None = Field(None, description='Moving average of the run duration')
+    avg_tokens: float | None = Field(None, description='Moving average of the LLM tokens per run')
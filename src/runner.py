@@ -0,0 +1,348 @@
+"""This module contains helpers for running the agent graph for one or more tickers.
+
+The compiled graph is shared between tickers; each ticker runs in its own graph thread so the checkpointed
+states do not collide. Multiple tickers are processed concurrently, limited by a semaphore. With the peer comparison,
+the ticker info of all the tickers is fetched before the analysis, so the P/E ratio of every ticker is compared to
+the other tickers of the batch.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from apify import Actor
+
+from src.analytics import compute_peer_pe_medians
+from src.batching import DEFAULT_MAX_BATCH_SIZE
+from src.checkpoints import PersistentCheckpointSaver
+from src.models import GoogleTickerInfo
+from src.storage import sanitize_key
+from src.telemetry import TelemetrySingleton
+from src.tool_executor import run_tool
+from src.tools import tool_get_google_ticker_info
+from src.usage import track_model_usage
+
+if TYPE_CHECKING:
+    from langchain_core.runnables.config import RunnableConfig
+    from langgraph.graph.state import CompiledStateGraph
+
+    from src.models import OutputTickerReport, TickerDelta, TickerNewsEntry
+
+logger = logging.getLogger('apify')
+
+REPORT_DISCLAIMER = (
+    '\n\n\n---\n\n\nThis report is generated by an AI agent and should not be considered as financial advice.\n'
+)
+
+
+@dataclass
+class TickerRunResult:
+    """Result of the agent graph run for a single ticker."""
+
+    ticker: str
+    """Ticker that was analyzed."""
+    report: 'OutputTickerReport | None' = None
+    """Final report, None if the run failed."""
+    total_tokens: int = 0
+    """Total number of LLM tokens used for the ticker."""
+    tokens_by_model: dict[str, int] = field(default_factory=dict)
+    """Number of LLM tokens used for the ticker by the OpenAI model."""
+    duration_secs: float = 0.0
+    """Duration of the graph run."""
+    ticker_info: 'GoogleTickerInfo | None' = None
+    """Prefetched ticker info of the final graph state, None if the run failed."""
+    news: 'list[TickerNewsEntry] | None' = None
+    """Prefetched news of the final graph state, None if the run failed."""
+    delta: 'TickerDelta | None' = None
+    """Changes since the last ticker snapshot, None if there is no snapshot or the run failed."""
+    error: Exception | None = None
+    """Error raised during the run, if any."""
+
+
+def get_report_key(ticker: str, *, batch: bool) -> str:
+    """Get the key-value store key for the ticker report.
+
+    Single ticker runs keep the original "report.md" key, batch runs store one report per ticker. The ticker symbols
+    like "^GSPC" are sanitized.
+
+    Args:
+        ticker (str): Ticker symbol.
+        batch (bool): Whether the run analyzes multiple tickers.
+
+    Returns:
+        str: Key-value store key.
+    """
+    return f'report-{sanitize_key(ticker)}.md' if batch else 'report.md'
+
+
+async def save_report(report: 'OutputTickerReport', report_key: str) -> None:
+    """Save the report into the key-value store and push it to the dataset.
+
+    Args:
+        report (OutputTickerReport): Report to save.
+        report_key (str): Key-value store key for the markdown report.
+    """
+    output_report = f'{report.report}{REPORT_DISCLAIMER}'
+
+    store = await Actor.open_key_value_store()
+    await store.set_value(report_key, output_report)
+    logger.info('Saved the "%s" file into the key-value store!', report_key)
+
+    await Actor.push_data(
+        {
+            'ticker': report.ticker,
+            'sentiment': report.sentiment,
+            'sentiment_reason': report.sentiment_reason,
+            'report': output_report,
+        }
+    )
+    logger.info('Pushed the report for "%s" to the dataset!', report.ticker)
+
+
+async def run_ticker(  # noqa: PLR0913
+    graph: 'CompiledStateGraph',
+    ticker: str,
+    *,
+    debug: bool = False,
+    batch: bool = False,
+    thread_id: str | None = None,
+    queue_wait_secs: float | None = None,
+    on_status: Callable[[str], Awaitable[None]] | None = None,
+    initial_state: dict | None = None,
+) -> TickerRunResult:
+    """Run the agent graph for a single ticker and save the report.
+
+    Args:
+        graph (CompiledStateGraph): Compiled agent graph.
+        ticker (str): Ticker symbol.
+        debug (bool): Whether to run the graph in debug mode.
+        batch (bool): Whether the ticker is part of a batch run.
+        thread_id (str | None): Graph thread ID, defaults to the ticker.
+        queue_wait_secs (float | None): Time the ticker waited for a free slot, recorded in the telemetry.
+        on_status (Callable[[str], Awaitable[None]] | None): Callback called on every agent status change.
+        initial_state (dict | None): Graph state set when the thread starts, for example the prefetched ticker info,
+            not used when the thread is resumed.
+
+    Returns:
+        TickerRunResult: Run result with the report and token usage.
+    """
+    thread_id = thread_id or ticker
+    # a ticker finished by a previous (migrated or restarted) run is not analyzed, charged and saved again
+    if (finished_result := await _get_finished_result(graph, ticker, thread_id)) is not None:
+        logger.info('Ticker "%s" was already analyzed by the previous run, skipping it', ticker)
+        return finished_result
+
+    config: RunnableConfig = {
+        'configurable': {
+            'thread_id': thread_id,
+            'debug': debug,
+            'batch': batch,
+            'report_key': get_report_key(ticker, batch=batch),
+        }
+    }
+    # a thread interrupted in a previous (migrated or restarted) run resumes from its last completed node
+    state = await graph.aget_state(config)
+    resume = bool(state.next)
+    if resume:
+        logger.info('Resuming the interrupted agent run for ticker "%s" at: %s', ticker, ', '.join(state.next))
+    else:
+        await graph.aupdate_state(config, {**(initial_state or {}), 'ticker': ticker})
+
+    # the spans of the graph nodes, LLM turns and tools are recorded under the ticker span
+    stream_config = config
+    telemetry = TelemetrySingleton.get_instance()
+    if telemetry is not None:
+        span = telemetry.start_span(ticker, 'ticker', trace_id=thread_id, queue_wait_secs=queue_wait_secs)
+        handler = telemetry.create_callback_handler(span.trace_id, span.span_id)
+        stream_config = {**config, 'callbacks': [handler]}
+
+    result = TickerRunResult(ticker=ticker)
+    # Token usage is tracked per ticker and model, the callback handler is bound to the current task context
+    started_at = time.monotonic()
+    with track_model_usage(ticker) as usage:
+        try:
+            final_state = await _stream_ticker_report(
+                graph, stream_config, ticker, batch=batch, resume=resume, on_status=on_status
+            )
+        except Exception as e:  # noqa: BLE001
+            result.error = e
+        else:
+            result.report = final_state.get('report')
+            result.ticker_info = final_state.get('ticker_info')
+            result.news = final_state.get('news')
+            result.delta = final_state.get('delta')
+        result.duration_secs = round(time.monotonic() - started_at, 3)
+        result.tokens_by_model = dict(usage.tokens_by_model)
+        result.total_tokens = usage.total_tokens
+
+    if telemetry is not None:
+        telemetry.end_span(span, error=result.error, total_tokens=result.total_tokens, resumed=resume)
+        await telemetry.flush()
+
+    if result.error is not None:
+        logger.error('Agent failed for ticker "%s": %s', ticker, result.error)
+        return result
+
+    if not result.report:
+        result.error = ValueError(f'Failed to generate the report for ticker "{ticker}"!')
+        logger.error('%s', result.error)
+        return result
+
+    logger.info('-------- Report --------')
+    logger.info('Report: %s', result.report)
+    await save_report(result.report, get_report_key(ticker, batch=batch))
+    await _mark_finished(graph, thread_id, result)
+    return result
+
+
+async def _get_finished_result(graph: 'CompiledStateGraph', ticker: str, thread_id: str) -> TickerRunResult | None:
+    """Get the result of the ticker thread finished by a previous run, only the persistent checkpointer keeps them.
+
+    Returns:
+        TickerRunResult | None: Result of the finished thread, None if the thread is not finished.
+    """
+    if not isinstance(graph.checkpointer, PersistentCheckpointSaver):
+        return None
+    if (values := await graph.checkpointer.aget_done_values(thread_id)) is None:
+        return None
+    return TickerRunResult(ticker=ticker, **values)
+
+
+async def _mark_finished(graph: 'CompiledStateGraph', thread_id: str, result: TickerRunResult) -> None:
+    """Mark the thread of the saved report as done, so a restarted run returns the result instead of repeating it."""
+    if not isinstance(graph.checkpointer, PersistentCheckpointSaver):
+        return
+    values = {
+        'report': result.report,
+        'total_tokens': result.total_tokens,
+        'tokens_by_model': result.tokens_by_model,
+        'duration_secs': result.duration_secs,
+        'ticker_info': result.ticker_info,
+        'news': result.news,
+        'delta': result.delta,
+    }
+    # the report is saved already whatever happens here
+    try:
+        await graph.checkpointer.mark_thread_done(thread_id, values)
+    except Exception:
+        logger.exception('Failed to mark the thread of ticker "%s" as done', result.ticker)
+
+
+async def get_peer_states(tickers: list[str], *, max_concurrency: int = 1) -> dict[str, dict]:
+    """Fetch the ticker info of all the tickers and compare their P/E ratios to the other tickers of the batch.
+
+    The lookups are coalesced into the batched Google Finance runs, at most `max_concurrency` of them run
+    at the same time. The tickers whose info could not be fetched are left out, their graphs fetch it themselves.
+
+    Args:
+        tickers (list[str]): Ticker symbols.
+        max_concurrency (int): Maximum number of the batched Google Finance runs at the same time.
+
+    Returns:
+        dict[str, dict]: Initial graph state of the ticker with the ticker info and the median P/E ratio
+            of the other tickers.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency) * DEFAULT_MAX_BATCH_SIZE)
+
+    async def _get_ticker_info(ticker: str) -> object:
+        async with semaphore:
+            return await run_tool(tool_get_google_ticker_info, {'ticker': ticker})
+
+    results = await asyncio.gather(*(_get_ticker_info(ticker) for ticker in tickers), return_exceptions=True)
+    ticker_infos = {}
+    for ticker, result in zip(tickers, results, strict=True):
+        if isinstance(result, GoogleTickerInfo):
+            ticker_infos[ticker] = result
+        else:
+            logger.warning('Failed to get Google Finance info of ticker "%s" for the peers: %s', ticker, result)
+    peer_pe_medians = compute_peer_pe_medians({ticker: info.pe_ratio for ticker, info in ticker_infos.items()})
+    return {
+        ticker: {'ticker_info': info, 'peer_pe_median': peer_pe_medians.get(ticker)}
+        for ticker, info in ticker_infos.items()
+    }
+
+
+async def run_tickers(
+    graph: 'CompiledStateGraph',
+    tickers: list[str],
+    *,
+    debug: bool = False,
+    max_concurrency: int = 1,
+    compare_peers: bool = False,
+) -> list[TickerRunResult]:
+    """Run the agent graph for multiple tickers concurrently.
+
+    Args:
+        graph (CompiledStateGraph): Compiled agent graph.
+        tickers (list[str]): Ticker symbols.
+        debug (bool): Whether to run the graph in debug mode.
+        max_concurrency (int): Maximum number of tickers analyzed at the same time.
+        compare_peers (bool): Whether to compare the P/E ratios of the tickers of the batch, see `get_peer_states`.
+
+    Returns:
+        list[TickerRunResult]: Run results in the same order as the tickers.
+    """
+    batch = len(tickers) > 1
+    peer_states = await get_peer_states(tickers, max_concurrency=max_concurrency) if compare_peers and batch else {}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    done_count = 0
+
+    async def _run(ticker: str) -> TickerRunResult:
+        nonlocal done_count
+        queued_at = time.monotonic()
+        async with semaphore:
+            queue_wait_secs = round(time.monotonic() - queued_at, 3)
+            result = await run_ticker(
+                graph,
+                ticker,
+                debug=debug,
+                batch=batch,
+                queue_wait_secs=queue_wait_secs,
+                initial_state=peer_states.get(ticker),
+            )
+        done_count += 1
+        if batch:
+            await Actor.set_status_message(f'Agent: analyzed {done_count}/{len(tickers)} tickers')
+        return result
+
+    return await asyncio.gather(*(_run(ticker) for ticker in tickers))
+
+
+async def _stream_ticker_report(  # noqa: PLR0913
+    graph: 'CompiledStateGraph',
+    config: 'RunnableConfig',
+    ticker: str,
+    *,
+    batch: bool,
+    resume: bool = False,
+    on_status: Callable[[str], Awaitable[None]] | None,
+) -> dict:
+    """Stream the graph states for the ticker and return the state with the final report.
+
+    Returns:
+        dict: State with the final report or the last state if the graph finished without it.
+    """
+    # no inputs continue the thread from its last checkpoint
+    inputs: dict | None = None if resume else {'messages': []}
+    actor_status = None
+    state: dict = {}
+    async for state in graph.astream(inputs, config, stream_mode='values'):
+        logger.debug('-------- State --------')
+        logger.debug('State: %s', state)
+        status = state.get('status')
+        if status and status != actor_status:
+            if batch:
+                logger.info('Agent [%s]: %s', ticker, status)
+            else:
+                await Actor.set_status_message(f'Agent: {status}')
+                logger.info('Agent: %s', status)
+            if on_status is not None:
+                await on_status(status)
+            actor_status = status
+
+        if state.get('report'):
+            break
+    return state
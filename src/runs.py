@@ -0,0 +1,173 @@
+"""This module contains the orchestration of the scraper Actor runs.
+
+Actor runs are started without blocking (`.start()`) and tracked in a shared registry. A single polling loop
+checks the status of all the pending runs, so many scraper runs can overlap and each caller only awaits its own
+run. Runs are aborted when they time out or when the awaiting caller is cancelled (the result is no longer needed),
+so a slow scraper cannot hold the graph hostage.
+"""
+
+import asyncio
+import logging
+
+from apify import Actor
+
+from src.telemetry import end_span, start_child_span
+
+logger = logging.getLogger('apify')
+
+DEFAULT_POLL_INTERVAL_SECS = 2.0
+DEFAULT_RUN_TIMEOUT_SECS = 600
+SUCCEEDED_STATUS = 'SUCCEEDED'
+TERMINAL_STATUSES = {SUCCEEDED_STATUS, 'FAILED', 'ABORTED', 'TIMED-OUT'}
+
+
+class ActorRunRegistry:
+    """Registry of the pending Actor runs awaited by one shared polling loop."""
+
+    def __init__(self, poll_interval_secs: float = DEFAULT_POLL_INTERVAL_SECS) -> None:
+        self.poll_interval_secs = poll_interval_secs
+        self._runs: dict[str, asyncio.Future[dict]] = {}
+        """Futures of the registered runs, kept until the run result is awaited or the run is aborted."""
+        self._poller: asyncio.Task | None = None
+
+    @property
+    def pending_count(self) -> int:
+        """Number of the pending (not finished) Actor runs."""
+        return len(self._get_pending_run_ids())
+
+    async def start(self, actor_id: str, run_input: dict, *, timeout_secs: int = DEFAULT_RUN_TIMEOUT_SECS) -> str:
+        """Start the Actor run and register it in the registry.
+
+        Args:
+            actor_id (str): Actor ID.
+            run_input (dict): Actor run input.
+            timeout_secs (int): Actor run timeout, the run is also aborted on the platform after it elapses.
+
+        Returns:
+            str: Actor run ID.
+
+        Raises:
+            RuntimeError: If the Actor run fails to start.
+        """
+        run = await Actor.apify_client.actor(actor_id).start(run_input=run_input, timeout_secs=timeout_secs)
+        if not run:
+            msg = f'Failed to start the Actor {actor_id}!'
+            raise RuntimeError(msg)
+
+        run_id = str(run['id'])
+        logger.debug('Started Actor %s run %s', actor_id, run_id)
+        self._runs[run_id] = asyncio.get_running_loop().create_future()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        return run_id
+
+    async def wait(self, run_id: str, *, timeout_secs: float | None = None) -> dict:
+        """Wait for the Actor run to finish.
+
+        The run is aborted if the timeout elapses or if the waiting coroutine is cancelled.
+
+        Args:
+            run_id (str): Actor run ID.
+            timeout_secs (float | None): Maximum time to wait, no limit if not set.
+
+        Returns:
+            dict: Finished Actor run.
+
+        Raises:
+            TimeoutError: If the run does not finish in time.
+            asyncio.CancelledError: If the waiting coroutine is cancelled.
+        """
+        future = self._runs[run_id]
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout_secs)
+        except (TimeoutError, asyncio.CancelledError):
+            await asyncio.shield(self.abort(run_id))
+            raise
+        finally:
+            self._runs.pop(run_id, None)
+
+    async def call(self, actor_id: str, run_input: dict, *, timeout_secs: int = DEFAULT_RUN_TIMEOUT_SECS) -> dict:
+        """Start the Actor run and wait for it to finish.
+
+        Args:
+            actor_id (str): Actor ID.
+            run_input (dict): Actor run input.
+            timeout_secs (int): Actor run timeout.
+
+        Returns:
+            dict: Finished Actor run.
+        """
+        run_id = await self.start(actor_id, run_input, timeout_secs=timeout_secs)
+        return await self.wait(run_id, timeout_secs=timeout_secs)
+
+    async def abort(self, run_id: str) -> None:
+        """Abort the Actor run, it is no longer needed.
+
+        Args:
+            run_id (str): Actor run ID.
+        """
+        if (future := self._runs.pop(run_id, None)) is None or future.done():
+            return
+        future.cancel()
+        logger.debug('Aborting Actor run %s', run_id)
+        try:
+            await Actor.apify_client.run(run_id).abort()
+        except Exception as e:  # noqa: BLE001
+            logger.warning('Failed to abort Actor run %s: %s', run_id, e)
+
+    async def _poll(self) -> None:
+        """Poll the status of all the pending runs until there are none left."""
+        while self._get_pending_run_ids():
+            await asyncio.sleep(self.poll_interval_secs)
+            run_ids = self._get_pending_run_ids()
+            results = await asyncio.gather(
+                *(Actor.apify_client.run(run_id).get() for run_id in run_ids), return_exceptions=True
+            )
+            for run_id, run in zip(run_ids, results, strict=True):
+                if isinstance(run, BaseException):
+                    logger.debug('Failed to get the status of Actor run %s: %s', run_id, run)
+                    continue
+                if run is None or run.get('status') in TERMINAL_STATUSES:
+                    self._resolve(run_id, run)
+
+    def _get_pending_run_ids(self) -> list[str]:
+        return [run_id for run_id, future in self._runs.items() if not future.done()]
+
+    def _resolve(self, run_id: str, run: dict | None) -> None:
+        """Resolve the future of the finished run."""
+        if (future := self._runs.get(run_id)) is None or future.done():
+            return
+        if run is None:
+            future.set_exception(RuntimeError(f'Actor run {run_id} not found!'))
+        elif (status := run.get('status')) != SUCCEEDED_STATUS:
+            future.set_exception(RuntimeError(f'Actor run {run_id} finished with status {status}!'))
+        else:
+            future.set_result(run)
+
+
+_registry = ActorRunRegistry()
+
+
+async def call_actor(actor_id: str, run_input: dict, *, timeout_secs: int = DEFAULT_RUN_TIMEOUT_SECS) -> dict:
+    """Start the Actor run in the shared registry and wait for it to finish.
+
+    Args:
+        actor_id (str): Actor ID.
+        run_input (dict): Actor run input.
+        timeout_secs (int): Actor run timeout.
+
+    Returns:
+        dict: Finished Actor run.
+    """
+    span = start_child_span(actor_id, 'actor')
+    try:
+        run = await _registry.call(actor_id, run_input, timeout_secs=timeout_secs)
+    except BaseException as e:
+        end_span(span, error=e)
+        raise
+    run_time_secs = (run.get('stats') or {}).get('runTimeSecs')
+    end_span(span, run_id=run.get('id'), run_time_secs=run_time_secs)
+    if span is not None and span.duration_secs is not None and run_time_secs is not None:
+        # the Actor start-up and the status polling
+        span.queue_wait_secs = round(max(0.0, span.duration_secs - run_time_secs), 3)
+    return run
@@ -0,0 +1,210 @@
+"""This module contains the watchlist scheduler.
+
+In the scheduler mode the Actor keeps a persistent watchlist of the monitored tickers with the time of their
+last report, their activity signals (the price volatility and the news velocity seen by the last run) and their
+priority. Every (scheduled) run picks the most urgent tickers that fit into the time and token budget of the run,
+so the compute goes to the tickers whose reports are the most out of date instead of being spread evenly.
+
+The urgency of a ticker grows with the time since its last report (relative to the refresh interval) and is
+scaled up by its activity and its priority. Tickers never reported are the most urgent. Tickers failing
+repeatedly are backed off, so they do not take the budget of the others.
+"""
+
+import datetime
+import heapq
+import logging
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING
+
+from src.models import NEWS_LOOKBACK_DAYS, WatchlistEntry
+from src.storage import StorageBackend
+
+if TYPE_CHECKING:
+    from src.runner import TickerRunResult
+
+logger = logging.getLogger('apify')
+
+WATCHLIST_STORE_NAME = 'finance-monitoring-agent-watchlist'
+WATCHLIST_KEY = 'WATCHLIST'
+DEFAULT_REFRESH_INTERVAL_SECS = 24 * 60 * 60
+# tickers refreshed more recently than this fraction of the refresh interval (at the normal activity) are skipped
+MIN_URGENCY = 0.25
+# staleness of the tickers never reported, in the refresh intervals, finite so the failure backoff still applies
+NEVER_REPORTED_STALENESS = 1000.0
+# estimates of the tickers never run yet
+DEFAULT_TICKER_DURATION_SECS = 60.0
+DEFAULT_TICKER_TOKENS = 20_000
+# activity signals at which the urgency doubles
+REFERENCE_VOLATILITY_PCT = 40.0
+REFERENCE_NEWS_VELOCITY = 5.0
+# weight of the last run in the moving averages of the estimates
+ESTIMATE_SMOOTHING = 0.3
+
+
+def compute_urgency(entry: WatchlistEntry, now: datetime.datetime, refresh_interval_secs: float) -> float:
+    """Compute the urgency of the ticker refresh.
+
+    Args:
+        entry (WatchlistEntry): Watchlist entry.
+        now (datetime.datetime): Current time.
+        refresh_interval_secs (float): Target interval between the reports of a ticker with the normal activity.
+
+    Returns:
+        float: Urgency, the tickers never reported are the most urgent unless they keep failing.
+    """
+    if entry.last_report_at is None:
+        staleness = NEVER_REPORTED_STALENESS
+    else:
+        report_age_secs = (now - datetime.datetime.fromisoformat(entry.last_report_at)).total_seconds()
+        staleness = report_age_secs / refresh_interval_secs
+    activity = 1.0
+    if entry.volatility_pct is not None:
+        activity += entry.volatility_pct / REFERENCE_VOLATILITY_PCT
+    if entry.news_velocity is not None:
+        activity += entry.news_velocity / REFERENCE_NEWS_VELOCITY
+    return entry.priority * max(staleness, 0.0) * activity * 0.5**entry.failures
+
+
+def select_tickers(  # noqa: PLR0913
+    entries: Iterable[WatchlistEntry],
+    *,
+    now: datetime.datetime,
+    refresh_interval_secs: float = DEFAULT_REFRESH_INTERVAL_SECS,
+    max_concurrency: int = 1,
+    time_budget_secs: float | None = None,
+    token_budget: int | None = None,
+) -> list[str]:
+    """Select the most urgent tickers that fit into the budget.
+
+    The tickers are taken from a priority queue by their urgency. The run time is estimated by assigning every
+    ticker to the concurrency slot that is free first, the tokens are summed. A ticker not fitting into the budget
+    is skipped and a less urgent, cheaper one can still take its place.
+
+    Args:
+        entries (Iterable[WatchlistEntry]): Watchlist entries.
+        now (datetime.datetime): Current time.
+        refresh_interval_secs (float): Target interval between the reports of a ticker with the normal activity.
+        max_concurrency (int): Maximum number of tickers analyzed at the same time.
+        time_budget_secs (float | None): Time budget of the run, not limited if not set.
+        token_budget (int | None): Estimated LLM token budget of the run, not limited if not set.
+
+    Returns:
+        list[str]: Selected tickers, the most urgent first.
+    """
+    queue = [(-compute_urgency(entry, now, refresh_interval_secs), entry.ticker, entry) for entry in entries]
+    heapq.heapify(queue)
+    slots = [0.0] * max(1, max_concurrency)
+    tokens = 0.0
+    selected = []
+    while queue:
+        negative_urgency, ticker, entry = heapq.heappop(queue)
+        if -negative_urgency < MIN_URGENCY:
+            break
+        duration_secs = entry.avg_duration_secs or DEFAULT_TICKER_DURATION_SECS
+        ticker_tokens = entry.avg_tokens or DEFAULT_TICKER_TOKENS
+        if time_budget_secs is not None and slots[0] + duration_secs > time_budget_secs:
+            continue
+        if token_budget is not None and tokens + ticker_tokens > token_budget:
+            continue
+        heapq.heapreplace(slots, slots[0] + duration_secs)
+        tokens += ticker_tokens
+        selected.append(ticker)
+    return selected
+
+
+def _update_average(average: float | None, value: float) -> float:
+    return value if average is None else (1 - ESTIMATE_SMOOTHING) * average + ESTIMATE_SMOOTHING * value
+
+
+def update_entry(entry: WatchlistEntry, result: 'TickerRunResult', now: datetime.datetime) -> None:
+    """Update the watchlist entry with the result of the ticker run.
+
+    Args:
+        entry (WatchlistEntry): Watchlist entry.
+        result (TickerRunResult): Run result of the ticker.
+        now (datetime.datetime): Time of the run.
+    """
+    previous_report_at = entry.last_report_at
+    entry.last_attempt_at = now.isoformat()
+    entry.avg_duration_secs = round(_update_average(entry.avg_duration_secs, result.duration_secs), 3)
+    entry.avg_tokens = round(_update_average(entry.avg_tokens, result.total_tokens))
+    if result.error is not None:
+        entry.failures += 1
+        return
+
+    entry.failures = 0
+    entry.last_report_at = now.isoformat()
+    if result.ticker_info is not None and result.ticker_info.last_30_days_prices is not None:
+        entry.volatility_pct = result.ticker_info.last_30_days_prices.annualized_volatility_pct
+    # the news new since the last report per day, or all the prefetched news per day of the lookback
+    if result.delta is not None and previous_report_at is not None:
+        days = (now - datetime.datetime.fromisoformat(previous_report_at)).total_seconds() / (24 * 60 * 60)
+        entry.news_velocity = round(len(result.delta.new_news) / max(days, 1.0), 2)
+    elif result.news is not None:
+        entry.news_velocity = round(len(result.news) / NEWS_LOOKBACK_DAYS, 2)
+
+
+class Watchlist:
+    """Persistent watchlist of the scheduler."""
+
+    def __init__(self, backend: StorageBackend) -> None:
+        self.backend = backend
+        self.entries: dict[str, WatchlistEntry] = {}
+
+    async def load(self) -> None:
+        """Load the watchlist from the backend."""
+        data = await self.backend.get_value(WATCHLIST_KEY) or {}
+        self.entries = {
+            entry.ticker: entry for entry in (WatchlistEntry.model_validate(item) for item in data.get('entries', []))
+        }
+
+    async def save(self) -> None:
+        """Save the watchlist to the backend."""
+        await self.backend.set_value(
+            WATCHLIST_KEY, {'entries': [entry.model_dump() for entry in self.entries.values()]}
+        )
+
+    def sync(self, priorities: Mapping[str, float]) -> None:
+        """Replace the watched tickers, the history of the tickers kept on the watchlist is preserved.
+
+        Args:
+            priorities (Mapping[str, float]): Priorities of the watched tickers.
+        """
+        self.entries = {
+            ticker: (self.entries.get(ticker) or WatchlistEntry(ticker=ticker)).model_copy(
+                update={'priority': priority}
+            )
+            for ticker, priority in priorities.items()
+        }
+
+    def record_results(self, results: Iterable['TickerRunResult'], now: datetime.datetime) -> None:
+        """Update the entries of the analyzed tickers.
+
+        Args:
+            results (Iterable[TickerRunResult]): Run results.
+            now (datetime.datetime): Time of the run.
+        """
+        for result in results:
+            if (entry := self.entries.get(result.ticker)) is not None:
+                update_entry(entry, result, now)
+
+
+def get_input_watchlist(actor_input: dict) -> dict[str, float] | None:
+    """Get the watched tickers and their priorities from the Actor input.
+
+    The watchlist items are either ticker symbols or objects with the "ticker" and the optional "priority".
+
+    Args:
+        actor_input (dict): Actor input.
+
+    Returns:
+        dict[str, float] | None: Priorities by the ticker, None if the input has no watchlist.
+    """
+    if (items := actor_input.get('watchlist')) is None:
+        return None
+    priorities = {}
+    for item in items:
+        ticker, priority = (item, 1.0) if isinstance(item, str) else (item.get('ticker'), item.get('priority', 1.0))
+        if ticker and ticker.strip():
+            priorities[ticker.strip().upper()] = float(priority)
+    return priorities
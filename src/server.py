@@ -0,0 +1,147 @@
+"""This module contains the long-running server mode of the agent.
+
+In the server mode (for example the Apify Actor standby mode) the compiled graph, the ChatOpenAI instance and
+the Apify client stay warm, so a ticker report request does not pay the interpreter start-up, the heavy imports
+and the graph compilation. Ticker jobs are accepted over HTTP and the agent status updates and the final report
+are streamed back as Server-Sent Events.
+
+Endpoints:
+    - GET / - readiness probe.
+    - GET /report?ticker=TSLA - run the agent for the ticker and stream the events.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+
+from aiohttp import web
+from langgraph.graph.state import CompiledStateGraph
+
+from src.checkpoints import PersistentCheckpointSaver
+from src.runner import run_ticker
+
+logger = logging.getLogger('apify')
+
+DEFAULT_PORT = 4321
+
+GRAPH_KEY = web.AppKey('graph', CompiledStateGraph)
+SETTINGS_KEY = web.AppKey('settings', dict)
+SEMAPHORE_KEY = web.AppKey('semaphore', asyncio.Semaphore)
+
+
+async def send_event(response: web.StreamResponse, event: str, data: dict) -> None:
+    """Send a Server-Sent Event.
+
+    Args:
+        response (web.StreamResponse): Prepared streaming response.
+        event (str): Event name.
+        data (dict): Event data, sent as JSON.
+    """
+    await response.write(f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode())
+
+
+async def handle_readiness(_: web.Request) -> web.Response:  # noqa: RUF029
+    """Handle the readiness probe.
+
+    Returns:
+        web.Response: OK response.
+    """
+    return web.Response(text='ok')
+
+
+async def handle_report(request: web.Request) -> web.StreamResponse:
+    """Run the agent for the ticker and stream the status updates and the report as Server-Sent Events.
+
+    Returns:
+        web.StreamResponse: Server-Sent Events response.
+    """
+    ticker = request.query.get('ticker', '').strip().upper()
+    if not ticker:
+        return web.json_response({'error': 'Missing "ticker" query parameter!'}, status=400)
+
+    graph = request.app[GRAPH_KEY]
+    settings = request.app[SETTINGS_KEY]
+
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+    await response.prepare(request)
+
+    async def on_status(status: str) -> None:
+        await send_event(response, 'status', {'ticker': ticker, 'status': status})
+
+    # every job gets its own graph thread, so the jobs for the same ticker do not share the state
+    thread_id = f'{ticker}-{uuid.uuid4().hex}'
+    try:
+        async with request.app[SEMAPHORE_KEY]:
+            result = await run_ticker(
+                graph, ticker, debug=settings['debug'], batch=True, thread_id=thread_id, on_status=on_status
+            )
+    finally:
+        await _delete_thread(graph, thread_id)
+
+    if result.error is not None or result.report is None:
+        await send_event(response, 'error', {'ticker': ticker, 'error': str(result.error)})
+    else:
+        await send_event(response, 'report', result.report.model_dump())
+
+    await response.write_eof()
+    return response
+
+
+async def _delete_thread(graph: CompiledStateGraph, thread_id: str) -> None:
+    """Delete the finished or failed thread from the checkpointer, so the long-running server does not leak memory.
+
+    Only the persistent checkpointer can delete the threads, the server graph should be compiled with one.
+    """
+    if isinstance(graph.checkpointer, PersistentCheckpointSaver):
+        try:
+            await graph.checkpointer.adelete_thread(thread_id)
+        except Exception:
+            logger.exception('Failed to delete the checkpoint of thread "%s"', thread_id)
+
+
+def create_app(graph: CompiledStateGraph, *, debug: bool = False, max_concurrency: int = 1) -> web.Application:
+    """Create the server application.
+
+    Args:
+        graph (CompiledStateGraph): Compiled agent graph.
+        debug (bool): Whether to run the graph in debug mode.
+        max_concurrency (int): Maximum number of tickers analyzed at the same time.
+
+    Returns:
+        web.Application: Server application.
+    """
+    app = web.Application()
+    app[GRAPH_KEY] = graph
+    app[SETTINGS_KEY] = {'debug': debug}
+    app[SEMAPHORE_KEY] = asyncio.Semaphore(max(1, max_concurrency))
+    app.router.add_get('/', handle_readiness)
+    app.router.add_get('/report', handle_report)
+    return app
+
+
+async def serve(
+    graph: CompiledStateGraph,
+    *,
+    port: int = DEFAULT_PORT,
+    debug: bool = False,
+    max_concurrency: int = 1,
+) -> None:
+    """Run the server until the process is terminated.
+
+    Args:
+        graph (CompiledStateGraph): Compiled agent graph.
+        port (int): Port to listen on.
+        debug (bool): Whether to run the graph in debug mode.
+        max_concurrency (int): Maximum number of tickers analyzed at the same time.
+    """
+    app = create_app(graph, debug=debug, max_concurrency=max_concurrency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, port=port)
+    await site.start()
+    logger.info('Agent server is listening on port %d', port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,178 @@
+"""This module contains the per-ticker snapshots for the incremental ("delta") monitoring.
+
+The agent usually runs on a schedule and most runs see nearly the same financials and mostly repeated news.
+After every report, the ticker info, the URLs of the analyzed news, the analysis and the report are stored
+in a persistent snapshot. On the next run, the prefetched data is diffed against the snapshot: only the new
+or changed items are sent to the analyst together with the previous analysis, and if nothing material changed,
+the previous report is reused without any LLM calls.
+"""
+
+import datetime
+import logging
+
+from src.models import GoogleTickerInfo, OutputTickerReport, TickerDelta, TickerNewsEntry, TickerSnapshot
+from src.storage import StorageBackend, sanitize_key
+
+logger = logging.getLogger('apify')
+
+SNAPSHOT_STORE_NAME = 'finance-monitoring-agent-snapshots'
+# price moves smaller than this (relative) are not considered material on their own
+PRICE_CHANGE_THRESHOLD = 0.01
+# fields that change with every price move, their changes are covered by the price change threshold
+PRICE_FIELDS = frozenset({'current_price', 'intraday_prices', 'last_30_days_prices'})
+MAX_NEWS_URLS = 500
+
+
+def get_snapshot_key(ticker: str) -> str:
+    """Get the storage key of the ticker snapshot, the ticker symbols like "^GSPC" are sanitized.
+
+    Args:
+        ticker (str): Ticker symbol.
+
+    Returns:
+        str: Storage key.
+    """
+    return sanitize_key(f'SNAPSHOT-{ticker}')
+
+
+def diff_ticker_data(
+    snapshot: TickerSnapshot,
+    ticker_info: GoogleTickerInfo | None,
+    news: list[TickerNewsEntry] | None,
+    *,
+    price_change_threshold: float = PRICE_CHANGE_THRESHOLD,
+) -> TickerDelta:
+    """Diff the prefetched ticker data against the last snapshot.
+
+    If any of the data failed to prefetch, the changes are considered material, the analyst needs to gather
+    the data itself.
+
+    Args:
+        snapshot (TickerSnapshot): Last ticker snapshot.
+        ticker_info (GoogleTickerInfo | None): Prefetched ticker info, None if the prefetch failed.
+        news (list[TickerNewsEntry] | None): Prefetched news, None if the prefetch failed.
+        price_change_threshold (float): Minimal relative price change considered material.
+
+    Returns:
+        TickerDelta: Changes since the snapshot.
+    """
+    changed_info: dict[str, object] = {}
+    price_change = None
+    if ticker_info is not None:
+        new_info = ticker_info.model_dump()
+        old_info = snapshot.ticker_info.model_dump() if snapshot.ticker_info else {}
+        changed_info = {field: value for field, value in new_info.items() if old_info.get(field) != value}
+        if old_price := old_info.get('current_price'):
+            price_change = (ticker_info.current_price - old_price) / old_price
+
+    known_urls = set(snapshot.news_urls)
+    # a story is not new if any of its syndicated copies was already analyzed
+    new_news = [entry for entry in news or [] if known_urls.isdisjoint([entry.url, *entry.sources])]
+
+    is_material = (
+        ticker_info is None
+        or news is None
+        or bool(new_news)
+        or any(field not in PRICE_FIELDS for field in changed_info)
+        or (price_change is not None and abs(price_change) >= price_change_threshold)
+    )
+    return TickerDelta(changed_info=changed_info, new_news=new_news, price_change=price_change, is_material=is_material)
+
+
+def create_ticker_snapshot(  # noqa: PLR0913
+    ticker: str,
+    *,
+    previous: TickerSnapshot | None,
+    ticker_info: GoogleTickerInfo | None,
+    news: list[TickerNewsEntry] | None,
+    analysis: str,
+    report: OutputTickerReport,
+) -> TickerSnapshot:
+    """Create the new ticker snapshot, the data missing in this run is kept from the previous snapshot.
+
+    Args:
+        ticker (str): Ticker symbol.
+        previous (TickerSnapshot | None): Previous ticker snapshot.
+        ticker_info (GoogleTickerInfo | None): Prefetched ticker info.
+        news (list[TickerNewsEntry] | None): Prefetched news.
+        analysis (str): Ticker analysis.
+        report (OutputTickerReport): Ticker report.
+
+    Returns:
+        TickerSnapshot: New ticker snapshot.
+    """
+    news_urls = [url for entry in news or [] for url in (entry.url, *entry.sources)]
+    if previous is not None:
+        ticker_info = ticker_info or previous.ticker_info
+        news_urls.extend(previous.news_urls)
+    return TickerSnapshot(
+        ticker=ticker,
+        updated_at=datetime.datetime.now(tz=datetime.UTC).isoformat(),
+        ticker_info=ticker_info,
+        news_urls=list(dict.fromkeys(news_urls))[:MAX_NEWS_URLS],
+        analysis=analysis,
+        report=report,
+    )
+
+
+class TickerSnapshotStore:
+    """Persistent store of the ticker snapshots."""
+
+    def __init__(self, backend: StorageBackend) -> None:
+        self.backend = backend
+
+    async def get(self, ticker: str) -> TickerSnapshot | None:
+        """Get the last ticker snapshot.
+
+        Invalid snapshots (for example from an older version of the agent) are ignored.
+
+        Args:
+            ticker (str): Ticker symbol.
+
+        Returns:
+            TickerSnapshot | None: Ticker snapshot or None if there is none.
+        """
+        if (value := await self.backend.get_value(get_snapshot_key(ticker))) is None:
+            return None
+        try:
+            return TickerSnapshot.model_validate(value)
+        except ValueError as e:
+            logger.warning('Ignoring invalid snapshot for ticker "%s": %s', ticker, e)
+            return None
+
+    async def set(self, snapshot: TickerSnapshot) -> None:
+        """Store the ticker snapshot.
+
+        Args:
+            snapshot (TickerSnapshot): Ticker snapshot.
+        """
+        await self.backend.set_value(get_snapshot_key(snapshot.ticker), snapshot.model_dump(mode='json'))
+
+
+class TickerSnapshotStoreSingleton:
+    """Singleton class for the TickerSnapshotStore instance.
+
+    The incremental monitoring is optional. If the instance is not created, every run does the full analysis.
+    """
+
+    _instance: TickerSnapshotStore | None = None
+
+    @classmethod
+    def create_get_instance(cls, backend: StorageBackend) -> TickerSnapshotStore:
+        """Creates and returns TickerSnapshotStore instance, used for creating the singleton instance.
+
+        Returns:
+            TickerSnapshotStore: TickerSnapshotStore instance.
+        """
+        if cls._instance is None:
+            cls._instance = TickerSnapshotStore(backend)
+        return cls._instance
+
+    @classmethod
+    def get_instance(cls) -> TickerSnapshotStore | None:
+        """Gets TickerSnapshotStore instance.
+
+        Returns:
+            TickerSnapshotStore | None: TickerSnapshotStore instance or None if the incremental monitoring is disabled.
+        """
+        return cls._instance
@@ -10,7 +10,8 @@ from typing import Annotated, TypedDict
 
 from langgraph.graph.message import add_messages
 
-from src.models import OutputTickerReport
+from src.analytics import TickerMetrics
+from src.models import GoogleTickerInfo, OutputTickerReport, TickerDelta, TickerNewsEntry, TickerSnapshot
 
 
 class State(TypedDict):
@@ -22,6 +23,20 @@ class State(TypedDict):
     """Current status message of the Actor to be displayed."""
     ticker: str
     """Ticker that is being analyzed."""
+    prefetched: bool
+    """Whether the ticker data was already prefetched."""
+    ticker_info: GoogleTickerInfo | None
+    """Prefetched ticker information from Google Finance, None if the prefetch failed."""
+    peer_pe_median: float | None
+    """Median P/E ratio of the other tickers of the batch run, None if not known."""
+    news: list[TickerNewsEntry] | None
+    """Prefetched recent news about the ticker, None if the prefetch failed."""
+    metrics: TickerMetrics | None
+    """Financial metrics computed locally from the prefetched ticker info, None if the prefetch failed."""
+    snapshot: TickerSnapshot | None
+    """Snapshot of the ticker from the last run, None if there is none or the incremental monitoring is disabled."""
+    delta: TickerDelta | None
+    """Changes in the prefetched data since the last snapshot, None if there is no snapshot."""
     analysis: str
     """Analysis and data about the ticker news, prices, and recommendations."""
     report: OutputTickerReport
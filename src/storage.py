@@ -0,0 +1,169 @@
+"""This module contains simple persistent key-value storage backends.
+
+The backends are used by the caches and persistent indexes of the agent. The Apify key-value store backend is used
+when running as an Actor, the local directory backend is a stand-in for local development and tests. The in-memory
+backend keeps the values only for the lifetime of the process, for example for the long-running server mode.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Protocol
+
+from apify import Actor
+from apify.storages import KeyValueStore
+
+_KEY_PATTERN = re.compile(r'^[a-zA-Z0-9!\-_.\'()]{1,256}$')
+_KEY_DISALLOWED_PATTERN = re.compile(r'[^a-zA-Z0-9!\-_.\'()]')
+MAX_KEY_LENGTH = 256
+
+
+class StorageBackend(Protocol):
+    """Persistent key-value storage backend for JSON serializable values."""
+
+    async def get_value(self, key: str) -> Any:  # noqa: ANN401
+        """Get the value for the key, None if the key does not exist."""
+
+    async def set_value(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Set the value for the key."""
+
+    async def delete_value(self, key: str) -> None:
+        """Delete the value for the key, deleting a missing key is a no-op."""
+
+
+def validate_key(key: str) -> str:
+    """Validate the storage key, the allowed characters are the same as for the Apify key-value store.
+
+    Args:
+        key (str): Storage key.
+
+    Returns:
+        str: The validated key.
+
+    Raises:
+        ValueError: If the key contains disallowed characters.
+    """
+    if not _KEY_PATTERN.match(key):
+        msg = f'Invalid storage key "{key}"!'
+        raise ValueError(msg)
+    return key
+
+
+def sanitize_key(key: str) -> str:
+    """Make a valid storage key, for example from the ticker symbols like "^GSPC".
+
+    Valid keys are kept as they are. Disallowed characters are replaced and a short hash of the original key is
+    appended, so the keys differing only in the disallowed characters do not collide.
+
+    Args:
+        key (str): Storage key, possibly with disallowed characters.
+
+    Returns:
+        str: Valid storage key.
+    """
+    if _KEY_PATTERN.match(key):
+        return key
+    key_hash = hashlib.blake2b(key.encode(), digest_size=4).hexdigest()
+    sanitized = _KEY_DISALLOWED_PATTERN.sub('_', key)[: MAX_KEY_LENGTH - len(key_hash) - 1]
+    return f'{sanitized}-{key_hash}'
+
+
+class KeyValueStoreBackend:
+    """Storage backend using a (named) Apify key-value store."""
+
+    def __init__(self, store_name: str | None = None) -> None:
+        self.store_name = store_name
+        self._store: KeyValueStore | None = None
+        self._lock = asyncio.Lock()
+
+    async def _get_store(self) -> KeyValueStore:
+        async with self._lock:
+            if self._store is None:
+                self._store = await Actor.open_key_value_store(name=self.store_name)
+            return self._store
+
+    async def get_value(self, key: str) -> Any:  # noqa: ANN401
+        """Get the value for the key.
+
+        Returns:
+            Any: Stored value or None if the key does not exist.
+        """
+        store = await self._get_store()
+        return await store.get_value(validate_key(key))
+
+    async def set_value(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Set the value for the key."""
+        store = await self._get_store()
+        await store.set_value(validate_key(key), value)
+
+    async def delete_value(self, key: str) -> None:
+        """Delete the value for the key, deleting a missing key is a no-op."""
+        store = await self._get_store()
+        await store.set_value(validate_key(key), None)
+
+
+class MemoryBackend:
+    """Storage backend keeping the values in memory, nothing survives the process."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, Any] = {}
+
+    async def get_value(self, key: str) -> Any:  # noqa: ANN401
+        """Get the value for the key.
+
+        Returns:
+            Any: Stored value or None if the key does not exist.
+        """
+        return self.values.get(validate_key(key))
+
+    async def set_value(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Set the value for the key."""
+        self.values[validate_key(key)] = value
+
+    async def delete_value(self, key: str) -> None:
+        """Delete the value for the key, deleting a missing key is a no-op."""
+        self.values.pop(validate_key(key), None)
+
+
+class LocalDirectoryBackend:
+    """Storage backend storing every value as a JSON file in a local directory."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def _key_path(self, key: str) -> Path:
+        return self.path / f'{validate_key(key)}.json'
+
+    async def get_value(self, key: str) -> Any:  # noqa: ANN401
+        """Get the value for the key.
+
+        Returns:
+            Any: Stored value or None if the key does not exist.
+        """
+        path = self._key_path(key)
+
+        def _read() -> Any:  # noqa: ANN401
+            if not path.exists():
+                return None
+            return json.loads(path.read_text(encoding='utf-8'))
+
+        return await asyncio.to_thread(_read)
+
+    async def set_value(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Set the value for the key."""
+        path = self._key_path(key)
+
+        def _write() -> None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(value), encoding='utf-8')
+            tmp_path.replace(path)
+
+        await asyncio.to_thread(_write)
+
+    async def delete_value(self, key: str) -> None:
+        """Delete the value for the key, deleting a missing key is a no-op."""
+        path = self._key_path(key)
+        await asyncio.to_thread(path.unlink, missing_ok=True)
@@ -0,0 +1,199 @@
+"""This module contains the persistent ticker to Google Finance stock ID resolution index.
+
+Google Finance identifies stocks by a stock ID (ticker and exchange, for example "TSLA:NASDAQ"). Resolving it requires
+a "search_stocks" run of the Google Finance scraper, which sits on the critical path of every ticker analysis.
+The mapping almost never changes, so it is pre-seeded for well-known tickers and lazily filled and persisted
+for the rest. Entries are invalidated when the stock details call for the stock ID fails, the invalidated tickers
+are persisted as tombstones (null stock IDs), so an invalidated seeded ticker is not restored from the seed.
+"""
+
+import asyncio
+import logging
+
+from src.storage import StorageBackend
+from src.utils import run_actor_get_default_dataset
+
+logger = logging.getLogger('apify')
+
+GOOGLE_FINANCE_ACTOR_ID = 'scraped_org/google-finance-scraper'
+INDEX_KEY = 'STOCK_IDS'
+DEFAULT_MAX_CONCURRENT_SEARCHES = 5
+
+SEED_STOCK_IDS = {
+    'AAPL': 'AAPL:NASDAQ',
+    'AMZN': 'AMZN:NASDAQ',
+    'DIS': 'DIS:NYSE',
+    'GOOG': 'GOOG:NASDAQ',
+    'GOOGL': 'GOOGL:NASDAQ',
+    'IBM': 'IBM:NYSE',
+    'JPM': 'JPM:NYSE',
+    'KO': 'KO:NYSE',
+    'META': 'META:NASDAQ',
+    'MSFT': 'MSFT:NASDAQ',
+    'NFLX': 'NFLX:NASDAQ',
+    'NVDA': 'NVDA:NASDAQ',
+    'TSLA': 'TSLA:NASDAQ',
+}
+
+
+async def search_google_stock_id(ticker: str) -> str:
+    """Search the Google Finance stock ID for the ticker using the Google Finance scraper.
+
+    Args:
+        ticker (str): Ticker symbol, for example 'TSLA'.
+
+    Returns:
+        str: Google Finance stock ID.
+
+    Raises:
+        RuntimeError: If the ticker is not found.
+    """
+    search_run_input: dict = {
+        'action': 'search_stocks',
+        'proxy': {'useApifyProxy': True},
+        'search_stocks': ticker,
+    }
+    # the resolved stock IDs are persisted in the index, bypass the scraper cache to not reuse invalidated results
+    _, dataset_items = await run_actor_get_default_dataset(GOOGLE_FINANCE_ACTOR_ID, search_run_input, use_cache=False)
+    for item in dataset_items:
+        if item.get('ticker') == ticker and (stock_id := item.get('stock_id')):
+            return str(stock_id)
+
+    msg = f'Could not find ticker {ticker} in Google Finance'
+    raise RuntimeError(msg)
+
+
+class StockIdResolver:
+    """Persistent ticker to Google Finance stock ID resolution index.
+
+    The searches of all the callers share a limit of the concurrent scraper runs, so a batch of unknown tickers
+    does not start all its runs at once.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend | None = None,
+        *,
+        seed: dict[str, str] | None = None,
+        max_concurrent_searches: int = DEFAULT_MAX_CONCURRENT_SEARCHES,
+    ) -> None:
+        self.backend = backend
+        self.seed = SEED_STOCK_IDS if seed is None else seed
+        self._index: dict[str, str] | None = None
+        self._invalidated: set[str] = set()
+        self._lock = asyncio.Lock()
+        self._search_semaphore = asyncio.Semaphore(max(1, max_concurrent_searches))
+
+    async def _get_index(self) -> dict[str, str]:
+        async with self._lock:
+            if self._index is None:
+                stored: dict[str, str | None] = (
+                    await self.backend.get_value(INDEX_KEY) if self.backend else None
+                ) or {}
+                self._invalidated = {ticker for ticker, stock_id in stored.items() if stock_id is None}
+                self._index = {
+                    ticker: stock_id for ticker, stock_id in {**self.seed, **stored}.items() if stock_id is not None
+                }
+            return self._index
+
+    async def _persist(self) -> None:
+        if self.backend is not None and self._index is not None:
+            await self.backend.set_value(INDEX_KEY, {**dict.fromkeys(self._invalidated), **self._index})
+
+    async def lookup(self, ticker: str) -> str | None:
+        """Look up the stock ID in the index without searching for it.
+
+        Args:
+            ticker (str): Ticker symbol.
+
+        Returns:
+            str | None: Stock ID or None if the ticker is not in the index.
+        """
+        return (await self._get_index()).get(ticker)
+
+    async def resolve(self, ticker: str) -> str:
+        """Resolve the stock ID for the ticker, searching for it if it is not in the index.
+
+        Args:
+            ticker (str): Ticker symbol.
+
+        Returns:
+            str: Google Finance stock ID.
+        """
+        return (await self.resolve_many([ticker]))[ticker]
+
+    async def _search(self, ticker: str) -> str:
+        async with self._search_semaphore:
+            return await search_google_stock_id(ticker)
+
+    async def resolve_many(self, tickers: list[str]) -> dict[str, str]:
+        """Resolve the stock IDs for multiple tickers, the unknown tickers are searched concurrently up to the limit.
+
+        Args:
+            tickers (list[str]): Ticker symbols.
+
+        Returns:
+            dict[str, str]: Mapping of the ticker to the stock ID.
+
+        Raises:
+            RuntimeError: If any of the tickers could not be resolved.
+        """
+        index = await self._get_index()
+        missing = [ticker for ticker in dict.fromkeys(tickers) if ticker not in index]
+        if missing:
+            logger.debug('Searching Google Finance stock IDs for tickers: %s', missing)
+            results = await asyncio.gather(*(self._search(t) for t in missing), return_exceptions=True)
+            errors = []
+            for ticker, result in zip(missing, results, strict=True):
+                if isinstance(result, BaseException):
+                    errors.append(result)
+                    continue
+                index[ticker] = result
+                self._invalidated.discard(ticker)
+            await self._persist()
+            if errors:
+                msg = '; '.join(str(error) for error in errors)
+                raise RuntimeError(msg)
+
+        return {ticker: index[ticker] for ticker in tickers}
+
+    async def invalidate(self, ticker: str) -> None:
+        """Remove the ticker from the index, so the next resolution searches for it again.
+
+        Args:
+            ticker (str): Ticker symbol.
+        """
+        index = await self._get_index()
+        if index.pop(ticker, None) is not None:
+            self._invalidated.add(ticker)
+            logger.debug('Invalidated Google Finance stock ID for ticker %s', ticker)
+            await self._persist()
+
+
+class StockIdResolverSingleton:
+    """Singleton class for the StockIdResolver instance.
+
+    If the instance is not created explicitly with a storage backend, an in-memory resolver is created on first use.
+    """
+
+    _instance: StockIdResolver | None = None
+
+    @classmethod
+    def create_get_instance(cls, backend: StorageBackend | None = None) -> StockIdResolver:
+        """Creates and returns StockIdResolver instance, used for creating the singleton instance.
+
+        Returns:
+            StockIdResolver: StockIdResolver instance.
+        """
+        if cls._instance is None:
+            cls._instance = StockIdResolver(backend)
+        return cls._instance
+
+    @classmethod
+    def get_instance(cls) -> StockIdResolver:
+        """Gets StockIdResolver instance.
+
+        Returns:
+            StockIdResolver: StockIdResolver instance.
+        """
+        return cls.create_get_instance()
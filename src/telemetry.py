@@ -0,0 +1,463 @@
+"""This module contains the span instrumentation of the agent graph.
+
+Every graph node, LLM turn, tool call and scraper Actor run is recorded as a span with its wall-clock time,
+queue wait, token usage, cache hits and downloaded bytes. The LangChain runnables (graph nodes, LLM turns and
+tools) are recorded by a callback handler passed to the graph run, the scraper helpers record their spans and
+metrics under the tool span they are called from.
+
+The finished spans are exported as JSON lines records to the key-value store of the run and optionally to OpenTelemetry,
+if the `opentelemetry-api` package is installed and an OTLP endpoint is configured.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass, field
+from typing import Any, Literal, Protocol
+from uuid import UUID
+
+from apify import Actor
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import ensure_config
+from langgraph.constants import START
+
+logger = logging.getLogger('apify')
+
+TELEMETRY_KEY_PREFIX = 'telemetry'
+OTEL_ENDPOINT_ENV_VAR = 'OTEL_EXPORTER_OTLP_ENDPOINT'
+
+type SpanKind = Literal['ticker', 'node', 'llm', 'tool', 'actor']
+
+
+@dataclass
+class Span:
+    """Timed operation of the agent."""
+
+    name: str
+    kind: SpanKind
+    trace_id: str
+    """ID of the trace, the graph thread of the ticker."""
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    parent_id: str | None = None
+    start_time: float = field(default_factory=time.time)
+    """Unix timestamp of the start."""
+    end_time: float | None = None
+    """Unix timestamp of the end, None if the span is still open."""
+    queue_wait_secs: float | None = None
+    """Time the operation waited before it started (semaphore, previous step)."""
+    attributes: dict[str, Any] = field(default_factory=dict)
+    """Metrics of the operation, for example prompt_tokens, completion_tokens, cache_hit or bytes_downloaded."""
+    error: str | None = None
+
+    @property
+    def duration_secs(self) -> float | None:
+        """Wall-clock duration of the span, None if it is still open."""
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def to_dict(self) -> dict:
+        """Convert the span into a JSON serializable dict.
+
+        Returns:
+            dict: Span as dict.
+        """
+        return {**asdict(self), 'duration_secs': self.duration_secs}
+
+
+class SpanExporter(Protocol):
+    """Exporter of the finished spans."""
+
+    async def export(self, spans: Sequence[Span]) -> None:
+        """Export the spans."""
+
+
+class KeyValueStoreSpanExporter:
+    """Exporter writing the spans as JSON lines into key-value store records.
+
+    Every export writes its spans into a new "<prefix>-<start timestamp>-<number>.jsonl" record, so the spans are
+    uploaded only once. The timestamp of the exporter creation keeps the records of a restarted run apart and
+    the keys sort in the export order.
+    """
+
+    def __init__(self, key_prefix: str = TELEMETRY_KEY_PREFIX, store_name: str | None = None) -> None:
+        self.key_prefix = key_prefix
+        self.store_name = store_name
+        self._started_at = int(time.time() * 1000)
+        self._record_count = 0
+
+    async def export(self, spans: Sequence[Span]) -> None:
+        """Write the spans into a new JSON lines record."""
+        self._record_count += 1
+        key = f'{self.key_prefix}-{self._started_at}-{self._record_count:05d}.jsonl'
+        lines = ''.join(f'{json.dumps(span.to_dict(), default=str)}\n' for span in spans)
+        store = await Actor.open_key_value_store(name=self.store_name)
+        await store.set_value(key, lines, content_type='application/jsonl')
+
+
+class OpenTelemetrySpanExporter:
+    """Exporter replaying the spans into the OpenTelemetry tracer provider.
+
+    The `opentelemetry-api` package is optional, the tracer provider and the OTLP exporter are configured
+    by the environment, for example by the `opentelemetry-instrument` command.
+    """
+
+    def __init__(self) -> None:
+        # raises ImportError if OpenTelemetry is not installed
+        self._trace = importlib.import_module('opentelemetry.trace')
+        self._tracer = self._trace.get_tracer('finance-monitoring-agent')
+
+    async def export(self, spans: Sequence[Span]) -> None:
+        """Replay the spans, parents are started before their children."""
+        otel_spans: dict[str, Any] = {}
+        for span in sorted(spans, key=lambda span: span.start_time):
+            parent = otel_spans.get(span.parent_id or '')
+            otel_spans[span.span_id] = self._tracer.start_span(
+                span.name,
+                context=self._trace.set_span_in_context(parent) if parent is not None else None,
+                start_time=int(span.start_time * 1e9),
+                attributes={
+                    'kind': span.kind,
+                    'trace_id': span.trace_id,
+                    **{
+                        key: value
+                        for key, value in span.attributes.items()
+                        if isinstance(value, str | bool | int | float)
+                    },
+                    **({'queue_wait_secs': span.queue_wait_secs} if span.queue_wait_secs is not None else {}),
+                    **({'error': span.error} if span.error else {}),
+                },
+            )
+        for span in spans:
+            otel_spans[span.span_id].end(end_time=int((span.end_time or span.start_time) * 1e9))
+
+
+class Telemetry:
+    """Collector of the agent spans."""
+
+    def __init__(self, exporters: Sequence[SpanExporter]) -> None:
+        self.exporters = list(exporters)
+        self.spans: list[Span] = []
+        self._open_spans: dict[str, Span] = {}
+        self._exported_count = 0
+        self._lock = asyncio.Lock()
+
+    def start_span(  # noqa: PLR0913
+        self,
+        name: str,
+        kind: SpanKind,
+        *,
+        trace_id: str,
+        span_id: str | None = None,
+        parent_id: str | None = None,
+        queue_wait_secs: float | None = None,
+        **attributes: Any,  # noqa: ANN401
+    ) -> Span:
+        """Start the span.
+
+        Returns:
+            Span: Open span.
+        """
+        span = Span(name=name, kind=kind, trace_id=trace_id, parent_id=parent_id, queue_wait_secs=queue_wait_secs)
+        if span_id is not None:
+            span.span_id = span_id
+        span.attributes.update(attributes)
+        self._open_spans[span.span_id] = span
+        return span
+
+    def end_span(self, span: Span, *, error: BaseException | None = None, **attributes: Any) -> None:  # noqa: ANN401
+        """End the span."""
+        span.end_time = time.time()
+        span.attributes.update(attributes)
+        if error is not None:
+            span.error = f'{type(error).__name__}: {error}'
+        self._open_spans.pop(span.span_id, None)
+        self.spans.append(span)
+
+    def get_open_span(self, span_id: str | None) -> Span | None:
+        """Get the open span.
+
+        Returns:
+            Span | None: Open span or None if it is not open.
+        """
+        return self._open_spans.get(span_id or '')
+
+    def create_callback_handler(self, trace_id: str, parent_id: str | None = None) -> 'TelemetryCallbackHandler':
+        """Create the LangChain callback handler recording the spans of a graph run.
+
+        Args:
+            trace_id (str): Trace ID, the graph thread ID.
+            parent_id (str | None): ID of the parent span of the graph run.
+
+        Returns:
+            TelemetryCallbackHandler: Callback handler.
+        """
+        return TelemetryCallbackHandler(self, trace_id, parent_id)
+
+    async def flush(self) -> None:
+        """Export the spans finished since the last flush."""
+        async with self._lock:
+            spans = self.spans[self._exported_count :]
+            if not spans:
+                return
+            self._exported_count += len(spans)
+            for exporter in self.exporters:
+                try:
+                    await exporter.export(spans)
+                except Exception:
+                    logger.exception('Failed to export the telemetry spans with %s', type(exporter).__name__)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Summarize the finished spans by their kind and name, the most time consuming first.
+
+        Returns:
+            dict[str, dict[str, float]]: Count, total and maximum duration in seconds per "kind:name".
+        """
+        summary: dict[str, dict[str, float]] = defaultdict(lambda: {'count': 0, 'total_secs': 0.0, 'max_secs': 0.0})
+        for span in self.spans:
+            item = summary[f'{span.kind}:{span.name}']
+            duration = span.duration_secs or 0.0
+            item['count'] += 1
+            item['total_secs'] = round(item['total_secs'] + duration, 3)
+            item['max_secs'] = round(max(item['max_secs'], duration), 3)
+        return dict(sorted(summary.items(), key=lambda item: -item[1]['total_secs']))
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler recording the spans of the graph nodes, LLM turns and tool calls.
+
+    The span IDs are the LangChain run IDs, the runs between the recorded ones (for example the runnable
+    sequences inside the nodes) are skipped and their children are attached to the closest recorded ancestor.
+    """
+
+    # the handler only updates in-memory state, run it in the event loop instead of the thread pool
+    run_inline = True
+
+    def __init__(self, telemetry: Telemetry, trace_id: str, parent_id: str | None = None) -> None:
+        self.telemetry = telemetry
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self._parents: dict[UUID, UUID | None] = {}
+        self._spans: dict[UUID, Span] = {}
+        self._last_node_end: float | None = None
+        self._last_llm_end: float | None = None
+
+    def _get_parent_id(self, parent_run_id: UUID | None) -> str | None:
+        while parent_run_id is not None:
+            if parent_run_id in self._spans:
+                return self._spans[parent_run_id].span_id
+            parent_run_id = self._parents.get(parent_run_id)
+        return self.parent_id
+
+    def _start(
+        self,
+        name: str,
+        kind: SpanKind,
+        run_id: UUID,
+        parent_run_id: UUID | None,
+        queue_since: float | None = None,
+        **attributes: Any,  # noqa: ANN401
+    ) -> None:
+        now = time.time()
+        self._spans[run_id] = self.telemetry.start_span(
+            name,
+            kind,
+            trace_id=self.trace_id,
+            span_id=str(run_id),
+            parent_id=self._get_parent_id(parent_run_id),
+            queue_wait_secs=round(now - queue_since, 3) if queue_since is not None else None,
+            **attributes,
+        )
+
+    def _end(self, run_id: UUID, *, error: BaseException | None = None, **attributes: Any) -> Span | None:  # noqa: ANN401
+        self._parents.pop(run_id, None)
+        if (span := self._spans.pop(run_id, None)) is not None:
+            self.telemetry.end_span(span, error=error, **attributes)
+        return span
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,  # noqa: ARG002
+        inputs: dict[str, Any],  # noqa: ARG002
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Start the node span, the other chains are only tracked for the parent lookup.
+
+        The input node of the graph, reported by the older LangGraph versions, is not a span.
+        """
+        self._parents[run_id] = parent_run_id
+        node = (metadata or {}).get('langgraph_node')
+        if node is not None and node != START and kwargs.get('name') == node:
+            self._start(node, 'node', run_id, parent_run_id, queue_since=self._last_node_end)
+
+    def on_chain_end(self, outputs: dict[str, Any], *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """End the node span."""
+        if self._end(run_id) is not None:
+            self._last_node_end = time.time()
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """End the node span with the error."""
+        if self._end(run_id, error=error) is not None:
+            self._last_node_end = time.time()
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any] | None,  # noqa: ARG002
+        messages: list[list[BaseMessage]],  # noqa: ARG002
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,  # noqa: ANN401, ARG002
+    ) -> None:
+        """Start the LLM turn span."""
+        self._start('llm', 'llm', run_id, parent_run_id, model=(metadata or {}).get('ls_model_name'))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """End the LLM turn span with the token usage."""
+        prompt_tokens = completion_tokens = 0
+        cache_hit = False
+        for generations in response.generations:
+            for generation in generations:
+                if not isinstance(generation, ChatGeneration):
+                    continue
+                message = generation.message
+                if usage := getattr(message, 'usage_metadata', None):
+                    prompt_tokens += usage['input_tokens']
+                    completion_tokens += usage['output_tokens']
+                cache_hit = cache_hit or bool(message.response_metadata.get('llm_cache_hit'))
+        self._end(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cache_hit=cache_hit)
+        self._last_llm_end = time.time()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """End the LLM turn span with the error."""
+        self._end(run_id, error=error)
+        self._last_llm_end = time.time()
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any] | None,
+        input_str: str,  # noqa: ARG002
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Start the tool call span, the queue wait is the time since the LLM turn that requested the call."""
+        self._parents[run_id] = parent_run_id
+        name = kwargs.get('name') or (serialized or {}).get('name') or 'tool'
+        self._start(name, 'tool', run_id, parent_run_id, queue_since=self._last_llm_end)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """End the tool call span."""
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """End the tool call span with the error."""
+        self._end(run_id, error=error)
+
+
+def get_current_span() -> Span | None:
+    """Get the open span of the LangChain runnable (the tool or the node) the caller runs in.
+
+    Returns:
+        Span | None: Open span or None if the telemetry is disabled or the caller is not in a recorded runnable.
+    """
+    if (telemetry := TelemetrySingleton.get_instance()) is None:
+        return None
+    callbacks = ensure_config().get('callbacks')
+    parent_run_id = getattr(callbacks, 'parent_run_id', None)
+    return telemetry.get_open_span(str(parent_run_id) if parent_run_id else None)
+
+
+def record_span_metric(name: str, value: float) -> None:
+    """Add the value to the metric of the current span, does nothing without a current span.
+
+    Args:
+        name (str): Metric name, for example "bytes_downloaded".
+        value (float): Value to add.
+    """
+    if (span := get_current_span()) is not None:
+        span.attributes[name] = span.attributes.get(name, 0) + value
+
+
+def start_child_span(name: str, kind: SpanKind, **attributes: Any) -> Span | None:  # noqa: ANN401
+    """Start a span under the current span.
+
+    Returns:
+        Span | None: Open span or None if the telemetry is disabled.
+    """
+    if (telemetry := TelemetrySingleton.get_instance()) is None:
+        return None
+    config = ensure_config()
+    parent = get_current_span()
+    trace_id = parent.trace_id if parent else str(config.get('configurable', {}).get('thread_id', ''))
+    return telemetry.start_span(
+        name, kind, trace_id=trace_id, parent_id=parent.span_id if parent else None, **attributes
+    )
+
+
+def end_span(span: Span | None, *, error: BaseException | None = None, **attributes: Any) -> None:  # noqa: ANN401
+    """End the span started by `start_child_span`, does nothing for None."""
+    if span is not None and (telemetry := TelemetrySingleton.get_instance()) is not None:
+        telemetry.end_span(span, error=error, **attributes)
+
+
+def create_span_exporters() -> list[SpanExporter]:
+    """Create the span exporters, OpenTelemetry is used if the OTLP endpoint is configured.
+
+    Returns:
+        list[SpanExporter]: Span exporters.
+    """
+    exporters: list[SpanExporter] = [KeyValueStoreSpanExporter()]
+    if os.environ.get(OTEL_ENDPOINT_ENV_VAR):
+        try:
+            exporters.append(OpenTelemetrySpanExporter())
+        except ImportError:
+            logger.warning(
+                '%s is set but OpenTelemetry is not installed, spans are not exported to it', OTEL_ENDPOINT_ENV_VAR
+            )
+    return exporters
+
+
+class TelemetrySingleton:
+    """Singleton class for the Telemetry instance.
+
+    To use the singleton class, call the create_get_instance method to create the instance. If the instance is not
+    created, the telemetry is disabled and get_instance returns None.
+    """
+
+    _instance: Telemetry | None = None
+
+    @classmethod
+    def create_get_instance(cls, exporters: Sequence[SpanExporter]) -> Telemetry:
+        """Creates and returns Telemetry instance, used for creating the singleton instance.
+
+        Args:
+            exporters (Sequence[SpanExporter]): Span exporters.
+
+        Returns:
+            Telemetry: Telemetry instance.
+        """
+        if cls._instance is None:
+            cls._instance = Telemetry(exporters)
+        return cls._instance
+
+    @classmethod
+    def get_instance(cls) -> Telemetry | None:
+        """Gets Telemetry instance.
+
+        Returns:
+            Telemetry | None: Telemetry instance or None if the telemetry is disabled.
+        """
+        return cls._instance
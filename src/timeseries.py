@@ -0,0 +1,142 @@
+"""This module contains the compact price time series parsed from the Google Finance scraper results.
+
+The scraper already returns the intraday and the last 30 days prices of the stock. They are parsed into
+array-backed series and the returns, volatility, drawdown and moving averages are computed locally,
+only the summary statistics are exposed to the LLM.
+"""
+
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from src.models import PriceSeriesStats
+
+TIME_KEYS = ('date', 'time', 'datetime', 'timestamp')
+PRICE_KEYS = ('price', 'close', 'value')
+TRADING_DAYS_PER_YEAR = 252
+MOVING_AVERAGE_WINDOWS = (5, 20)
+MIN_POINTS = 2
+
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def parse_price(value: object) -> float | None:
+    """Parse the scraped price, for example 123.4, "123.4" or "$1,234.50".
+
+    Args:
+        value (object): Scraped price.
+
+    Returns:
+        float | None: Price or None if it is not a number.
+    """
+    if isinstance(value, int | float) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str) and (match := _NUMBER_PATTERN.search(value.replace(',', ''))):
+        return float(match.group())
+    return None
+
+
+@dataclass(frozen=True)
+class PriceSeries:
+    """Price series backed by a NumPy array."""
+
+    times: tuple[str, ...]
+    """Times of the prices as scraped."""
+    prices: npt.NDArray[np.float64]
+    """Prices in the time order."""
+
+    @classmethod
+    def from_items(cls, items: Sequence[object] | None) -> 'PriceSeries':
+        """Parse the scraped price items, the items without a price are skipped.
+
+        Args:
+            items (Sequence[object] | None): Scraped price items in the time order, for example
+                [{'date': '2025-01-02', 'price': 123.4}, ...].
+
+        Returns:
+            PriceSeries: Price series.
+        """
+        times: list[str] = []
+        prices: list[float] = []
+        for item in items or []:
+            if not isinstance(item, Mapping):
+                continue
+            price = next((parse_price(item[key]) for key in PRICE_KEYS if key in item), None)
+            if price is None:
+                continue
+            times.append(str(next((item[key] for key in TIME_KEYS if key in item), len(times))))
+            prices.append(price)
+        return cls(times=tuple(times), prices=np.array(prices, dtype=float))
+
+    def returns(self) -> npt.NDArray[np.float64]:
+        """Get the simple returns between the consecutive prices.
+
+        Returns:
+            npt.NDArray[np.float64]: Returns, one less than the prices.
+        """
+        return np.diff(self.prices) / self.prices[:-1]
+
+    def moving_average(self, window: int) -> npt.NDArray[np.float64]:
+        """Get the simple moving average of the prices.
+
+        Args:
+            window (int): Number of prices in the window.
+
+        Returns:
+            npt.NDArray[np.float64]: Moving averages of the full windows, empty if the series is shorter.
+        """
+        if window > len(self.prices):
+            return np.array([], dtype=float)
+        cumsum = np.cumsum(np.insert(self.prices, 0, 0.0))
+        return (cumsum[window:] - cumsum[:-window]) / window
+
+    def max_drawdown(self) -> float:
+        """Get the maximum relative drop of the price from a previous peak.
+
+        Returns:
+            float: Maximum drawdown as a non-positive fraction.
+        """
+        peaks = np.maximum.accumulate(self.prices)
+        return float(np.min(self.prices / peaks - 1))
+
+    def stats(self, *, periods_per_year: int | None = None) -> PriceSeriesStats | None:
+        """Compute the summary statistics of the series.
+
+        Args:
+            periods_per_year (int | None): Number of the series periods per year, used for the annualized
+                volatility, not annualized if not set.
+
+        Returns:
+            PriceSeriesStats | None: Summary statistics or None if the series is too short or invalid.
+        """
+        if len(self.prices) < MIN_POINTS or np.any(self.prices <= 0):
+            return None
+
+        returns = self.returns()
+        volatility = float(np.std(returns, ddof=1)) if len(returns) >= MIN_POINTS else None
+        moving_averages = {
+            f'sma_{window}': round(float(averages[-1]), 4)
+            for window in MOVING_AVERAGE_WINDOWS
+            if len(averages := self.moving_average(window))
+        }
+        return PriceSeriesStats(
+            points=len(self.prices),
+            start=self.times[0],
+            end=self.times[-1],
+            first=float(self.prices[0]),
+            last=float(self.prices[-1]),
+            low=float(np.min(self.prices)),
+            high=float(np.max(self.prices)),
+            change_pct=round((float(self.prices[-1] / self.prices[0]) - 1) * 100, 2),
+            volatility_pct=round(volatility * 100, 2) if volatility is not None else None,
+            annualized_volatility_pct=(
+                round(volatility * float(np.sqrt(periods_per_year)) * 100, 2)
+                if volatility is not None and periods_per_year
+                else None
+            ),
+            max_drawdown_pct=round(self.max_drawdown() * 100, 2),
+            moving_averages=moving_averages,
+        )
@@ -0,0 +1,175 @@
+"""This module contains the resilient tool executor for the agent tools.
+
+Every tool call gets a wall-clock deadline, failed or timed out calls are retried a bounded number of times
+with a jittered exponential backoff, so one hung scraper cannot stall the whole report and a transient failure
+does not cost an extra LLM turn. Tools can report partial results while they run (for example the news
+downloaded so far), they are returned if the tool eventually times out. If the tool fails completely, the agent
+gets an error message telling it to continue with the data it has instead of an exception.
+
+Multiple tool calls emitted by the LLM in one turn are executed concurrently by the ReAct agent tool node,
+the deadlines make sure the slowest tool bounds the turn.
+"""
+
+import asyncio
+import logging
+import random
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+logger = logging.getLogger('apify')
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    """Execution policy of a tool."""
+
+    timeout_secs: float = 120.0
+    """Wall-clock deadline of a single tool call attempt."""
+    max_retries: int = 1
+    """Number of retries after the first failed attempt."""
+    backoff_base_secs: float = 1.0
+    """Base of the exponential backoff between the attempts."""
+    backoff_max_secs: float = 10.0
+    """Maximum backoff between the attempts."""
+
+
+DEFAULT_TOOL_POLICY = ToolPolicy()
+TOOL_POLICIES = {
+    # the scrapers run for a while, the stock details are batched with other tickers
+    'tool_get_google_ticker_info': ToolPolicy(timeout_secs=180.0),
+    'tool_get_google_news': ToolPolicy(timeout_secs=120.0),
+    # the Yahoo Finance scraper is known to hang, do not wait for it long
+    'tool_get_yahoo_ticker_news': ToolPolicy(timeout_secs=60.0, max_retries=0),
+    'tool_get_ticker_price_targets': ToolPolicy(timeout_secs=60.0, max_retries=0),
+    'tool_get_ticker_info': ToolPolicy(timeout_secs=60.0, max_retries=0),
+    'tool_get_ticker_recommendations': ToolPolicy(timeout_secs=60.0, max_retries=0),
+}
+
+_partial_results: ContextVar[list | None] = ContextVar('partial_results', default=None)
+
+
+class ToolExecutionError(RuntimeError):
+    """Raised when the tool call fails in all the attempts."""
+
+
+def report_partial_result(item: object) -> None:
+    """Report a partial result of the running tool, it is returned if the tool times out.
+
+    Does nothing if the tool is not run by the executor.
+
+    Args:
+        item (object): Partial result item, for example a news entry.
+    """
+    if (partial_results := _partial_results.get()) is not None:
+        partial_results.append(item)
+
+
+def get_tool_policy(tool_name: str) -> ToolPolicy:
+    """Get the execution policy of the tool.
+
+    Args:
+        tool_name (str): Tool name.
+
+    Returns:
+        ToolPolicy: Tool policy.
+    """
+    return TOOL_POLICIES.get(tool_name, DEFAULT_TOOL_POLICY)
+
+
+def get_backoff_secs(attempt: int, policy: ToolPolicy) -> float:
+    """Get the jittered exponential backoff before the next attempt ("full jitter").
+
+    Args:
+        attempt (int): Number of the failed attempt, starting from 0.
+        policy (ToolPolicy): Tool policy.
+
+    Returns:
+        float: Backoff in seconds.
+    """
+    return random.uniform(0, min(policy.backoff_max_secs, policy.backoff_base_secs * 2**attempt))  # noqa: S311
+
+
+async def execute_with_policy[T](name: str, call: Callable[[], Awaitable[T]], policy: ToolPolicy) -> T | list:
+    """Execute the call with the deadline and the retries of the policy.
+
+    Args:
+        name (str): Tool name, used for logging.
+        call (Callable[[], Awaitable[T]]): Factory of the call coroutine, called for every attempt.
+        policy (ToolPolicy): Tool policy.
+
+    Returns:
+        T | list: Result of the call or the partial results reported by the timed out call.
+
+    Raises:
+        ToolExecutionError: If all the attempts fail without partial results.
+    """
+    last_error: BaseException | None = None
+    for attempt in range(policy.max_retries + 1):
+        partial_results: list = []
+        token = _partial_results.set(partial_results)
+        try:
+            async with asyncio.timeout(policy.timeout_secs):
+                return await call()
+        except TimeoutError as e:
+            if partial_results:
+                logger.warning('Tool %s timed out, using %d partial results', name, len(partial_results))
+                return partial_results
+            last_error = TimeoutError(f'timed out after {policy.timeout_secs:.0f} seconds')
+            last_error.__cause__ = e
+        except Exception as e:  # noqa: BLE001
+            last_error = e
+        finally:
+            _partial_results.reset(token)
+
+        logger.warning('Tool %s failed (attempt %d/%d): %s', name, attempt + 1, policy.max_retries + 1, last_error)
+        if attempt < policy.max_retries:
+            await asyncio.sleep(get_backoff_secs(attempt, policy))
+
+    msg = f'Tool {name} failed after {policy.max_retries + 1} attempts: {last_error}'
+    raise ToolExecutionError(msg) from last_error
+
+
+async def run_tool(tool: BaseTool, tool_input: dict, *, policy: ToolPolicy | None = None) -> object:
+    """Run the tool with the deadline and the retries of its policy.
+
+    Args:
+        tool (BaseTool): Tool to run.
+        tool_input (dict): Tool input.
+        policy (ToolPolicy | None): Tool policy, the tool default if not set.
+
+    Returns:
+        object: Tool output or the partial results if the tool timed out.
+    """
+    policy = policy or get_tool_policy(tool.name)
+    return await execute_with_policy(tool.name, lambda: tool.ainvoke(tool_input), policy)
+
+
+def resilient_tool(tool: BaseTool, *, policy: ToolPolicy | None = None) -> BaseTool:
+    """Wrap the tool, so it is run with the deadline and the retries of its policy.
+
+    If all the attempts fail, the wrapped tool returns an error message for the LLM instead of raising,
+    so the agent continues with the data it already has.
+
+    Args:
+        tool (BaseTool): Tool to wrap.
+        policy (ToolPolicy | None): Tool policy, the tool default if not set.
+
+    Returns:
+        BaseTool: Tool with the same name, description and arguments.
+    """
+
+    async def _run(**kwargs: object) -> object:
+        try:
+            return await run_tool(tool, kwargs, policy=policy)
+        except ToolExecutionError as e:
+            return f'{e}. Do not call this tool again, continue with the data you already have.'
+
+    return StructuredTool.from_function(
+        coroutine=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
@@ -7,29 +7,34 @@ To learn how to create a new tool, see:
 - https://python.langchain.com/docs/how_to/#tools
 """
 
+import asyncio
 import datetime
 import logging
+from contextlib import aclosing
 
-from apify import Actor
 from langchain_core.tools import tool
 
-from src.models import (
-    GoogleTickerInfo,
-    GoogleTickerInfoYearlyFinancials,
-    TickerInfo,
-    TickerNewsEntry,
-    TickerPriceTarget,
-    TickerRecommendationEntry,
-)
-from src.utils import get_yahoo_dataset_data, run_actor_get_default_dataset
+from src.batching import RequestCoalescer
+from src.cache import ActorResultCacheSingleton
+from src.dedup import cluster_news
+from src.models import GoogleTickerInfo, GoogleTickerInfoYearlyFinancials, TickerNewsEntry
+from src.symbols import GOOGLE_FINANCE_ACTOR_ID, StockIdResolverSingleton
+from src.timeseries import TRADING_DAYS_PER_YEAR, PriceSeries
+from src.tool_executor import report_partial_result
+from src.utils import iterate_actor_default_dataset, run_actor_get_default_dataset
 
 logger = logging.getLogger('apify')
 
+GOOGLE_NEWS_FIELDS = ['title', 'publishedAt', 'source', 'link']
+
 
 @tool
 async def tool_get_google_news(query: str, date_from: str, max_items: int = 25) -> list[TickerNewsEntry]:
     """Tool to get recent news from Google News (can be used to get news about a ticker).
 
+    The same story syndicated by multiple providers is returned only once, with the URLs of the other providers
+    in the sources.
+
     Args:
         query (str): Query string.
         date_from (str): Date from which to get news in format 'YYYY-MM-DD'.
@@ -51,69 +56,45 @@ async def tool_get_google_news(query: str, date_from: str, max_items: int = 25)
         'language': 'US:en',
     }
     actor_id = 'lhotanova/google-news-scraper'
-    _, dataset_items = await run_actor_get_default_dataset(actor_id, run_input)
-
-    google_news = []
-    for entry in dataset_items:
-        title = entry.get('title')
-        published_at = entry.get('publishedAt')
-        provider = entry.get('source')
-        url = entry.get('link')
-
-        if not all([title, published_at, provider, url]):
-            logger.warning('Skipping news entry with missing fields: %s', entry)
-            continue
-        google_news.append(
-            TickerNewsEntry(
-                title=str(title),
-                published_at=str(published_at),
-                provider=str(provider),
-                url=str(url),
+    google_news: list[TickerNewsEntry] = []
+    dataset_items = iterate_actor_default_dataset(actor_id, run_input, fields=GOOGLE_NEWS_FIELDS)
+    async with aclosing(dataset_items):
+        async for entry in dataset_items:
+            # stop downloading the dataset once there are enough news
+            if len(google_news) >= max_items:
+                break
+
+            title = entry.get('title')
+            published_at = entry.get('publishedAt')
+            provider = entry.get('source')
+            url = entry.get('link')
+
+            if not all([title, published_at, provider, url]):
+                logger.warning('Skipping news entry with missing fields: %s', entry)
+                continue
+            google_news.append(
+                TickerNewsEntry(
+                    title=str(title),
+                    published_at=str(published_at),
+                    provider=str(provider),
+                    url=str(url),
+                )
             )
-        )
-    return google_news
-
+            # the news downloaded so far are used if the tool times out
+            report_partial_result(google_news[-1])
+    return cluster_news(google_news)
 
-@tool
-async def tool_get_google_ticker_info(ticker: str) -> GoogleTickerInfo:
-    """Tool to get information about a ticker from Google Finance.
 
-    Information includes ticker description, CEO and key stocks financials data.
+def get_google_stock_details_run_input(stock_ids: list[str]) -> dict:
+    """Get the Google Finance scraper run input for the stock details.
 
     Args:
-        ticker (str): Ticker symbol, for example 'TSLA'.
+        stock_ids (list[str]): Google Finance stock IDs, for example ['TSLA:NASDAQ'].
 
     Returns:
-        GoogleTickerInfo: Ticker information.
-
-    Raises:
-        RuntimeError: If dataset does not contain required fields.
+        dict: Actor run input.
     """
-    logger.debug('Running tool: tool_get_google_ticker_info')
-
-    # First search for the eschange the ticker uses
-    actor_id = 'scraped_org/google-finance-scraper'
-    search_run_input: dict = {
-        'action': 'search_stocks',
-        'proxy': {'useApifyProxy': True},
-        'search_stocks': ticker,
-    }
-    dataset_id, dataset_items = await run_actor_get_default_dataset(actor_id, search_run_input)
-    if not dataset_items:
-        msg = f'Could not find ticker {ticker} in Google Finance'
-        raise RuntimeError(msg)
-
-    # Get the stock id
-    stock_id = None
-    for item in dataset_items:
-        if (_ticker := item.get('ticker')) == ticker and (_stock_id := item.get('stock_id')):
-            stock_id = _stock_id
-            break
-    if not stock_id:
-        msg = f'Could not find ticker {ticker} in Google Finance'
-        raise RuntimeError(msg)
-
-    get_run_input: dict = {
+    return {
         'action': 'stocks_details',
         'extract_quarterly_financial': True,
         'extract_stock_news': True,
@@ -121,232 +102,166 @@ async def tool_get_google_ticker_info(ticker: str) -> GoogleTickerInfo:
         'extract_stock_prices_last_30_days': True,
         'extract_yearly_financial': True,
         'proxy': {'useApifyProxy': True},
-        'stocks': [stock_id],
+        'stocks': stock_ids,
         'country': 'us',
         'language': 'en',
         'market_trends_types': ['most-active'],
     }
-    actor_id = 'scraped_org/google-finance-scraper'
-    dataset_id, dataset_items = await run_actor_get_default_dataset(actor_id, get_run_input)
-
-    if not dataset_items:
-        msg = f'Failed to get data from dataset "{dataset_id}"! Dataset is empty.'
-        raise RuntimeError(msg)
-
-    data = dataset_items[0]
 
-    return GoogleTickerInfo(
-        current_price=data.get('stock_details', {}).get('current_price'),
-        about=data.get('stock_about', {}).get('about'),
-        ceo=data.get('stock_about', {}).get('CEO'),
-        founded=data.get('stock_about', {}).get('founded'),
-        pe_ratio=data.get('stock_details', {}).get('pe_ratio'),
-        price_year_range=(
-            data.get('stock_details', {}).get('year_range', {}).get('min'),
-            data.get('stock_details', {}).get('year_range', {}).get('max'),
-        ),
-        yerly_financials=[
-            GoogleTickerInfoYearlyFinancials(
-                year=financial.get('year'),
-                earning_per_share=financial.get('earning_per_share'),
-                net_profit_margin=financial.get('net_profit_margin'),
-                return_on_capital=financial.get('return_on_capital'),
-                effective_tax_rate=financial.get('effective_tax_rate'),
-                return_on_assets=financial.get('return_on_assets'),
-                price_to_book=financial.get('price_to_book'),
-            )
-            for financial in data.get('financials', {}).get('yearly_financial', [])
-        ],
-    )
 
+def match_google_stock_details(stock_ids: list[str], dataset_items: list[dict]) -> dict[str, dict]:
+    """Match the stock details dataset items to the requested stock IDs.
 
-# Yahoo tools are currently broken - scraper is not working #
-@tool
-async def tool_get_yahoo_ticker_news(ticker: str) -> list[TickerNewsEntry]:
-    """Tool to get recent news from Yahoo Finance about a ticker.
+    The items of a multi-stock run are matched by their "stock_id" field, the same field the stock search returns.
+    The only item of a single stock run is matched to the stock.
 
     Args:
-        ticker (str): Ticker symbol, for example 'TSLA'.
+        stock_ids (list[str]): Requested Google Finance stock IDs.
+        dataset_items (list[dict]): Stock details dataset items.
 
     Returns:
-        list[TickerNewsEntry]: Recent news about the ticker.
-
-    Raises:
-        RuntimeError: If dataset does not contain required fields.
+        dict[str, dict]: Mapping of the stock ID to its dataset item, unmatched stock IDs are missing.
     """
-    logger.debug('Running tool: tool_get_yahoo_ticker_news')
-    run_input = {
-        'process': 'gn',
-        'tickers': [f'{ticker}'],
-    }
-    if not (run := await Actor.apify_client.actor('canadesk/yahoo-finance').call(run_input=run_input)):
-        msg = 'Failed to start the Actor canadesk/yahoo-finance!'
-        raise RuntimeError(msg)
-
-    dataset_id = run['defaultDatasetId']
-    result = await get_yahoo_dataset_data(dataset_id)
-
-    ticker_news = []
-    for entry in result.get('data', []):
-        content = entry.get('content', {})
-        title = content.get('title')
-        summary = content.get('summary')
-        published_at = content.get('pubDate')
-        provider = content.get('provider', {}).get('displayName')
-        url = content.get('canonicalUrl', {}).get('url')
-
-        if not all([title, summary, published_at, provider, url]):
-            logger.warning('Skipping news entry with missing fields: %s', entry)
-            continue
-        ticker_news.append(
-            TickerNewsEntry(
-                title=title,
-                summary=summary,
-                published_at=published_at,
-                provider=provider,
-                url=url,
-            )
-        )
-    return ticker_news
+    if len(stock_ids) == 1:
+        return {stock_ids[0]: dataset_items[0]} if dataset_items else {}
+    return {item['stock_id']: item for item in dataset_items if item.get('stock_id') in stock_ids}
 
 
-@tool
-async def tool_get_ticker_price_targets(ticker: str) -> TickerPriceTarget | str:
-    """Tool to get current price targets (analysis) for a ticker.
+async def fetch_google_stock_details_batch(stock_ids: list[str]) -> dict[str, dict]:
+    """Get the stock details for multiple stocks in a single Google Finance scraper run.
+
+    Matched items are stored in the scraper cache under the single stock run input, so later lookups of
+    the individual stocks are served from the cache. The stocks not matched in the multi-stock run, or all of them
+    if the multi-stock run fails, are fetched with their own single stock runs. A stock whose single stock run fails
+    is missing from the result, so only its lookup fails.
 
     Args:
-        ticker (str): Ticker symbol, for example 'TSLA'.
-        output (Literal['str', 'model']): Output format.
-            'str' - return as string.
-            'model' - return as Pydantic model.
+        stock_ids (list[str]): Google Finance stock IDs.
 
     Returns:
-        TickerPriceTarget: Current price targets.
+        dict[str, dict]: Mapping of the stock ID to its details dataset item.
+    """
+    if len(stock_ids) == 1:
+        return await _fetch_google_stock_details(stock_ids)
+
+    try:
+        matched = await _fetch_google_stock_details(stock_ids)
+    except Exception as e:  # noqa: BLE001
+        logger.warning('Batched details run failed, fetching the stocks one by one: %s', e)
+        matched = {}
+
+    if unmatched := [stock_id for stock_id in stock_ids if stock_id not in matched]:
+        if matched:
+            logger.warning('Stocks not matched in the batched details run, fetching them one by one: %s', unmatched)
+        results = await asyncio.gather(
+            *(_fetch_google_stock_details([stock_id]) for stock_id in unmatched), return_exceptions=True
+        )
+        for stock_id, result in zip(unmatched, results, strict=True):
+            if isinstance(result, BaseException):
+                logger.warning('Failed to get details for stock id %s: %s', stock_id, result)
+                continue
+            matched.update(result)
+    return matched
 
-    Raises:
-            RuntimeError: If dataset does not contain required fields.
+
+async def _fetch_google_stock_details(stock_ids: list[str]) -> dict[str, dict]:
+    """Run the Google Finance scraper for the stocks and cache the matched items under the single stock run input.
+
+    Returns:
+        dict[str, dict]: Mapping of the stock ID to its details dataset item, unmatched stock IDs are missing.
     """
-    logger.debug('Running tool: tool_get_ticker_price_targets')
-    run_input = {
-        'process': 'gp',
-        'tickers': [f'{ticker}'],
-    }
-    if not (run := await Actor.apify_client.actor('canadesk/yahoo-finance').call(run_input=run_input)):
-        msg = 'Failed to start the Actor canadesk/yahoo-finance!'
-        raise RuntimeError(msg)
+    run_input = get_google_stock_details_run_input(stock_ids)
+    dataset_id, dataset_items = await run_actor_get_default_dataset(GOOGLE_FINANCE_ACTOR_ID, run_input, use_cache=False)
+    matched = match_google_stock_details(stock_ids, dataset_items)
 
-    dataset_id = run['defaultDatasetId']
-    result = await get_yahoo_dataset_data(dataset_id)
+    if cache := ActorResultCacheSingleton.get_instance():
+        for stock_id, item in matched.items():
+            await cache.set(GOOGLE_FINANCE_ACTOR_ID, get_google_stock_details_run_input([stock_id]), dataset_id, [item])
+    return matched
 
-    result.update(result.get('data', {}))
-    del result['data']
 
-    fields = ['ticker', 'current', 'low', 'high', 'mean', 'median']
-    if not all(f in result for f in fields):
-        msg = (
-            f'Dataset "{dataset_id}" does not contain required fields {fields}! '
-            f'It is possible that the ticker "{ticker}" is incorrect.'
-        )
-        raise RuntimeError(msg)
-
-    return TickerPriceTarget(
-        current_price=result['current'],
-        analyst_price_target_low=result['low'],
-        analyst_price_target_high=result['high'],
-        analyst_price_target_mean=result['mean'],
-        analyst_price_target_median=result['median'],
-    )
+# Concurrent stock details lookups (for example from multiple tickers in a batch run) share one scraper run
+_stock_details_coalescer = RequestCoalescer(fetch_google_stock_details_batch)
 
 
-@tool
-async def tool_get_ticker_basic_info(ticker: str) -> TickerInfo:
-    """Tool to get basic information about a ticker.
+async def get_google_stock_details(stock_id: str) -> dict:
+    """Get the stock details from Google Finance.
 
     Args:
-        ticker (str): Ticker symbol, for example 'TSLA'.
+        stock_id (str): Google Finance stock ID, for example 'TSLA:NASDAQ'.
 
     Returns:
-        TickerInfo: Basic information about the ticker.
+        dict: Stock details dataset item.
 
     Raises:
-        RuntimeError: If dataset does not contain required fields.
+        RuntimeError: If the stock details are not found.
     """
-    logger.debug('Running tool: tool_get_ticker_basic_info')
-    run_input = {
-        'process': 'gi',
-        'tickers': [f'{ticker}'],
-    }
-    if not (run := await Actor.apify_client.actor('canadesk/yahoo-finance').call(run_input=run_input)):
-        msg = 'Failed to start the Actor canadesk/yahoo-finance!'
-        raise RuntimeError(msg)
-
-    dataset_id = run['defaultDatasetId']
-    result = await get_yahoo_dataset_data(dataset_id)
-
-    if not (data := result.get('data')):
-        msg = f'Failed to get data from dataset "{dataset_id}"! Dataset does not contain "data" field.'
-        raise RuntimeError(msg)
-    # flatten dataset
-    data['description'] = data.get('longBusinessSummary')
-    result.update(data)
-    del result['data']
-
-    fields = ['ticker', 'sector', 'industry', 'description']
-    if not all(f in result for f in fields):
-        msg = (
-            f'Dataset "{dataset_id}" does not contain required fields {fields}! '
-            f'It is possible that the ticker "{ticker}" is incorrect.'
-        )
-        raise RuntimeError(msg)
+    cache = ActorResultCacheSingleton.get_instance()
+    run_input = get_google_stock_details_run_input([stock_id])
+    if cache is not None and (cached := await cache.get(GOOGLE_FINANCE_ACTOR_ID, run_input)) is not None:
+        return cached[1][0]
 
-    return TickerInfo(**{f: result[f] for f in fields})
+    try:
+        return await _stock_details_coalescer.get(stock_id)
+    except RuntimeError as e:
+        msg = f'Failed to get Google Finance details for stock "{stock_id}": {e}'
+        raise RuntimeError(msg) from e
 
 
 @tool
-async def tool_get_ticker_recommendations(ticker: str) -> list[TickerRecommendationEntry]:
-    """Tool to get recommendations for a ticker.
+async def tool_get_google_ticker_info(ticker: str) -> GoogleTickerInfo:
+    """Tool to get information about a ticker from Google Finance.
+
+    Information includes ticker description, CEO, key stocks financials data and the summary statistics
+    of the intraday and the last 30 days prices.
 
     Args:
         ticker (str): Ticker symbol, for example 'TSLA'.
 
     Returns:
-        list[TickerRecommendationEntry]: Recommendations for the ticker.
-
-    Raises:
-        RuntimeError: If dataset does not contain required fields.
+        GoogleTickerInfo: Ticker information.
     """
-    logger.debug('Running tool: tool_get_ticker_recommendations')
-    run_input = {
-        'process': 'gr',
-        'tickers': [f'{ticker}'],
-    }
-    if not (run := await Actor.apify_client.actor('canadesk/yahoo-finance').call(run_input=run_input)):
-        msg = 'Failed to start the Actor canadesk/yahoo-finance!'
-        raise RuntimeError(msg)
-
-    dataset_id = run['defaultDatasetId']
-    result = await get_yahoo_dataset_data(dataset_id)
-
-    ticker_recommendations = []
-    for entry in result.get('data', []):
-        period = entry.get('period')
-        strongbuy = entry.get('strongbuy')
-        buy = entry.get('buy')
-        hold = entry.get('hold')
-        sell = entry.get('sell')
-        strongsell = entry.get('strongsell')
-
-        if not all([period, strongbuy, buy, hold, sell, strongsell]):
-            logger.warning('Skipping recommendation entry with missing fields: %s', entry)
-        ticker_recommendations.append(
-            TickerRecommendationEntry(
-                period=period,
-                recommendations_strong_buy=strongbuy,
-                recommendations_buy=buy,
-                recommendations_hold=hold,
-                recommendations_sell=sell,
-                recommendations_strong_sell=strongsell,
-            )
-        )
+    logger.debug('Running tool: tool_get_google_ticker_info')
+
+    # Resolve the stock id (ticker and exchange) from the index, invalidate it if the details call fails
+    resolver = StockIdResolverSingleton.get_instance()
+    data = None
+    if stock_id := await resolver.lookup(ticker):
+        try:
+            data = await get_google_stock_details(stock_id)
+        except RuntimeError as e:
+            logger.warning('Failed to get details for stock id %s, searching for it again: %s', stock_id, e)
+            await resolver.invalidate(ticker)
 
-    return ticker_recommendations
+    if data is None:
+        stock_id = await resolver.resolve(ticker)
+        data = await get_google_stock_details(stock_id)
+
+    return GoogleTickerInfo(
+        current_price=data.get('stock_details', {}).get('current_price'),
+        about=data.get('stock_about', {}).get('about'),
+        ceo=data.get('stock_about', {}).get('CEO'),
+        founded=data.get('stock_about', {}).get('founded'),
+        pe_ratio=data.get('stock_details', {}).get('pe_ratio'),
+        price_year_range=(
+            data.get('stock_details', {}).get('year_range', {}).get('min'),
+            data.get('stock_details', {}).get('year_range', {}).get('max'),
+        ),
+        yerly_financials=[
+            GoogleTickerInfoYearlyFinancials(
+                year=financial.get('year'),
+                earning_per_share=financial.get('earning_per_share'),
+                net_profit_margin=financial.get('net_profit_margin'),
+                return_on_capital=financial.get('return_on_capital'),
+                effective_tax_rate=financial.get('effective_tax_rate'),
+                return_on_assets=financial.get('return_on_assets'),
+                price_to_book=financial.get('price_to_book'),
+            )
+            for financial in data.get('financials', {}).get('yearly_financial', [])
+        ],
+        # the price series are already scraped, only their statistics are passed on
+        intraday_prices=PriceSeries.from_items(data.get('stock_prices_in_day')).stats(),
+        last_30_days_prices=PriceSeries.from_items(data.get('stock_prices_last_30_days')).stats(
+            periods_per_year=TRADING_DAYS_PER_YEAR
+        ),
+    )
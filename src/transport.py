@@ -0,0 +1,264 @@
+"""This module contains the shared, connection-pooled HTTP transport for the OpenAI and Apify API calls.
+
+Every upstream gets one shared `httpx.AsyncClient` with a keep-alive connection pool and HTTP/2, so the concurrent
+tickers reuse the connections instead of opening new ones. The transport caps the number of requests in flight
+to the upstream, a request waits for a free slot until its response is read or closed.
+
+The OpenAI requests are also paced by the adaptive rate limiter. It follows the rate limit headers of the OpenAI
+responses (the remaining requests and tokens per minute and their reset times) and holds the next requests back
+once the quota is exhausted, until it resets. A 429 response pauses all the requests for its retry-after time,
+so the batch runs use the whole quota without the storms of 429 retries.
+"""
+
+import asyncio
+import logging
+import re
+from collections.abc import AsyncIterator, Callable
+from typing import Any, TypedDict
+
+import httpx
+
+logger = logging.getLogger('apify')
+
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_KEEPALIVE_EXPIRY_SECS = 30.0
+DEFAULT_RETRY_AFTER_SECS = 1.0
+# the token rate limit is counted from the request size, the request body is not tokenized
+CHARS_PER_TOKEN = 4
+
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNIT_SECS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+class RateLimiterStats(TypedDict):
+    """Rate limiter counters."""
+
+    requests: int
+    throttled: int
+    waited_secs: float
+
+
+def parse_reset_duration(value: str) -> float:
+    """Parse the rate limit reset duration of the OpenAI headers, for example "1s", "6m0s" or "20ms".
+
+    Args:
+        value (str): Reset duration.
+
+    Returns:
+        float: Duration in seconds.
+
+    Raises:
+        ValueError: If the value is not a duration.
+    """
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts or ''.join(number + unit for number, unit in parts) != value.strip():
+        msg = f'Invalid rate limit reset duration "{value}"!'
+        raise ValueError(msg)
+    return sum(float(number) * _DURATION_UNIT_SECS[unit] for number, unit in parts)
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Estimate the tokens the request counts towards the token rate limit.
+
+    Returns:
+        int: Estimated tokens.
+    """
+    return len(request.content) // CHARS_PER_TOKEN
+
+
+class AdaptiveRateLimiter:
+    """Rate limiter following the rate limit headers of the responses.
+
+    The remaining requests and tokens are taken from the last response and decremented by every request sent
+    since then. A request is held back while the remaining quota does not cover it and the quota did not reset.
+    The waiting requests are released in the order they arrived.
+    """
+
+    def __init__(self) -> None:
+        self._remaining_requests: int | None = None
+        self._remaining_tokens: int | None = None
+        self._requests_reset_at = 0.0
+        self._tokens_reset_at = 0.0
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.waited_secs = 0.0
+
+    def _get_wait_secs(self, tokens: int, now: float) -> float:
+        """Get the time to wait until the request fits into the quota, the quotas past their reset are cleared.
+
+        Returns:
+            float: Seconds to wait, zero or negative if the request can be sent now.
+        """
+        if self._remaining_requests is not None and now >= self._requests_reset_at:
+            self._remaining_requests = None
+        if self._remaining_tokens is not None and now >= self._tokens_reset_at:
+            self._remaining_tokens = None
+
+        wait_secs = self._blocked_until - now
+        if self._remaining_requests is not None and self._remaining_requests < 1:
+            wait_secs = max(wait_secs, self._requests_reset_at - now)
+        if self._remaining_tokens is not None and self._remaining_tokens < tokens:
+            wait_secs = max(wait_secs, self._tokens_reset_at - now)
+        return wait_secs
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until the request fits into the remaining quota and reserve it.
+
+        Args:
+            tokens (int): Estimated tokens of the request.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while (wait_secs := self._get_wait_secs(tokens, loop.time())) > 0:
+                logger.debug('Rate limit reached, waiting %.2f s', wait_secs)
+                self.waited_secs += wait_secs
+                await asyncio.sleep(wait_secs)
+            self.requests += 1
+            if self._remaining_requests is not None:
+                self._remaining_requests -= 1
+            if self._remaining_tokens is not None:
+                self._remaining_tokens -= tokens
+
+    def update(self, status_code: int, headers: httpx.Headers) -> None:
+        """Update the remaining quota from the response headers.
+
+        Args:
+            status_code (int): Response status code.
+            headers (httpx.Headers): Response headers.
+        """
+        now = asyncio.get_running_loop().time()
+        try:
+            if (remaining := headers.get('x-ratelimit-remaining-requests')) is not None:
+                self._remaining_requests = int(remaining)
+                self._requests_reset_at = now + parse_reset_duration(headers.get('x-ratelimit-reset-requests', '0s'))
+            if (remaining := headers.get('x-ratelimit-remaining-tokens')) is not None:
+                self._remaining_tokens = int(remaining)
+                self._tokens_reset_at = now + parse_reset_duration(headers.get('x-ratelimit-reset-tokens', '0s'))
+        except ValueError as e:
+            logger.warning('Ignoring invalid rate limit headers: %s', e)
+
+        if status_code == httpx.codes.TOO_MANY_REQUESTS:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, now + self._get_retry_after_secs(headers))
+
+    @staticmethod
+    def _get_retry_after_secs(headers: httpx.Headers) -> float:
+        try:
+            if (retry_after_ms := headers.get('retry-after-ms')) is not None:
+                return float(retry_after_ms) / 1e3
+            if (retry_after := headers.get('retry-after')) is not None:
+                return float(retry_after)
+        except ValueError:
+            pass
+        return DEFAULT_RETRY_AFTER_SECS
+
+    def stats(self) -> RateLimiterStats:
+        """Get the rate limiter statistics.
+
+        Returns:
+            RateLimiterStats: Sent requests, throttled (429) responses and the total time spent waiting.
+        """
+        return RateLimiterStats(
+            requests=self.requests, throttled=self.throttled, waited_secs=round(self.waited_secs, 3)
+        )
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response stream releasing the in-flight slot when it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class LimitedTransport(httpx.AsyncBaseTransport):
+    """Transport capping the requests in flight and pacing them by the rate limiter."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        *,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+    ) -> None:
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send the request once there is a free slot and the rate limit allows it.
+
+        Returns:
+            httpx.Response: Response, its slot is released when it is closed.
+
+        Raises:
+            TypeError: If the wrapped transport returns a sync response stream.
+        """
+        await self._semaphore.acquire()
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(estimate_request_tokens(request))
+            response = await self.transport.handle_async_request(request)
+            if self.rate_limiter is not None:
+                self.rate_limiter.update(response.status_code, response.headers)
+            if not isinstance(response.stream, httpx.AsyncByteStream):
+                msg = 'Expected an async response stream!'
+                raise TypeError(msg)  # noqa: TRY301
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self._semaphore.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self.transport.aclose()
+
+
+def create_http_client(
+    *,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    **kwargs: Any,  # noqa: ANN401
+) -> httpx.AsyncClient:
+    """Create the shared HTTP client of an upstream.
+
+    The keep-alive pool is sized to the in-flight cap, so every request in flight can reuse a pooled connection.
+
+    Args:
+        max_in_flight (int): Maximum number of requests in flight to the upstream.
+        rate_limiter (AdaptiveRateLimiter | None): Rate limiter pacing the requests, they are not paced if not set.
+        **kwargs: Other arguments of the `httpx.AsyncClient`.
+
+    Returns:
+        httpx.AsyncClient: Shared HTTP client.
+    """
+    limits = httpx.Limits(
+        max_connections=max_in_flight,
+        max_keepalive_connections=max_in_flight,
+        keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY_SECS,
+    )
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=limits)
+    return httpx.AsyncClient(
+        transport=LimitedTransport(transport, max_in_flight=max_in_flight, rate_limiter=rate_limiter),
+        **kwargs,
+    )
@@ -0,0 +1,293 @@
+"""This module contains the per-model accounting and the incremental charging of the LLM token usage.
+
+Different graph nodes can use different OpenAI models (see src/llm.py) and every model is charged with its own
+PPE event, so the token usage is counted per model. The model of an LLM call is taken from the invocation
+parameters at its start, the tokens from the usage metadata of its response.
+
+The usage meter aggregates the tokens of all the tickers per model and per ticker as the responses arrive and
+charges them in batched increments: once enough tokens are pending or after a short interval, so a crashed or
+timed out run loses at most the last interval of the billing data. Only the whole hundreds of tokens (the PPE
+event unit) are charged until the final flush charges the rest. Once the spend ceiling is reached (the token
+limit of the run or the maximum total charge of the Actor run), the next LLM calls fail instead of being made.
+"""
+
+import asyncio
+import contextlib
+import logging
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypedDict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from src.ppe_utils import TOKENS_PER_EVENT, charge_for_model_tokens
+
+logger = logging.getLogger('apify')
+
+UNKNOWN_MODEL = 'unknown'
+DEFAULT_CHARGE_BATCH_TOKENS = 10_000
+DEFAULT_CHARGE_INTERVAL_SECS = 5.0
+
+_model_usage_var: ContextVar['ModelUsageCallbackHandler | None'] = ContextVar('model_usage', default=None)
+register_configure_hook(_model_usage_var, inheritable=True)
+
+
+class SpendLimitReachedError(RuntimeError):
+    """Raised instead of an LLM call when the spend ceiling is reached."""
+
+
+class UsageStats(TypedDict):
+    """Usage meter counters."""
+
+    total_tokens: int
+    tokens_by_model: dict[str, int]
+    tokens_by_ticker: dict[str, int]
+    charged_tokens: int
+    limit_reached: bool
+
+
+class UsageMeter:
+    """Meter aggregating the token usage per model and per ticker and charging it incrementally.
+
+    The token counters are updated synchronously from the LLM callbacks, the charges are made by the flushes
+    serialized by a lock, so the concurrent tickers neither lose nor double charge any tokens.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_total_tokens: int | None = None,
+        charge_batch_tokens: int = DEFAULT_CHARGE_BATCH_TOKENS,
+        charge_interval_secs: float = DEFAULT_CHARGE_INTERVAL_SECS,
+    ) -> None:
+        self.max_total_tokens = max_total_tokens
+        self.charge_batch_tokens = charge_batch_tokens
+        self.charge_interval_secs = charge_interval_secs
+        self.tokens_by_model: Counter[str] = Counter()
+        self.tokens_by_ticker: Counter[str] = Counter()
+        self.charged_tokens = 0
+        self.limit_reached = False
+        self._uncharged_tokens: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._flush_requested = asyncio.Event()
+
+    @property
+    def total_tokens(self) -> int:
+        """Total number of tokens of all the models."""
+        return self.tokens_by_model.total()
+
+    def check_limit(self) -> None:
+        """Check the spend ceiling before an LLM call.
+
+        Raises:
+            SpendLimitReachedError: If the spend ceiling is reached.
+        """
+        if self.limit_reached:
+            msg = 'The spend limit of the run is reached, no more LLM calls are made!'
+            raise SpendLimitReachedError(msg)
+
+    def record(self, model: str, tokens: int, ticker: str | None = None) -> None:
+        """Record the tokens of the LLM call and schedule the charge.
+
+        Args:
+            model (str): OpenAI model name.
+            tokens (int): Number of tokens.
+            ticker (str | None): Ticker the tokens were used for.
+        """
+        if not tokens:
+            return
+        with self._lock:
+            self.tokens_by_model[model] += tokens
+            self._uncharged_tokens[model] += tokens
+            if ticker is not None:
+                self.tokens_by_ticker[ticker] += tokens
+            if self.max_total_tokens is not None and self.total_tokens >= self.max_total_tokens:
+                self.limit_reached = True
+            pending_tokens = self._uncharged_tokens.total()
+        self._schedule_flush(immediately=pending_tokens >= self.charge_batch_tokens)
+
+    def _schedule_flush(self, *, immediately: bool) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # without a running loop (a sync LLM call in a worker thread), the tokens are charged by the next flush
+            return
+        if immediately:
+            self._flush_requested.set()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        # the flush waits for the interval, unless a full batch of tokens is pending sooner
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(self._flush_requested.wait(), self.charge_interval_secs)
+        self._flush_requested.clear()
+        await self.flush()
+
+    async def flush(self, *, final: bool = False) -> None:
+        """Charge the pending tokens.
+
+        Args:
+            final (bool): Whether to charge also the rest below a whole hundred of tokens, set at the end of the run.
+        """
+        if final and (flush_task := self._flush_task) is not None and flush_task is not asyncio.current_task():
+            # the scheduled flush is woken up and awaited, no task is left pending after the final flush
+            self._flush_requested.set()
+            await flush_task
+        async with self._flush_lock:
+            with self._lock:
+                charges = {}
+                for model, tokens in self._uncharged_tokens.items():
+                    # the rest is kept for the next flush, the final flush rounds it up to the whole event
+                    charged_tokens = tokens if final else tokens - tokens % TOKENS_PER_EVENT
+                    if charged_tokens:
+                        charges[model] = charged_tokens
+                self._uncharged_tokens.subtract(charges)
+                self._uncharged_tokens = +self._uncharged_tokens
+
+            for model, tokens in charges.items():
+                try:
+                    result = await charge_for_model_tokens(model, tokens)
+                except Exception:
+                    logger.exception('Failed to charge %d tokens of model %s', tokens, model)
+                    # the tokens are charged by the next flush
+                    with self._lock:
+                        self._uncharged_tokens[model] += tokens
+                    continue
+                self.charged_tokens += tokens
+                if result.event_charge_limit_reached and not self.limit_reached:
+                    logger.warning('The maximum total charge of the run is reached, no more LLM calls are made')
+                    self.limit_reached = True
+
+    def stats(self) -> UsageStats:
+        """Get the usage meter statistics.
+
+        Returns:
+            UsageStats: Token usage per model and ticker and the charged tokens.
+        """
+        return UsageStats(
+            total_tokens=self.total_tokens,
+            tokens_by_model=dict(self.tokens_by_model),
+            tokens_by_ticker=dict(self.tokens_by_ticker),
+            charged_tokens=self.charged_tokens,
+            limit_reached=self.limit_reached,
+        )
+
+
+class UsageMeterSingleton:
+    """Singleton class for the UsageMeter instance.
+
+    To use the singleton class, call the create_get_instance method to create the instance. If the instance is not
+    created, the token usage is only counted per ticker and not charged, and get_instance returns None.
+    """
+
+    _instance: UsageMeter | None = None
+
+    @classmethod
+    def create_get_instance(cls, *, max_total_tokens: int | None = None) -> UsageMeter:
+        """Creates and returns UsageMeter instance, used for creating the singleton instance.
+
+        Args:
+            max_total_tokens (int | None): Token limit of the run, no limit if not set.
+
+        Returns:
+            UsageMeter: UsageMeter instance.
+        """
+        if cls._instance is None:
+            cls._instance = UsageMeter(max_total_tokens=max_total_tokens)
+        return cls._instance
+
+    @classmethod
+    def get_instance(cls) -> UsageMeter | None:
+        """Gets UsageMeter instance.
+
+        Returns:
+            UsageMeter | None: UsageMeter instance or None if the usage is not metered.
+        """
+        return cls._instance
+
+
+class ModelUsageCallbackHandler(BaseCallbackHandler):
+    """Callback handler counting the LLM tokens per model and reporting them to the usage meter."""
+
+    # the callbacks are cheap, they run in the event loop and their errors (the spend limit) abort the LLM call
+    run_inline = True
+    raise_error = True
+
+    def __init__(self, *, meter: UsageMeter | None = None, ticker: str | None = None) -> None:
+        super().__init__()
+        self.meter = meter
+        self.ticker = ticker
+        self.tokens_by_model: Counter[str] = Counter()
+        self._run_models: dict[UUID, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        """Total number of tokens of all the models."""
+        return self.tokens_by_model.total()
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],  # noqa: ARG002
+        messages: list[list[BaseMessage]],  # noqa: ARG002
+        *,
+        run_id: UUID,
+        invocation_params: dict[str, Any] | None = None,
+        **kwargs: Any,  # noqa: ANN401, ARG002
+    ) -> None:
+        """Check the spend ceiling and remember the model of the LLM call."""
+        if self.meter is not None:
+            self.meter.check_limit()
+        params = invocation_params or {}
+        self._run_models[run_id] = params.get('model') or params.get('model_name') or UNKNOWN_MODEL
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Count the tokens of the LLM call, the cached responses have zero usage."""
+        model = self._run_models.pop(run_id, UNKNOWN_MODEL)
+        tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = generation.message if isinstance(generation, ChatGeneration) else None
+                if isinstance(message, AIMessage) and message.usage_metadata:
+                    tokens += message.usage_metadata['total_tokens']
+        if not tokens and response.llm_output:
+            tokens = response.llm_output.get('token_usage', {}).get('total_tokens', 0)
+        with self._lock:
+            self.tokens_by_model[model] += tokens
+        if self.meter is not None:
+            self.meter.record(model, tokens, self.ticker)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Forget the failed LLM call."""
+        self._run_models.pop(run_id, None)
+
+
+@contextmanager
+def track_model_usage(ticker: str | None = None) -> Iterator[ModelUsageCallbackHandler]:
+    """Count the tokens per model of all the LLM calls made in the context.
+
+    The handler is bound to the current task context, as with `get_openai_callback`. The tokens are also
+    reported to the usage meter, if it is created.
+
+    Args:
+        ticker (str | None): Ticker the LLM calls are made for.
+
+    Yields:
+        ModelUsageCallbackHandler: Handler with the token counts.
+    """
+    handler = ModelUsageCallbackHandler(meter=UsageMeterSingleton.get_instance(), ticker=ticker)
+    token = _model_usage_var.set(handler)
+    try:
+        yield handler
+    finally:
+        _model_usage_var.reset(token)
@@ -1,31 +1,192 @@
+import json
+from collections.abc import AsyncGenerator
+
 from apify import Actor
 
+from src.cache import ActorResultCacheSingleton
+from src.runs import call_actor
+from src.telemetry import TelemetrySingleton, record_span_metric
+from src.transport import create_http_client
+
+DATASET_PAGE_SIZE = 100
+APIFY_MAX_IN_FLIGHT = 32
+
+
+async def setup_apify_http_client(max_in_flight: int = APIFY_MAX_IN_FLIGHT) -> None:
+    """Replace the HTTP client of the Actor Apify client with the shared pooled client (see src/transport.py).
+
+    The Apify client keeps its headers, timeout and retries, only the connections are pooled and capped, so
+    the scraper runs, the run polling and the dataset reads of all the tickers share them.
+
+    Args:
+        max_in_flight (int): Maximum number of Apify API requests in flight.
+    """
+    # apify-client (1.9, see uv.lock) has no public way to pass the HTTP client, it sends all the async requests with
+    # the `httpx_async_client` attribute of its HTTP client, tests/test_utils.py checks the attribute is still used
+    http_client = Actor.apify_client.http_client
+    default_client = http_client.httpx_async_client
+    http_client.httpx_async_client = create_http_client(
+        max_in_flight=max_in_flight,
+        headers=default_client.headers,
+        follow_redirects=default_client.follow_redirects,
+        timeout=default_client.timeout,
+    )
+    await default_client.aclose()
+
+
+def get_cache_run_input(run_input: dict, fields: list[str] | None, omit: list[str] | None) -> dict:
+    """Get the run input used as the cache key, the dataset field projection is part of the key.
+
+    Args:
+        run_input (dict): Actor run input.
+        fields (list[str] | None): Dataset fields to include.
+        omit (list[str] | None): Dataset fields to omit.
+
+    Returns:
+        dict: Run input for the cache key.
+    """
+    if not fields and not omit:
+        return run_input
+    return {'run_input': run_input, 'fields': fields, 'omit': omit}
+
+
+async def run_actor_get_default_dataset_id(actor_id: str, run_input: dict) -> str:
+    """Run an Actor and get the ID of its default dataset.
+
+    A failed or timed out Actor run raises the RuntimeError of the run registry (see src/runs.py).
+
+    Args:
+        actor_id (str): Actor ID.
+        run_input (dict): Actor run input.
+
+    Returns:
+        str: Dataset ID.
+    """
+    run = await call_actor(actor_id, run_input)
+    return str(run['defaultDatasetId'])
 
-async def run_actor_get_default_dataset(actor_id: str, run_input: dict) -> tuple[str, list[dict]]:
+
+async def iterate_dataset_items(
+    dataset_id: str,
+    *,
+    fields: list[str] | None = None,
+    omit: list[str] | None = None,
+    limit: int | None = None,
+    page_size: int = DATASET_PAGE_SIZE,
+) -> AsyncGenerator[dict]:
+    """Iterate over the dataset items page by page.
+
+    Only one page of items is held in memory at a time and the iteration can be stopped early, the next page
+    is not requested until the previous one is consumed.
+
+    Args:
+        dataset_id (str): Dataset ID.
+        fields (list[str] | None): Dataset fields to include, all fields if not set.
+        omit (list[str] | None): Dataset fields to omit.
+        limit (int | None): Maximum number of items to iterate over.
+        page_size (int): Number of items requested per page.
+
+    Yields:
+        dict: Dataset item.
+    """
+    dataset = Actor.apify_client.dataset(dataset_id)
+    offset = 0
+    while limit is None or offset < limit:
+        page_limit = page_size if limit is None else min(page_size, limit - offset)
+        page = await dataset.list_items(offset=offset, limit=page_limit, fields=fields, omit=omit)
+        if TelemetrySingleton.get_instance() is not None:
+            # size of the items as JSON, the client does not expose the size of the response
+            record_span_metric('bytes_downloaded', sum(len(json.dumps(item)) for item in page.items))
+        for item in page.items:
+            yield item
+        offset += len(page.items)
+        if len(page.items) < page_limit:
+            break
+
+
+async def iterate_actor_default_dataset(
+    actor_id: str,
+    run_input: dict,
+    *,
+    fields: list[str] | None = None,
+    omit: list[str] | None = None,
+    use_cache: bool = True,
+) -> AsyncGenerator[dict]:
+    """Run an Actor and iterate over its default dataset items as they are downloaded.
+
+    The result is cached only if the iteration is not stopped early.
+
+    Args:
+        actor_id (str): Actor ID.
+        run_input (dict): Actor run input.
+        fields (list[str] | None): Dataset fields to include, all fields if not set.
+        omit (list[str] | None): Dataset fields to omit.
+        use_cache (bool): Whether to use the Actor result cache.
+
+    Yields:
+        dict: Dataset item.
+    """
+    cache = ActorResultCacheSingleton.get_instance() if use_cache else None
+    cache_run_input = get_cache_run_input(run_input, fields, omit)
+    if cache is not None and (cached := await cache.get(actor_id, cache_run_input)) is not None:
+        record_span_metric('scraper_cache_hits', 1)
+        for item in cached[1]:
+            yield item
+        return
+
+    dataset_id = await run_actor_get_default_dataset_id(actor_id, run_input)
+    dataset_items = []
+    async for item in iterate_dataset_items(dataset_id, fields=fields, omit=omit):
+        if cache is not None:
+            dataset_items.append(item)
+        yield item
+
+    if cache is not None and dataset_items:
+        await cache.set(actor_id, cache_run_input, dataset_id, dataset_items)
+
+
+async def run_actor_get_default_dataset(
+    actor_id: str,
+    run_input: dict,
+    *,
+    fields: list[str] | None = None,
+    omit: list[str] | None = None,
+    use_cache: bool = True,
+) -> tuple[str, list[dict]]:
     """Run an Actor and get the default dataset.
 
+    If the Actor result cache is enabled, the cached result for the same Actor and run input is returned
+    instead of starting a new Actor run.
+
     Args:
         actor_id (str): Actor ID.
         run_input (dict): Actor run input.
+        fields (list[str] | None): Dataset fields to include, all fields if not set.
+        omit (list[str] | None): Dataset fields to omit.
+        use_cache (bool): Whether to use the Actor result cache.
 
     Returns:
         str, list[dict]: Dataset ID and dataset items.
-
-    Raises:
-        RuntimeError: If Actor run fails.
     """
-    if not (run := await Actor.apify_client.actor(actor_id).call(run_input=run_input)):
-        msg = f'Failed to start the Actor {actor_id}!'
-        raise RuntimeError(msg)
+    cache = ActorResultCacheSingleton.get_instance() if use_cache else None
+    cache_run_input = get_cache_run_input(run_input, fields, omit)
+    if cache is not None and (cached := await cache.get(actor_id, cache_run_input)) is not None:
+        record_span_metric('scraper_cache_hits', 1)
+        return cached
 
-    dataset_id = run['defaultDatasetId']
-    dataset_items: list[dict] = (await Actor.apify_client.dataset(dataset_id).list_items()).items
+    dataset_id = await run_actor_get_default_dataset_id(actor_id, run_input)
+    dataset_items = [item async for item in iterate_dataset_items(dataset_id, fields=fields, omit=omit)]
+    # do not cache empty results, they are most likely caused by a failed scrape
+    if cache is not None and dataset_items:
+        await cache.set(actor_id, cache_run_input, dataset_id, dataset_items)
     return dataset_id, dataset_items
 
 
 async def get_yahoo_dataset_data(dataset_id: str) -> dict:
     """Retrieve data from Yahoo Actor run Apify dataset.
 
+    Only the first dataset item is downloaded.
+
     Args:
         dataset_id (str): Dataset ID.
 
@@ -33,16 +194,10 @@ async def get_yahoo_dataset_data(dataset_id: str) -> dict:
         dict: Dataset record with the data.
 
     Raises:
-        RuntimeError: If dataset retrieval fails.
-        ValueError: If dataset is empty.
+        RuntimeError: If dataset is empty.
     """
-    dataset_items: list[dict] = (await Actor.apify_client.dataset(dataset_id).list_items()).items
-    if not dataset_items:
-        msg = f'Failed to get dataset "{dataset_id}"!'
-        raise RuntimeError(msg)
-
-    if len(dataset_items) == 0:
-        msg = f'Failed to get data from dataset "{dataset_id}", no items found!'
-        raise ValueError(msg)
+    async for item in iterate_dataset_items(dataset_id, limit=1):
+        return item
 
-    return dataset_items[0]
+    msg = f'Failed to get data from dataset "{dataset_id}", no items found!'
+    raise RuntimeError(msg)
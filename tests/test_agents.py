@@ -0,0 +1,168 @@
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from langchain_core.tools import BaseTool
+from langchain_openai import ChatOpenAI
+
+import src.agents
+from src.agents import ReportProgress, agent_report, format_prefetched_data, prefetch
+from src.llm import ChatOpenAISingleton
+from src.llm_cache import SQLiteLLMCache
+from src.models import GoogleTickerInfo, OutputTickerReport
+from src.snapshots import TickerSnapshotStoreSingleton
+
+TICKER_INFO = GoogleTickerInfo(
+    current_price=241.37,
+    about='Electric vehicles',
+    ceo='Elon Musk',
+    founded='2003',
+    price_year_range=(138.8, 488.54),
+    pe_ratio=64.2,
+    yerly_financials=[],
+)
+
+
+async def test_prefetch_runs_tools_concurrently_and_skips_failed(monkeypatch: pytest.MonkeyPatch) -> None:
+    started: list[str] = []
+    both_started = asyncio.Event()
+
+    async def run_tool(tool: BaseTool, tool_input: dict) -> object:
+        started.append(tool.name)
+        if len(started) == 2:
+            both_started.set()
+        # every tool waits for the other one, so they only finish when run concurrently
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+        if tool.name == 'tool_get_google_news':
+            msg = f'Google News scraper failed for {tool_input["query"]}'
+            raise RuntimeError(msg)
+        return TICKER_INFO
+
+    monkeypatch.setattr(src.agents, 'run_tool', run_tool)
+    monkeypatch.setattr(TickerSnapshotStoreSingleton, '_instance', None)
+
+    update = await prefetch({'ticker': 'TSLA'})  # type: ignore[typeddict-item]
+
+    assert sorted(started) == ['tool_get_google_news', 'tool_get_google_ticker_info']
+    assert update['prefetched'] is True
+    assert update['ticker_info'] == TICKER_INFO
+    assert update['news'] is None
+    assert update['delta'] is None
+    assert update['metrics'] is not None
+
+    prefetched_data = format_prefetched_data(update)  # type: ignore[arg-type]
+    assert 'Google Finance ticker info (tool_get_google_ticker_info)' in prefetched_data
+    assert 'Google News' not in prefetched_data
+
+
+REPORT = OutputTickerReport(ticker='TSLA', sentiment='hold', sentiment_reason='Stable', report='# TSLA report ' * 5)
+
+
+def create_report_stream(chunk_size: int = 16) -> bytes:
+    content = REPORT.model_dump_json()
+    deltas = [{'role': 'assistant', 'content': ''}]
+    deltas.extend({'content': content[i : i + chunk_size]} for i in range(0, len(content), chunk_size))
+    events = [
+        {
+            'id': 'chatcmpl-1',
+            'object': 'chat.completion.chunk',
+            'created': 0,
+            'model': 'gpt-4o-mini',
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': 'stop' if i == len(deltas) - 1 else None}],
+        }
+        for i, delta in enumerate(deltas)
+    ]
+    return ''.join([*(f'data: {json.dumps(event)}\n\n' for event in events), 'data: [DONE]\n\n']).encode()
+
+
+class FakeKeyValueStore:
+    def __init__(self) -> None:
+        self.writes: list[tuple[str, str | None]] = []
+
+    async def set_value(self, key: str, value: str | None) -> None:
+        await asyncio.sleep(0)
+        self.writes.append((key, value))
+
+
+async def test_report_progress_is_throttled_and_cleared(monkeypatch: pytest.MonkeyPatch) -> None:
+    store = FakeKeyValueStore()
+    statuses: list[str] = []
+    clock = [100.0]
+
+    async def open_key_value_store() -> FakeKeyValueStore:  # noqa: RUF029
+        return store
+
+    async def set_status_message(message: str) -> None:  # noqa: RUF029
+        statuses.append(message)
+
+    actor = SimpleNamespace(open_key_value_store=open_key_value_store, set_status_message=set_status_message)
+    monkeypatch.setattr(src.agents, 'Actor', actor)
+    monkeypatch.setattr(src.agents, 'time', SimpleNamespace(monotonic=lambda: clock[0]))
+
+    progress = ReportProgress('report-TSLA.md')
+    await progress.update('# Rep')
+    # within the interval and unchanged reports are skipped
+    clock[0] += 1
+    await progress.update('# Report')
+    clock[0] += 2
+    await progress.update('# Rep')
+    await progress.update('# Report body')
+    await progress.clear()
+
+    assert store.writes == [
+        ('report-TSLA-progress.md', '# Rep'),
+        ('report-TSLA-progress.md', '# Report body'),
+        ('report-TSLA-progress.md', None),
+    ]
+    assert statuses == [
+        'Agent: creating report... (5 characters written)',
+        'Agent: creating report... (13 characters written)',
+    ]
+
+
+async def test_report_is_streamed_on_cache_miss_and_cached(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    requests: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=create_report_stream(), headers={'content-type': 'text/event-stream'})
+
+    llm = ChatOpenAI(
+        model='gpt-4o-mini',
+        api_key='test',
+        cache=SQLiteLLMCache(tmp_path / 'cache.sqlite'),
+        http_async_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(ChatOpenAISingleton, '_instances', {'gpt-4o-mini': llm})
+    monkeypatch.setattr(ChatOpenAISingleton, '_default_model', 'gpt-4o-mini')
+    monkeypatch.setattr(ChatOpenAISingleton, '_node_models', {})
+    monkeypatch.setattr(ChatOpenAISingleton, '_structured_runnables', {})
+    monkeypatch.setattr(TickerSnapshotStoreSingleton, '_instance', None)
+    monkeypatch.setattr(src.agents, 'REPORT_PROGRESS_INTERVAL_SECS', 0)
+    store = FakeKeyValueStore()
+
+    async def open_key_value_store() -> FakeKeyValueStore:  # noqa: RUF029
+        return store
+
+    monkeypatch.setattr(src.agents, 'Actor', SimpleNamespace(open_key_value_store=open_key_value_store))
+
+    state = {'ticker': 'TSLA', 'analysis': 'TSLA is stable'}
+    config = {'configurable': {'report_key': 'report-TSLA.md', 'batch': True}}
+    update = await agent_report(state, config)  # type: ignore[arg-type]
+
+    assert update['report'] == REPORT
+    assert len(requests) == 1
+    assert requests[0]['stream'] is True
+    partial_reports = [value for _, value in store.writes[:-1]]
+    assert len(partial_reports) > 1
+    assert all(value and REPORT.report.startswith(value) for value in partial_reports)
+    assert store.writes[-1] == ('report-TSLA-progress.md', None)
+
+    # the cached report is returned at once, nothing is streamed
+    store.writes.clear()
+    assert (await agent_report(state, config))['report'] == REPORT  # type: ignore[arg-type]
+    assert len(requests) == 1
+    assert store.writes == []
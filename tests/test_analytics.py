@@ -0,0 +1,69 @@
+import pytest
+
+from src.analytics import compute_peer_pe_medians, compute_ticker_metrics, format_ticker_metrics
+from src.models import GoogleTickerInfo, GoogleTickerInfoYearlyFinancials
+
+
+def create_ticker_info(
+    financials: list[GoogleTickerInfoYearlyFinancials], *, pe_ratio: float | None = 20.0
+) -> GoogleTickerInfo:
+    return GoogleTickerInfo(
+        current_price=150.0,
+        about='about',
+        ceo='CEO',
+        founded='2003',
+        price_year_range=(100.0, 200.0),
+        pe_ratio=pe_ratio,
+        yerly_financials=financials,
+    )
+
+
+def test_compute_ticker_metrics() -> None:
+    financials = [
+        GoogleTickerInfoYearlyFinancials(year=2021, earning_per_share=1.0, net_profit_margin=10.0),
+        GoogleTickerInfoYearlyFinancials(year=2022, earning_per_share=2.0, net_profit_margin=12.0),
+        GoogleTickerInfoYearlyFinancials(year=2023, earning_per_share=4.0, net_profit_margin=14.0),
+    ]
+    tsla = compute_ticker_metrics('TSLA', create_ticker_info(financials, pe_ratio=40.0))
+    assert (tsla.previous_year, tsla.latest_year) == (2022, 2023)
+    assert tsla.yoy_change['earning_per_share'] == pytest.approx(2.0)
+    assert tsla.eps_cagr == pytest.approx(1.0)
+    assert tsla.eps_cagr_years == (2021, 2023)
+    assert tsla.net_margin_trend == pytest.approx(2.0)
+    assert tsla.price_range_position == pytest.approx(0.5)
+    assert tsla.earnings_yield == pytest.approx(0.025)
+
+    aapl = compute_ticker_metrics('AAPL', create_ticker_info(financials[:1], pe_ratio=20.0))
+    assert (aapl.previous_year, aapl.latest_year) == (None, 2021)
+    assert aapl.eps_cagr is None
+    assert aapl.net_margin_trend is None
+
+    new = compute_ticker_metrics('NEW', create_ticker_info([], pe_ratio=None))
+    assert new.latest_year is None
+    assert new.latest == {}
+    assert new.earnings_yield is None
+
+
+def test_format_ticker_metrics() -> None:
+    financials = [
+        GoogleTickerInfoYearlyFinancials(year=2022, earning_per_share=2.0),
+        GoogleTickerInfoYearlyFinancials(year=2023, earning_per_share=3.0),
+    ]
+    table = format_ticker_metrics(compute_ticker_metrics('TSLA', create_ticker_info(financials)))
+    assert 'eps_cagr_2022_2023|50.0%' in table
+    assert 'financial|2022|2023|change\nearning_per_share|2.00|3.00|+1.00' in table
+    assert 'earnings_yield|5.0%' in table
+
+
+def test_peer_pe_medians() -> None:
+    medians = compute_peer_pe_medians({'TSLA': 60.0, 'AAPL': 30.0, 'MSFT': 20.0, 'LOSS': -5.0, 'NEW': None})
+    # the own, missing and negative P/E ratios are left out of the medians
+    assert medians == {'TSLA': 25.0, 'AAPL': 40.0, 'MSFT': 45.0, 'LOSS': 30.0, 'NEW': 30.0}
+    assert compute_peer_pe_medians({'TSLA': 60.0, 'AAPL': 30.0}) == {}
+    assert compute_peer_pe_medians({}) == {}
+
+    tsla = compute_ticker_metrics('TSLA', create_ticker_info([], pe_ratio=60.0), peer_pe_median=medians['TSLA'])
+    assert tsla.pe_vs_peers == pytest.approx(2.4)
+    assert 'pe_vs_watchlist_median|2.40' in format_ticker_metrics(tsla)
+    loss = compute_ticker_metrics('LOSS', create_ticker_info([], pe_ratio=-5.0), peer_pe_median=medians['LOSS'])
+    assert loss.pe_vs_peers is None
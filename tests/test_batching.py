@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import src.tools
+from src.batching import RequestCoalescer
+from src.tools import fetch_google_stock_details_batch
+
+
+async def test_concurrent_lookups_are_coalesced() -> None:
+    batches: list[list[str]] = []
+
+    async def fetch_batch(keys: list[str]) -> dict[str, str]:
+        batches.append(keys)
+        await asyncio.sleep(0)
+        return {key: key.lower() for key in keys if key != 'MISSING'}
+
+    coalescer = RequestCoalescer(fetch_batch, window_secs=0.01, max_batch_size=10)
+    results = await asyncio.gather(
+        coalescer.get('TSLA'),
+        coalescer.get('AAPL'),
+        coalescer.get('TSLA'),
+        coalescer.get('MISSING'),
+        return_exceptions=True,
+    )
+
+    assert batches == [['TSLA', 'AAPL', 'MISSING']]
+    assert results[:3] == ['tsla', 'aapl', 'tsla']
+    assert isinstance(results[3], RuntimeError)
+
+
+async def test_batch_is_dispatched_when_full() -> None:
+    batches: list[list[int]] = []
+
+    async def fetch_batch(keys: list[int]) -> dict[int, int]:  # noqa: RUF029
+        batches.append(keys)
+        return {key: key for key in keys}
+
+    coalescer = RequestCoalescer(fetch_batch, window_secs=10, max_batch_size=2)
+    assert await asyncio.wait_for(asyncio.gather(coalescer.get(1), coalescer.get(2)), timeout=1) == [1, 2]
+    assert batches == [[1, 2]]
+
+
+async def test_batch_error_is_propagated() -> None:
+    async def fetch_batch(keys: list[str]) -> dict[str, str]:  # noqa: RUF029
+        msg = f'Actor run failed for {keys}'
+        raise RuntimeError(msg)
+
+    coalescer = RequestCoalescer(fetch_batch, window_secs=0.01)
+    with pytest.raises(RuntimeError, match='Actor run failed'):
+        await coalescer.get('TSLA')
+
+
+async def test_lookup_after_caller_timeout_joins_running_batch() -> None:
+    batches: list[list[str]] = []
+    release = asyncio.Event()
+
+    async def fetch_batch(keys: list[str]) -> dict[str, str]:
+        batches.append(keys)
+        await release.wait()
+        return {key: key.lower() for key in keys}
+
+    coalescer = RequestCoalescer(fetch_batch, window_secs=0.01)
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(coalescer.get('TSLA'), timeout=0.05)
+
+    # the retry of the timed out lookup does not start a duplicate batched call
+    retry = asyncio.create_task(coalescer.get('TSLA'))
+    await asyncio.sleep(0.05)
+    release.set()
+    assert await retry == 'tsla'
+    assert batches == [['TSLA']]
+
+
+async def test_stock_details_are_split_by_stock_id(monkeypatch: pytest.MonkeyPatch) -> None:
+    runs: list[list[str]] = []
+
+    async def run_actor_get_default_dataset(actor_id: str, run_input: dict, **_: object) -> tuple[str, list[dict]]:  # noqa: RUF029
+        assert actor_id == src.tools.GOOGLE_FINANCE_ACTOR_ID
+        stock_ids = run_input['stocks']
+        runs.append(stock_ids)
+        if len(stock_ids) == 1:
+            return 'dataset', [{'current_price': 1.0}]
+        # the batched run returns an item without the stock ID and misses one of the stocks
+        return 'dataset', [{'stock_id': 'TSLA:NASDAQ', 'current_price': 2.0}, {'current_price': 3.0}]
+
+    monkeypatch.setattr(src.tools, 'run_actor_get_default_dataset', run_actor_get_default_dataset)
+
+    details = await fetch_google_stock_details_batch(['TSLA:NASDAQ', 'AAPL:NASDAQ'])
+    assert details == {
+        'TSLA:NASDAQ': {'stock_id': 'TSLA:NASDAQ', 'current_price': 2.0},
+        'AAPL:NASDAQ': {'current_price': 1.0},
+    }
+    assert runs == [['TSLA:NASDAQ', 'AAPL:NASDAQ'], ['AAPL:NASDAQ']]
+
+
+async def test_failed_batched_details_run_falls_back_to_single_runs(monkeypatch: pytest.MonkeyPatch) -> None:
+    runs: list[list[str]] = []
+
+    async def run_actor_get_default_dataset(_: str, run_input: dict, **__: object) -> tuple[str, list[dict]]:  # noqa: RUF029
+        stock_ids = run_input['stocks']
+        runs.append(stock_ids)
+        if len(stock_ids) > 1 or stock_ids == ['AAPL:NASDAQ']:
+            msg = 'Scraper run failed'
+            raise RuntimeError(msg)
+        return 'dataset', [{'current_price': 1.0}]
+
+    monkeypatch.setattr(src.tools, 'run_actor_get_default_dataset', run_actor_get_default_dataset)
+    coalescer = RequestCoalescer(fetch_google_stock_details_batch, window_secs=0.01)
+
+    # only the lookup of the stock whose own single stock run failed fails
+    results = await asyncio.gather(coalescer.get('TSLA:NASDAQ'), coalescer.get('AAPL:NASDAQ'), return_exceptions=True)
+    assert results[0] == {'current_price': 1.0}
+    assert isinstance(results[1], RuntimeError)
+    assert 'AAPL:NASDAQ' in str(results[1])
+    assert sorted(runs) == [['AAPL:NASDAQ'], ['TSLA:NASDAQ'], ['TSLA:NASDAQ', 'AAPL:NASDAQ']]
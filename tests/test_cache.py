@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from src.cache import ActorResultCache, make_cache_key
+from src.storage import LocalDirectoryBackend
+
+
+def test_make_cache_key_is_canonical() -> None:
+    key = make_cache_key('actor', {'a': 1, 'b': [1, 2]})
+    assert key == make_cache_key('actor', {'b': [1, 2], 'a': 1})
+    assert key != make_cache_key('other-actor', {'a': 1, 'b': [1, 2]})
+    assert key != make_cache_key('actor', {'a': 2, 'b': [1, 2]})
+
+
+async def test_cache_hit_and_miss(tmp_path: Path) -> None:
+    cache = ActorResultCache(LocalDirectoryBackend(tmp_path))
+    assert await cache.get('actor', {'query': 'TSLA'}) is None
+
+    await cache.set('actor', {'query': 'TSLA'}, 'dataset-id', [{'title': 'news'}])
+    assert await cache.get('actor', {'query': 'TSLA'}) == ('dataset-id', [{'title': 'news'}])
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+
+
+async def test_cache_is_persistent(tmp_path: Path) -> None:
+    await ActorResultCache(LocalDirectoryBackend(tmp_path)).set('actor', {}, 'dataset-id', [{'a': 1}])
+
+    cache = ActorResultCache(LocalDirectoryBackend(tmp_path))
+    assert await cache.get('actor', {}) == ('dataset-id', [{'a': 1}])
+
+
+async def test_cache_ttl_expiration(tmp_path: Path) -> None:
+    cache = ActorResultCache(LocalDirectoryBackend(tmp_path), actor_ttl_secs={'actor': -1})
+    await cache.set('actor', {}, 'dataset-id', [{'a': 1}])
+    assert await cache.get('actor', {}) is None
+
+
+async def test_cache_lru_eviction(tmp_path: Path) -> None:
+    cache = ActorResultCache(LocalDirectoryBackend(tmp_path), max_entries=2)
+    await cache.set('actor', {'i': 1}, 'dataset-1', [])
+    await cache.set('actor', {'i': 2}, 'dataset-2', [])
+    # access the first entry so the second one is the least recently used
+    assert await cache.get('actor', {'i': 1}) is not None
+    await cache.set('actor', {'i': 3}, 'dataset-3', [])
+
+    assert await cache.get('actor', {'i': 2}) is None
+    assert await cache.get('actor', {'i': 1}) is not None
+    assert await cache.get('actor', {'i': 3}) is not None
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,111 @@
+from typing import TYPE_CHECKING, TypedDict
+
+import pytest
+from langgraph.graph import START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+from src.checkpoints import PersistentCheckpointSaver, get_checkpoint_key
+from src.storage import LocalDirectoryBackend
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from langchain_core.runnables import RunnableConfig
+
+
+class CounterState(TypedDict, total=False):
+    steps: list[str]
+
+
+class ParallelState(TypedDict, total=False):
+    news: str
+    info: str
+
+
+def build_graph(checkpointer: PersistentCheckpointSaver, calls: list[str], *, fail: bool) -> CompiledStateGraph:
+    def gather(state: CounterState) -> CounterState:
+        calls.append('gather')
+        return {'steps': [*state.get('steps', []), 'gather']}
+
+    def report(state: CounterState) -> CounterState:
+        calls.append('report')
+        if fail:
+            msg = 'Actor migrated'
+            raise RuntimeError(msg)
+        return {'steps': [*state['steps'], 'report']}
+
+    builder = StateGraph(CounterState)
+    builder.add_node(gather)
+    builder.add_node(report)
+    builder.set_entry_point('gather')
+    builder.add_edge('gather', 'report')
+    builder.set_finish_point('report')
+    return builder.compile(checkpointer=checkpointer)
+
+
+async def test_interrupted_run_resumes_from_last_node(tmp_path: 'Path') -> None:
+    backend = LocalDirectoryBackend(tmp_path)
+    config: RunnableConfig = {'configurable': {'thread_id': 'TSLA'}}
+    calls: list[str] = []
+
+    checkpointer = PersistentCheckpointSaver(backend, flush_interval_secs=60)
+    graph = build_graph(checkpointer, calls, fail=True)
+    with pytest.raises(RuntimeError):
+        await graph.ainvoke({'steps': []}, config)
+    # nothing is written until the batched flush
+    assert await backend.get_value(get_checkpoint_key('TSLA')) is None
+    await checkpointer.flush()
+    persisted = await backend.get_value(get_checkpoint_key('TSLA'))
+    assert list(persisted['namespaces']) == ['']
+
+    # restarted run with a new checkpointer resumes the thread
+    restarted_checkpointer = PersistentCheckpointSaver(backend)
+    restarted_graph = build_graph(restarted_checkpointer, calls, fail=False)
+    state = await restarted_graph.aget_state(config)
+    assert state.next == ('report',)
+    assert await restarted_graph.ainvoke(None, config) == {'steps': ['gather', 'report']}
+    assert calls == ['gather', 'report', 'report']
+
+    await restarted_checkpointer.adelete_thread('TSLA')
+    assert await backend.get_value(get_checkpoint_key('TSLA')) is None
+    # the scheduled flush does not outlive the explicit flush
+    await restarted_checkpointer.flush()
+    assert restarted_checkpointer._flush_task is not None
+    assert restarted_checkpointer._flush_task.done()
+
+
+async def test_pending_writes_of_finished_nodes_are_restored(tmp_path: 'Path') -> None:
+    backend = LocalDirectoryBackend(tmp_path)
+    config: RunnableConfig = {'configurable': {'thread_id': '^GSPC'}}
+    calls: list[str] = []
+
+    def build_parallel_graph(checkpointer: PersistentCheckpointSaver, *, fail: bool) -> CompiledStateGraph:
+        def get_news(_: ParallelState) -> ParallelState:
+            calls.append('news')
+            return {'news': 'news'}
+
+        def get_info(_: ParallelState) -> ParallelState:
+            calls.append('info')
+            if fail:
+                msg = 'Actor migrated'
+                raise RuntimeError(msg)
+            return {'info': 'info'}
+
+        builder = StateGraph(ParallelState)
+        builder.add_node(get_news)
+        builder.add_node(get_info)
+        builder.add_edge(START, 'get_news')
+        builder.add_edge(START, 'get_info')
+        return builder.compile(checkpointer=checkpointer)
+
+    checkpointer = PersistentCheckpointSaver(backend, flush_interval_secs=60)
+    with pytest.raises(RuntimeError):
+        await build_parallel_graph(checkpointer, fail=True).ainvoke({'info': ''}, config)
+    await checkpointer.flush()
+
+    # the news node finished before the failure, only the info node is run again
+    restarted_checkpointer = PersistentCheckpointSaver(backend)
+    restarted_graph = build_parallel_graph(restarted_checkpointer, fail=False)
+    assert await restarted_graph.ainvoke(None, config) == {'news': 'news', 'info': 'info'}
+    assert sorted(calls) == ['info', 'info', 'news']
+    await restarted_checkpointer.flush()
@@ -0,0 +1,59 @@
+import hashlib
+
+from langchain_core.tools import tool
+
+from src.compaction import compact_news, compact_ticker_info, compact_tool, count_tokens
+from src.models import GoogleTickerInfo, GoogleTickerInfoYearlyFinancials, TickerNewsEntry
+
+
+def create_news(title: str, published_at: str = '2025-01-01') -> TickerNewsEntry:
+    return TickerNewsEntry(title=title, provider='news', published_at=published_at, url=f'https://news/{title}')
+
+
+def test_compact_news_fits_token_budget() -> None:
+    # distinct headlines, so they are not grouped as the same story
+    titles = [hashlib.sha256(str(i).encode()).hexdigest()[:32] for i in range(25)]
+    news = [create_news(title, f'2025-01-{i + 1:02d}') for i, title in enumerate(titles)]
+    compacted = compact_news(news, token_budget=200)
+
+    lines = compacted.splitlines()
+    assert lines[0] == 'published_at|provider|title|url|other_sources'
+    # the most recent news are kept
+    assert lines[1].startswith('2025-01-25|')
+    assert lines[-1].endswith('more rows omitted)')
+    assert count_tokens(compacted) <= 220
+
+
+def test_compact_ticker_info_keeps_recent_years() -> None:
+    ticker_info = GoogleTickerInfo(
+        current_price=100.0,
+        about='EVs',
+        ceo='CEO',
+        founded='2003',
+        yerly_financials=[GoogleTickerInfoYearlyFinancials(year=year) for year in range(2015, 2025)],
+    )
+    compacted = compact_ticker_info(ticker_info)
+    assert '2024|' in compacted
+    assert '2022|' in compacted
+    assert '2021|' not in compacted
+
+
+async def test_compact_tool_keeps_tool_signature() -> None:
+    @tool
+    async def tool_get_news(query: str) -> list[TickerNewsEntry]:  # noqa: RUF029
+        """Tool to get news.
+
+        Args:
+            query (str): News search query.
+
+        Returns:
+            list[TickerNewsEntry]: News entries.
+        """
+        return [create_news(query), create_news(query)]
+
+    compacted_tool = compact_tool(tool_get_news)
+    assert compacted_tool.name == tool_get_news.name
+    assert compacted_tool.args == tool_get_news.args
+    assert await compacted_tool.ainvoke({'query': 'TSLA'}) == (
+        'published_at|provider|title|url|other_sources\n2025-01-01|news|TSLA|https://news/TSLA|0'
+    )
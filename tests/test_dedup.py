@@ -0,0 +1,58 @@
+import time
+
+from src.dedup import (
+    cluster_news,
+    cluster_titles,
+    estimate_similarity,
+    get_minhash_signature,
+    get_shingles,
+    normalize_title,
+)
+from src.models import TickerNewsEntry
+
+
+def create_news(title: str, url: str) -> TickerNewsEntry:
+    return TickerNewsEntry(title=title, provider='news', published_at='2025-01-01', url=url)
+
+
+def test_normalize_title() -> None:
+    assert normalize_title('Tesla Stock Jumps 5%! - Reuters') == 'tesla stock jumps 5'
+
+
+def test_cluster_syndicated_stories() -> None:
+    news = [
+        create_news('Tesla stock jumps after strong quarterly deliveries - Reuters', 'https://reuters'),
+        create_news('Tesla recalls vehicles over a software issue - CNBC', 'https://cnbc'),
+        create_news('Tesla Stock Jumps After Strong Quarterly Deliveries - Yahoo Finance', 'https://yahoo'),
+        create_news('Tesla stock jumps after strong quarterly deliveries, analysts say - MarketWatch', 'https://mw'),
+    ]
+    stories = cluster_news(news)
+
+    assert [story.url for story in stories] == ['https://reuters', 'https://cnbc']
+    assert stories[0].sources == ['https://yahoo', 'https://mw']
+    assert stories[1].sources == []
+    # clustering the clustered news keeps the sources
+    assert cluster_news(stories) == stories
+
+
+def test_short_titles_are_not_matched_by_empty_bins() -> None:
+    signature = get_minhash_signature(get_shingles('fed holds rates'))
+    other = get_minhash_signature(get_shingles('apple buys startup'))
+    assert signature.count(-1) > len(signature) // 2
+    assert estimate_similarity(signature, other) == 0.0
+    assert estimate_similarity(signature, signature) == 1.0
+    assert cluster_titles(['Fed holds rates', 'Apple buys startup', 'Fed Holds Rates - CNBC']) == [[0, 2], [1]]
+
+
+def test_signature_is_stable_across_processes() -> None:
+    # the signatures do not depend on the randomized built-in string hash
+    signature = get_minhash_signature({'tesl', 'esla'})
+    assert [value for value in signature if value != -1] == [331305311455789257, 367829149564872424]
+
+
+def test_signature_is_fast() -> None:
+    shingles = get_shingles(normalize_title('Tesla stock jumps after strong quarterly deliveries beat estimates'))
+    start = time.perf_counter()
+    for _ in range(1000):
+        get_minhash_signature(shingles)
+    assert (time.perf_counter() - start) / 1000 < 0.001
@@ -0,0 +1,25 @@
+import subprocess  # noqa: S404 - a fresh interpreter has no agent modules imported by other tests
+import sys
+from pathlib import Path
+
+import pytest
+
+LAZY_MODULES = [
+    'langgraph',
+    'langchain_openai',
+    'langchain_community',
+    'src.agents',
+    'src.graph',
+    'src.tools',
+    'src.yahoo_tools',
+]
+
+
+# the scheduler is imported by the entry point to pick the tickers, before the agent modules are needed
+@pytest.mark.parametrize('module', ['src.main', 'src.scheduler'])
+def test_entry_point_does_not_import_agent_modules(module: str) -> None:
+    code = f'import sys, {module}; print([m for m in {LAZY_MODULES!r} if m in sys.modules])'
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent
+    )
+    assert completed.stdout.strip() == '[]'
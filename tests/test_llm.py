@@ -0,0 +1,47 @@
+import pytest
+from langchain_openai import ChatOpenAI
+
+from src.agents import REPORT_JSON_SCHEMA
+from src.llm import ChatOpenAISingleton
+from src.tools import tool_get_google_news, tool_get_google_ticker_info
+
+
+@pytest.fixture
+def llm(monkeypatch: pytest.MonkeyPatch) -> ChatOpenAI:
+    instance = ChatOpenAI(model='gpt-4o-mini', api_key='test')
+    monkeypatch.setattr(ChatOpenAISingleton, '_instances', {'gpt-4o-mini': instance})
+    monkeypatch.setattr(ChatOpenAISingleton, '_default_model', 'gpt-4o-mini')
+    monkeypatch.setattr(ChatOpenAISingleton, '_node_models', {})
+    monkeypatch.setattr(ChatOpenAISingleton, '_react_agents', {})
+    monkeypatch.setattr(ChatOpenAISingleton, '_structured_runnables', {})
+    return instance
+
+
+@pytest.mark.usefixtures('llm')
+def test_runnables_are_reused() -> None:
+    tools = [tool_get_google_ticker_info, tool_get_google_news]
+    assert ChatOpenAISingleton.get_react_agent(tools) is ChatOpenAISingleton.get_react_agent(tools)
+    assert ChatOpenAISingleton.get_react_agent(tools[:1]) is not ChatOpenAISingleton.get_react_agent(tools)
+    assert ChatOpenAISingleton.get_structured_instance(
+        REPORT_JSON_SCHEMA
+    ) is ChatOpenAISingleton.get_structured_instance(REPORT_JSON_SCHEMA)
+
+
+def test_nodes_use_their_models(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setattr(ChatOpenAISingleton, '_instances', {})
+    monkeypatch.setattr(ChatOpenAISingleton, '_default_model', None)
+    monkeypatch.setattr(ChatOpenAISingleton, '_node_models', {})
+    monkeypatch.setattr(ChatOpenAISingleton, '_rate_limiters', {})
+    monkeypatch.setattr(ChatOpenAISingleton, '_react_agents', {})
+
+    ChatOpenAISingleton.create_get_instance('gpt-4o', node_models={'agent_analysis': 'gpt-4o-mini'})
+
+    assert ChatOpenAISingleton.get_instance('agent_analysis').model_name == 'gpt-4o-mini'
+    assert ChatOpenAISingleton.get_instance('agent_report').model_name == 'gpt-4o'
+    assert ChatOpenAISingleton.get_instance().model_name == 'gpt-4o'
+    assert set(ChatOpenAISingleton.get_rate_limiters()) == {'gpt-4o', 'gpt-4o-mini'}
+    tools = [tool_get_google_news]
+    assert ChatOpenAISingleton.get_react_agent(tools, node='agent_analysis') is not (
+        ChatOpenAISingleton.get_react_agent(tools)
+    )
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+
+from src.llm_cache import SQLiteLLMCache
+
+
+def create_model(cache: SQLiteLLMCache) -> FakeMessagesListChatModel:
+    responses = [
+        AIMessage(content=f'answer {i}', usage_metadata={'input_tokens': 8, 'output_tokens': 2, 'total_tokens': 10})
+        for i in range(3)
+    ]
+    return FakeMessagesListChatModel(responses=responses, cache=cache)
+
+
+async def test_llm_cache_hit_is_not_counted_as_token_usage(tmp_path: Path) -> None:
+    cache = SQLiteLLMCache(tmp_path / 'cache.sqlite')
+    model = create_model(cache)
+
+    first = await model.ainvoke('analyze TSLA')
+    second = await model.ainvoke('analyze TSLA')
+    assert second.content == first.content == 'answer 0'
+    assert isinstance(first, AIMessage)
+    assert isinstance(second, AIMessage)
+    assert first.usage_metadata is not None
+    assert first.usage_metadata['total_tokens'] == 10
+    assert second.usage_metadata is not None
+    assert second.usage_metadata['total_tokens'] == 0
+    assert second.response_metadata['llm_cache_hit'] is True
+
+    assert (await model.ainvoke('analyze AAPL')).content == 'answer 1'
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'evictions': 0, 'saved_tokens': 10}
+
+
+async def test_llm_cache_is_persistent(tmp_path: Path) -> None:
+    await create_model(SQLiteLLMCache(tmp_path / 'cache.sqlite')).ainvoke('analyze TSLA')
+
+    cache = SQLiteLLMCache(tmp_path / 'cache.sqlite')
+    assert (await create_model(cache).ainvoke('analyze TSLA')).content == 'answer 0'
+    assert cache.stats()['hits'] == 1
+
+    # the dump of the open cache restores into the same responses
+    (tmp_path / 'restored.sqlite').write_bytes(cache.dump())
+    assert (await create_model(cache).ainvoke('analyze AAPL')).content == 'answer 0'
+    restored = SQLiteLLMCache(tmp_path / 'restored.sqlite')
+    assert (await create_model(restored).ainvoke('analyze TSLA')).content == 'answer 0'
+
+
+async def test_llm_cache_ttl_and_lru_eviction(tmp_path: Path) -> None:
+    expired = create_model(SQLiteLLMCache(tmp_path / 'expired.sqlite', ttl_secs=-1))
+    await expired.ainvoke('analyze TSLA')
+    assert (await expired.ainvoke('analyze TSLA')).content == 'answer 1'
+
+    cache = SQLiteLLMCache(tmp_path / 'lru.sqlite', max_entries=1)
+    model = create_model(cache)
+    await model.ainvoke('analyze TSLA')
+    await model.ainvoke('analyze AAPL')
+    assert (await model.ainvoke('analyze TSLA')).content == 'answer 2'
+    assert cache.stats()['evictions'] >= 1
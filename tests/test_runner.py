@@ -0,0 +1,132 @@
+from typing import TypedDict
+
+import pytest
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+import src.runner
+from src.checkpoints import PersistentCheckpointSaver
+from src.main import get_input_models, get_input_tickers
+from src.models import GoogleTickerInfo, OutputTickerReport
+from src.runner import get_peer_states, get_report_key, run_tickers
+from src.storage import MemoryBackend
+
+
+class TickerState(TypedDict, total=False):
+    messages: list
+    status: str
+    ticker: str
+    report: OutputTickerReport
+
+
+def build_graph(checkpointer: BaseCheckpointSaver | None = None) -> CompiledStateGraph:
+    def write_report(state: TickerState) -> TickerState:
+        if state['ticker'] == 'FAIL':
+            msg = 'Scraper failed'
+            raise RuntimeError(msg)
+        return {
+            'report': OutputTickerReport(
+                ticker=state['ticker'], sentiment='hold', sentiment_reason='Stable', report='# Report'
+            )
+        }
+
+    builder = StateGraph(TickerState)
+    builder.add_node(write_report)
+    builder.set_entry_point('write_report')
+    builder.set_finish_point('write_report')
+    return builder.compile(checkpointer=checkpointer or MemorySaver())
+
+
+def test_input_tickers_are_merged_normalized_and_deduplicated() -> None:
+    actor_input = {'ticker': ' tsla', 'tickers': ['AAPL', 'TSLA', '', '  ', 'amzn ', 'aapl']}
+    assert get_input_tickers(actor_input) == ['TSLA', 'AAPL', 'AMZN']
+    assert get_input_tickers({'ticker': 'nvda'}) == ['NVDA']
+    assert get_input_tickers({'tickers': None}) == []
+
+
+def test_unsupported_input_models_are_rejected() -> None:
+    assert get_input_models({'model': 'gpt-4o', 'analysisModel': 'gpt-4o-mini'}) == ('gpt-4o', 'gpt-4o-mini')
+    assert get_input_models({}) == ('gpt-4o-mini', None)
+    with pytest.raises(ValueError, match='Unsupported model'):
+        get_input_models({'model': 'gpt-4o', 'analysisModel': 'gpt-4.1'})
+
+
+async def test_failed_ticker_does_not_affect_others(monkeypatch: pytest.MonkeyPatch) -> None:
+    saved: list[tuple[str, str]] = []
+    statuses: list[str] = []
+
+    async def save_report(report: OutputTickerReport, report_key: str) -> None:  # noqa: RUF029
+        saved.append((report.ticker, report_key))
+
+    async def set_status_message(message: str) -> None:  # noqa: RUF029
+        statuses.append(message)
+
+    monkeypatch.setattr(src.runner, 'save_report', save_report)
+    monkeypatch.setattr(src.runner.Actor, 'set_status_message', set_status_message)
+
+    results = await run_tickers(build_graph(), ['TSLA', 'FAIL', 'AAPL'], max_concurrency=2)
+
+    assert [result.ticker for result in results] == ['TSLA', 'FAIL', 'AAPL']
+    assert [result.error is None for result in results] == [True, False, True]
+    assert isinstance(results[1].error, RuntimeError)
+    assert sorted(saved) == [('AAPL', 'report-AAPL.md'), ('TSLA', 'report-TSLA.md')]
+    assert statuses[-1] == 'Agent: analyzed 3/3 tickers'
+    assert get_report_key('TSLA', batch=False) == 'report.md'
+
+
+async def test_restarted_run_skips_finished_tickers(monkeypatch: pytest.MonkeyPatch) -> None:
+    saved: list[str] = []
+
+    async def save_report(_: OutputTickerReport, report_key: str) -> None:  # noqa: RUF029
+        saved.append(report_key)
+
+    async def set_status_message(message: str) -> None:
+        pass
+
+    monkeypatch.setattr(src.runner, 'save_report', save_report)
+    monkeypatch.setattr(src.runner.Actor, 'set_status_message', set_status_message)
+    backend = MemoryBackend()
+
+    checkpointer = PersistentCheckpointSaver(backend)
+    results = await run_tickers(build_graph(checkpointer), ['TSLA', 'FAIL'])
+    assert [result.error is None for result in results] == [True, False]
+    assert saved == ['report-TSLA.md']
+    await checkpointer.flush()
+
+    # the restarted run with a new checkpointer returns the finished ticker without saving it again
+    checkpointer = PersistentCheckpointSaver(backend)
+    results = await run_tickers(build_graph(checkpointer), ['TSLA', 'FAIL'])
+    await checkpointer.flush()
+    assert [result.error is None for result in results] == [True, False]
+    assert results[0].report is not None
+    assert results[0].report.ticker == 'TSLA'
+    assert saved == ['report-TSLA.md']
+
+
+async def test_peer_states_compare_pe_ratios_across_tickers(monkeypatch: pytest.MonkeyPatch) -> None:
+    pe_ratios = {'TSLA': 60.0, 'AAPL': 30.0, 'MSFT': 20.0}
+
+    async def run_tool(_: object, tool_input: dict) -> GoogleTickerInfo:  # noqa: RUF029
+        if tool_input['ticker'] == 'FAIL':
+            msg = 'Scraper failed'
+            raise RuntimeError(msg)
+        return GoogleTickerInfo(
+            current_price=1.0,
+            about='',
+            ceo='',
+            founded='',
+            pe_ratio=pe_ratios[tool_input['ticker']],
+            yerly_financials=[],
+        )
+
+    monkeypatch.setattr(src.runner, 'run_tool', run_tool)
+
+    states = await get_peer_states([*pe_ratios, 'FAIL'], max_concurrency=2)
+    assert {ticker: state['peer_pe_median'] for ticker, state in states.items()} == {
+        'TSLA': 25.0,
+        'AAPL': 40.0,
+        'MSFT': 45.0,
+    }
+    assert states['TSLA']['ticker_info'].pe_ratio == 60.0
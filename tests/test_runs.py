@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import runs
+from src.runs import ActorRunRegistry
+
+
+class FakeRunClient:
+    def __init__(self, client: 'FakeApifyClient', run_id: str) -> None:
+        self.client = client
+        self.run_id = run_id
+
+    async def get(self) -> dict:
+        await asyncio.sleep(0)
+        return {'id': self.run_id, 'status': self.client.statuses[self.run_id], 'defaultDatasetId': 'dataset'}
+
+    async def abort(self) -> dict:
+        await asyncio.sleep(0)
+        self.client.aborted.append(self.run_id)
+        return {}
+
+
+class FakeActorClient:
+    def __init__(self, client: 'FakeApifyClient') -> None:
+        self.client = client
+
+    async def start(self, **_: object) -> dict:
+        await asyncio.sleep(0)
+        run_id = f'run-{len(self.client.statuses)}'
+        self.client.statuses[run_id] = 'RUNNING'
+        return {'id': run_id}
+
+
+class FakeApifyClient:
+    def __init__(self) -> None:
+        self.statuses: dict[str, str] = {}
+        self.aborted: list[str] = []
+
+    def actor(self, _: str) -> FakeActorClient:
+        return FakeActorClient(self)
+
+    def run(self, run_id: str) -> FakeRunClient:
+        return FakeRunClient(self, run_id)
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> FakeApifyClient:
+    fake_client = FakeApifyClient()
+    monkeypatch.setattr(runs, 'Actor', SimpleNamespace(apify_client=fake_client))
+    return fake_client
+
+
+async def test_runs_are_awaited_by_shared_poller(client: FakeApifyClient) -> None:
+    registry = ActorRunRegistry(poll_interval_secs=0.01)
+    first = await registry.start('actor', {})
+    second = await registry.start('actor', {})
+    assert registry.pending_count == 2
+
+    client.statuses[first] = 'SUCCEEDED'
+    client.statuses[second] = 'FAILED'
+    assert (await registry.wait(first))['id'] == first
+    with pytest.raises(RuntimeError, match='FAILED'):
+        await registry.wait(second)
+    assert registry.pending_count == 0
+
+
+async def test_run_is_aborted_on_timeout(client: FakeApifyClient) -> None:
+    registry = ActorRunRegistry(poll_interval_secs=0.01)
+    run_id = await registry.start('actor', {})
+    with pytest.raises(TimeoutError):
+        await registry.wait(run_id, timeout_secs=0.05)
+    assert client.aborted == [run_id]
+    assert registry.pending_count == 0
@@ -0,0 +1,85 @@
+import datetime
+from pathlib import Path
+
+from src.models import TickerDelta, TickerNewsEntry, WatchlistEntry
+from src.runner import TickerRunResult
+from src.scheduler import Watchlist, get_input_watchlist, select_tickers
+from src.storage import LocalDirectoryBackend
+
+NOW = datetime.datetime(2025, 3, 1, 12, tzinfo=datetime.UTC)
+
+
+def hours_ago(hours: float) -> str:
+    return (NOW - datetime.timedelta(hours=hours)).isoformat()
+
+
+def create_news(count: int) -> list[TickerNewsEntry]:
+    return [
+        TickerNewsEntry(title=f'News {i}', provider='Reuters', published_at=NOW.isoformat(), url=f'https://n/{i}')
+        for i in range(count)
+    ]
+
+
+def test_most_stale_and_active_tickers_are_selected_first() -> None:
+    entries = [
+        WatchlistEntry(ticker='AAPL', last_report_at=hours_ago(30)),
+        WatchlistEntry(ticker='TSLA', last_report_at=hours_ago(20), volatility_pct=60.0),
+        WatchlistEntry(ticker='NEW'),
+        # refreshed recently, not due yet
+        WatchlistEntry(ticker='MSFT', last_report_at=hours_ago(1)),
+        # failing repeatedly, backed off
+        WatchlistEntry(ticker='BAD', last_report_at=hours_ago(40), failures=3),
+    ]
+
+    assert select_tickers(entries, now=NOW) == ['NEW', 'TSLA', 'AAPL']
+
+
+def test_failing_new_ticker_is_backed_off() -> None:
+    aapl = WatchlistEntry(ticker='AAPL', last_report_at=hours_ago(72), avg_duration_secs=60.0)
+
+    # the budget fits one ticker, the never reported ticker wins until it keeps failing
+    assert select_tickers([WatchlistEntry(ticker='NEWX', failures=3), aapl], now=NOW, time_budget_secs=60) == ['NEWX']
+    assert select_tickers([WatchlistEntry(ticker='BADX', failures=10), aapl], now=NOW, time_budget_secs=60) == ['AAPL']
+
+
+def test_tickers_not_fitting_into_budget_are_skipped() -> None:
+    entries = [
+        WatchlistEntry(ticker='AAPL', last_report_at=hours_ago(48), avg_duration_secs=100.0, avg_tokens=50_000),
+        WatchlistEntry(ticker='TSLA', last_report_at=hours_ago(40), avg_duration_secs=100.0, avg_tokens=10_000),
+        WatchlistEntry(ticker='AMZN', last_report_at=hours_ago(30), avg_duration_secs=100.0, avg_tokens=10_000),
+        WatchlistEntry(ticker='NVDA', last_report_at=hours_ago(25), avg_duration_secs=100.0, avg_tokens=10_000),
+    ]
+
+    # two slots of 150 s fit one ticker each, the token budget skips AAPL
+    selected = select_tickers(entries, now=NOW, max_concurrency=2, time_budget_secs=150, token_budget=30_000)
+    assert selected == ['TSLA', 'AMZN']
+
+
+async def test_watchlist_records_results(tmp_path: Path) -> None:
+    watchlist = Watchlist(LocalDirectoryBackend(tmp_path))
+    watchlist.sync(get_input_watchlist({'watchlist': ['tsla', {'ticker': 'AAPL', 'priority': 2}]}) or {})
+    watchlist.entries['AAPL'].last_report_at = hours_ago(48)
+    results = [
+        TickerRunResult(ticker='TSLA', total_tokens=1000, duration_secs=50.0, news=create_news(14)),
+        TickerRunResult(
+            ticker='AAPL',
+            total_tokens=500,
+            duration_secs=30.0,
+            delta=TickerDelta(new_news=create_news(6), is_material=True),
+        ),
+        TickerRunResult(ticker='AMZN', error=RuntimeError('not watched')),
+    ]
+    watchlist.record_results(results, NOW)
+    await watchlist.save()
+
+    restored = Watchlist(LocalDirectoryBackend(tmp_path))
+    await restored.load()
+    assert set(restored.entries) == {'TSLA', 'AAPL'}
+    tsla, aapl = restored.entries['TSLA'], restored.entries['AAPL']
+    assert tsla.last_report_at == aapl.last_report_at == NOW.isoformat()
+    assert (tsla.avg_duration_secs, tsla.avg_tokens, tsla.news_velocity) == (50.0, 1000, 2.0)
+    assert (aapl.priority, aapl.news_velocity) == (2.0, 3.0)
+
+    restored.record_results([TickerRunResult(ticker='TSLA', duration_secs=150.0, error=RuntimeError('failed'))], NOW)
+    assert restored.entries['TSLA'].failures == 1
+    assert restored.entries['TSLA'].avg_duration_secs == 80.0
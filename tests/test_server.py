@@ -0,0 +1,66 @@
+from typing import TypedDict
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from langgraph.graph import StateGraph
+
+import src.runner
+from src.checkpoints import PersistentCheckpointSaver
+from src.graph import build_compiled_graph
+from src.models import OutputTickerReport
+from src.server import create_app
+from src.storage import MemoryBackend
+
+
+class TickerState(TypedDict, total=False):
+    messages: list
+    status: str
+    ticker: str
+    report: OutputTickerReport
+
+
+async def test_server_readiness_and_input_validation() -> None:
+    app = create_app(build_compiled_graph())
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get('/')
+        assert response.status == 200
+
+        response = await client.get('/report')
+        assert response.status == 400
+        assert 'ticker' in (await response.json())['error']
+
+
+async def test_request_threads_are_deleted(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def save_report(report: OutputTickerReport, report_key: str) -> None:
+        pass
+
+    monkeypatch.setattr(src.runner, 'save_report', save_report)
+
+    def write_report(state: TickerState) -> TickerState:
+        if state['ticker'] == 'FAIL':
+            msg = 'Scraper failed'
+            raise RuntimeError(msg)
+        return {
+            'status': 'Writing the report',
+            'report': OutputTickerReport(
+                ticker=state['ticker'], sentiment='hold', sentiment_reason='Stable', report='# Report'
+            ),
+        }
+
+    builder = StateGraph(TickerState)
+    builder.add_node(write_report)
+    builder.set_entry_point('write_report')
+    builder.set_finish_point('write_report')
+    backend = MemoryBackend()
+    checkpointer = PersistentCheckpointSaver(backend, flush_interval_secs=0)
+    graph = builder.compile(checkpointer=checkpointer)
+
+    async with TestClient(TestServer(create_app(graph))) as client:
+        response = await client.get('/report', params={'ticker': 'TSLA'})
+        assert 'event: report' in await response.text()
+        response = await client.get('/report', params={'ticker': 'FAIL'})
+        assert 'event: error' in await response.text()
+
+    await checkpointer.flush()
+    assert checkpointer._savers == {}
+    assert backend.values == {}
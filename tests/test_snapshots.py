@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from langgraph.graph import END
+
+from src.agents import supervisor
+from src.models import GoogleTickerInfo, OutputTickerReport, TickerNewsEntry, TickerSnapshot
+from src.snapshots import TickerSnapshotStore, create_ticker_snapshot, diff_ticker_data, get_snapshot_key
+from src.storage import LocalDirectoryBackend, validate_key
+
+
+def create_ticker_info(current_price: float, pe_ratio: float = 50.0) -> GoogleTickerInfo:
+    return GoogleTickerInfo(
+        current_price=current_price, about='EVs', ceo='CEO', founded='2003', pe_ratio=pe_ratio, yerly_financials=[]
+    )
+
+
+def create_news(url: str) -> TickerNewsEntry:
+    return TickerNewsEntry(title=url, provider='news', published_at='2025-01-01', url=url)
+
+
+def create_snapshot() -> TickerSnapshot:
+    report = OutputTickerReport(ticker='TSLA', sentiment='hold', sentiment_reason='reason', report='report')
+    return create_ticker_snapshot(
+        'TSLA',
+        previous=None,
+        ticker_info=create_ticker_info(100.0),
+        news=[create_news('https://a'), create_news('https://b')],
+        analysis='analysis',
+        report=report,
+    )
+
+
+def test_diff_quiet_day_is_not_material() -> None:
+    delta = diff_ticker_data(create_snapshot(), create_ticker_info(100.5), [create_news('https://a')])
+    assert delta.changed_info == {'current_price': 100.5}
+    assert delta.new_news == []
+    assert not delta.is_material
+
+
+def test_diff_material_changes() -> None:
+    snapshot = create_snapshot()
+    news = [create_news('https://a'), create_news('https://c')]
+    assert diff_ticker_data(snapshot, create_ticker_info(100.0), news).new_news == [create_news('https://c')]
+    assert diff_ticker_data(snapshot, create_ticker_info(102.0), []).is_material
+    assert diff_ticker_data(snapshot, create_ticker_info(100.0, pe_ratio=40.0), []).is_material
+    # failed prefetch, the analyst must gather the data itself
+    assert diff_ticker_data(snapshot, None, []).is_material
+
+
+def test_supervisor_reuses_report_without_material_changes() -> None:
+    snapshot = create_snapshot()
+    delta = diff_ticker_data(snapshot, create_ticker_info(100.0), [])
+    command = supervisor({'prefetched': True, 'snapshot': snapshot, 'delta': delta})  # type: ignore[typeddict-item]
+    assert command.goto == END
+    assert command.update is not None
+    assert command.update['report'] == snapshot.report
+
+
+async def test_snapshot_store_roundtrip(tmp_path: Path) -> None:
+    store = TickerSnapshotStore(LocalDirectoryBackend(tmp_path))
+    assert await store.get('TSLA') is None
+
+    snapshot = create_snapshot()
+    await store.set(snapshot)
+    assert await store.get('TSLA') == snapshot
+
+
+async def test_snapshot_keys_of_special_tickers(tmp_path: Path) -> None:
+    assert get_snapshot_key('BRK.B') == 'SNAPSHOT-BRK.B'
+    assert get_snapshot_key('^GSPC') != get_snapshot_key('_GSPC')
+    assert validate_key(get_snapshot_key('^GSPC'))
+
+    store = TickerSnapshotStore(LocalDirectoryBackend(tmp_path))
+    snapshot = create_snapshot().model_copy(update={'ticker': '^GSPC'})
+    await store.set(snapshot)
+    assert await store.get('^GSPC') == snapshot
@@ -0,0 +1,74 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src import symbols
+from src.storage import LocalDirectoryBackend
+from src.symbols import StockIdResolver
+
+
+async def test_resolver_uses_seed_and_persists_searches(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    searched: list[str] = []
+
+    async def search(ticker: str) -> str:  # noqa: RUF029
+        searched.append(ticker)
+        return f'{ticker}:NYSE'
+
+    monkeypatch.setattr(symbols, 'search_google_stock_id', search)
+
+    resolver = StockIdResolver(LocalDirectoryBackend(tmp_path), seed={'TSLA': 'TSLA:NASDAQ'})
+    assert await resolver.resolve_many(['TSLA', 'XYZ', 'ABC']) == {
+        'TSLA': 'TSLA:NASDAQ',
+        'XYZ': 'XYZ:NYSE',
+        'ABC': 'ABC:NYSE',
+    }
+    assert searched == ['XYZ', 'ABC']
+
+    # a new resolver loads the persisted index and does not search again
+    resolver = StockIdResolver(LocalDirectoryBackend(tmp_path), seed={})
+    assert await resolver.resolve('XYZ') == 'XYZ:NYSE'
+    assert searched == ['XYZ', 'ABC']
+
+    await resolver.invalidate('XYZ')
+    assert await resolver.lookup('XYZ') is None
+    assert await resolver.resolve('XYZ') == 'XYZ:NYSE'
+    assert searched == ['XYZ', 'ABC', 'XYZ']
+
+
+async def test_invalidated_seeded_ticker_is_not_restored(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def search(ticker: str) -> str:  # noqa: RUF029
+        return f'{ticker}:NYSE'
+
+    monkeypatch.setattr(symbols, 'search_google_stock_id', search)
+
+    resolver = StockIdResolver(LocalDirectoryBackend(tmp_path), seed={'TSLA': 'TSLA:NASDAQ'})
+    await resolver.invalidate('TSLA')
+
+    # the tombstone overrides the seed in the next run, until the ticker is resolved again
+    resolver = StockIdResolver(LocalDirectoryBackend(tmp_path), seed={'TSLA': 'TSLA:NASDAQ'})
+    assert await resolver.lookup('TSLA') is None
+    assert await resolver.resolve('TSLA') == 'TSLA:NYSE'
+
+    resolver = StockIdResolver(LocalDirectoryBackend(tmp_path), seed={'TSLA': 'TSLA:NASDAQ'})
+    assert await resolver.lookup('TSLA') == 'TSLA:NYSE'
+
+
+async def test_searches_are_limited(monkeypatch: pytest.MonkeyPatch) -> None:
+    running = 0
+    max_running = 0
+
+    async def search(ticker: str) -> str:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return f'{ticker}:NYSE'
+
+    monkeypatch.setattr(symbols, 'search_google_stock_id', search)
+
+    resolver = StockIdResolver(seed={}, max_concurrent_searches=2)
+    tickers = [f'T{index}' for index in range(7)]
+    assert await resolver.resolve_many(tickers) == {ticker: f'{ticker}:NYSE' for ticker in tickers}
+    assert max_running == 2
@@ -0,0 +1,110 @@
+import json
+from types import SimpleNamespace
+from typing import TypedDict
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.graph import StateGraph
+
+import src.telemetry
+from src.telemetry import KeyValueStoreSpanExporter, Span, Telemetry, TelemetrySingleton, record_span_metric
+
+
+class AnalysisState(TypedDict, total=False):
+    ticker: str
+    data: str
+    analysis: str
+
+
+@tool
+async def tool_fetch_data(ticker: str) -> str:  # noqa: RUF029
+    """Tool to fetch the ticker data.
+
+    Args:
+        ticker (str): Ticker symbol.
+
+    Returns:
+        str: Ticker data.
+    """
+    record_span_metric('bytes_downloaded', 100)
+    record_span_metric('bytes_downloaded', 20)
+    return f'{ticker} data'
+
+
+async def test_graph_spans(monkeypatch: pytest.MonkeyPatch) -> None:
+    telemetry = Telemetry([])
+    monkeypatch.setattr(TelemetrySingleton, '_instance', telemetry)
+    model = FakeMessagesListChatModel(
+        responses=[
+            AIMessage(content='bullish', usage_metadata={'input_tokens': 8, 'output_tokens': 2, 'total_tokens': 10})
+        ]
+    )
+
+    async def prefetch(state: AnalysisState) -> AnalysisState:
+        return {'data': await tool_fetch_data.ainvoke({'ticker': state['ticker']})}
+
+    # the node names must differ from the state keys
+    async def analyze(state: AnalysisState) -> AnalysisState:
+        return {'analysis': str((await model.ainvoke(state['data'])).content)}
+
+    builder = StateGraph(AnalysisState)
+    builder.add_node(prefetch)
+    builder.add_node(analyze)
+    builder.set_entry_point('prefetch')
+    builder.add_edge('prefetch', 'analyze')
+    builder.set_finish_point('analyze')
+    graph = builder.compile()
+
+    span = telemetry.start_span('TSLA', 'ticker', trace_id='TSLA')
+    handler = telemetry.create_callback_handler('TSLA', span.span_id)
+    result = await graph.ainvoke({'ticker': 'TSLA'}, {'callbacks': [handler]})
+    assert result == {'ticker': 'TSLA', 'data': 'TSLA data', 'analysis': 'bullish'}
+    telemetry.end_span(span)
+
+    spans = {(span.kind, span.name): span for span in telemetry.spans}
+    assert set(spans) == {
+        ('ticker', 'TSLA'),
+        ('node', 'prefetch'),
+        ('node', 'analyze'),
+        ('tool', 'tool_fetch_data'),
+        ('llm', 'llm'),
+    }
+    assert spans['node', 'prefetch'].parent_id == span.span_id
+    assert spans['tool', 'tool_fetch_data'].parent_id == spans['node', 'prefetch'].span_id
+    assert spans['tool', 'tool_fetch_data'].attributes['bytes_downloaded'] == 120
+    assert spans['llm', 'llm'].parent_id == spans['node', 'analyze'].span_id
+    assert spans['llm', 'llm'].attributes | {'model': None} == {
+        'model': None,
+        'prompt_tokens': 8,
+        'completion_tokens': 2,
+        'cache_hit': False,
+    }
+    # the analyze node waited for the prefetch node
+    assert spans['node', 'analyze'].queue_wait_secs is not None
+    assert all(span.trace_id == 'TSLA' and span.duration_secs is not None for span in telemetry.spans)
+    assert next(iter(telemetry.summary())) == 'ticker:TSLA'
+
+
+async def test_every_export_writes_only_its_spans(monkeypatch: pytest.MonkeyPatch) -> None:
+    records: dict[str, str] = {}
+
+    async def set_value(key: str, value: str, **_: object) -> None:  # noqa: RUF029
+        records[key] = value
+
+    async def open_key_value_store(**_: object) -> SimpleNamespace:  # noqa: RUF029
+        return SimpleNamespace(set_value=set_value)
+
+    monkeypatch.setattr(src.telemetry.Actor, 'open_key_value_store', open_key_value_store)
+    exporter = KeyValueStoreSpanExporter()
+    await exporter.export([Span('TSLA', 'ticker', trace_id='TSLA'), Span('supervisor', 'node', trace_id='TSLA')])
+    await exporter.export([Span('AAPL', 'ticker', trace_id='AAPL')])
+
+    keys = sorted(records)
+    assert len(keys) == 2
+    assert all(key.startswith('telemetry-') and key.endswith('.jsonl') for key in keys)
+    assert [[json.loads(line)['name'] for line in records[key].splitlines()] for key in keys] == [
+        ['TSLA', 'supervisor'],
+        ['AAPL'],
+    ]
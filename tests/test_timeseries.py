@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.compaction import compact_ticker_info
+from src.models import GoogleTickerInfo
+from src.timeseries import TRADING_DAYS_PER_YEAR, PriceSeries, parse_price
+
+
+def test_parse_price() -> None:
+    assert parse_price(12) == pytest.approx(12.0)
+    assert parse_price('$1,234.50') == pytest.approx(1234.5)
+    assert parse_price('n/a') is None
+    assert parse_price(None) is None
+
+
+def test_price_series_stats() -> None:
+    items = [
+        {'date': '2025-01-01', 'price': 100},
+        {'date': '2025-01-02', 'price': '$110'},
+        {'date': '2025-01-03'},
+        {'date': '2025-01-04', 'price': 99},
+        {'date': '2025-01-05', 'price': 121},
+        {'date': '2025-01-06', 'price': 120},
+    ]
+    series = PriceSeries.from_items(items)
+    assert series.times == ('2025-01-01', '2025-01-02', '2025-01-04', '2025-01-05', '2025-01-06')
+    np.testing.assert_allclose(series.moving_average(4), [107.5, 112.5])
+    assert series.max_drawdown() == pytest.approx(-0.1)
+
+    stats = series.stats(periods_per_year=TRADING_DAYS_PER_YEAR)
+    assert stats is not None
+    assert stats.change_pct == pytest.approx(20.0)
+    assert stats.max_drawdown_pct == pytest.approx(-10.0)
+    assert (stats.low, stats.high) == (99, 121)
+    assert stats.moving_averages == {'sma_5': 110.0}
+    assert stats.volatility_pct is not None
+    assert stats.annualized_volatility_pct == pytest.approx(stats.volatility_pct * np.sqrt(252), rel=1e-3)
+
+
+def test_short_series_has_no_stats() -> None:
+    assert PriceSeries.from_items([{'time': '10:00', 'price': 1}]).stats() is None
+    assert PriceSeries.from_items(None).stats() is None
+
+
+def test_compact_ticker_info_includes_price_series() -> None:
+    stats = PriceSeries.from_items([{'time': '9:30', 'price': 100}, {'time': '16:00', 'price': 102}]).stats()
+    ticker_info = GoogleTickerInfo(
+        current_price=102, about='about', ceo='CEO', founded='2003', yerly_financials=[], intraday_prices=stats
+    )
+    compacted = compact_ticker_info(ticker_info)
+    assert 'price_series:\nseries|period|' in compacted
+    assert 'intraday|9:30..16:00|102.0|100.0-102.0|2.0|' in compacted
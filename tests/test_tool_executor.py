@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.prebuilt import ToolNode
+
+from src.tool_executor import (
+    ToolExecutionError,
+    ToolPolicy,
+    report_partial_result,
+    resilient_tool,
+    run_tool,
+)
+
+FAST_POLICY = ToolPolicy(timeout_secs=0.1, max_retries=1, backoff_base_secs=0.0)
+
+
+async def test_retry_after_timeout() -> None:
+    attempts = 0
+
+    @tool
+    async def tool_flaky(query: str) -> str:
+        """Tool that hangs on the first call.
+
+        Args:
+            query (str): Query.
+
+        Returns:
+            str: The query.
+        """
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            await asyncio.sleep(10)
+        return query
+
+    assert await run_tool(tool_flaky, {'query': 'TSLA'}, policy=FAST_POLICY) == 'TSLA'
+    assert attempts == 2
+
+
+async def test_partial_results_on_timeout() -> None:
+    @tool
+    async def tool_slow_news(query: str) -> list[str]:
+        """Tool that hangs after the first news.
+
+        Args:
+            query (str): News search query.
+
+        Returns:
+            list[str]: News, only reported as the partial result.
+        """
+        report_partial_result(f'{query} news')
+        await asyncio.sleep(10)
+        return []
+
+    assert await run_tool(tool_slow_news, {'query': 'TSLA'}, policy=FAST_POLICY) == ['TSLA news']
+
+
+async def test_resilient_tool_returns_error_message() -> None:
+    @tool
+    async def tool_broken(query: str) -> str:  # noqa: RUF029
+        """Tool that always fails.
+
+        Args:
+            query (str): Query.
+
+        Raises:
+            ValueError: Always.
+        """
+        raise ValueError(query)
+
+    with pytest.raises(ToolExecutionError):
+        await run_tool(tool_broken, {'query': 'TSLA'}, policy=FAST_POLICY)
+
+    wrapped_tool = resilient_tool(tool_broken, policy=FAST_POLICY)
+    assert wrapped_tool.name == tool_broken.name
+    assert wrapped_tool.args == tool_broken.args
+    assert 'Do not call this tool again' in await wrapped_tool.ainvoke({'query': 'TSLA'})
+
+
+async def test_tool_calls_run_concurrently() -> None:
+    @tool
+    async def tool_slow(query: str) -> str:
+        """Slow tool.
+
+        Args:
+            query (str): Query.
+
+        Returns:
+            str: The query.
+        """
+        await asyncio.sleep(0.2)
+        return query
+
+    tool_node = ToolNode([resilient_tool(tool_slow, policy=ToolPolicy(timeout_secs=1.0))])
+    tool_calls = [{'name': 'tool_slow', 'args': {'query': str(i)}, 'id': str(i)} for i in range(3)]
+    start = time.perf_counter()
+    result = await tool_node.ainvoke([AIMessage(content='', tool_calls=tool_calls)])
+    assert time.perf_counter() - start < 0.5
+    assert [message.content for message in result] == ['0', '1', '2']
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.transport import AdaptiveRateLimiter, LimitedTransport, parse_reset_duration
+
+
+def test_parse_reset_duration() -> None:
+    assert parse_reset_duration('1s') == 1.0
+    assert parse_reset_duration('6m0s') == 360.0
+    assert parse_reset_duration('20ms') == pytest.approx(0.02)
+    assert parse_reset_duration('1h2m3.5s') == 3723.5
+    with pytest.raises(ValueError, match='Invalid'):
+        parse_reset_duration('soon')
+
+
+async def test_rate_limiter_waits_for_the_quota_reset() -> None:
+    limiter = AdaptiveRateLimiter()
+    headers = httpx.Headers(
+        {
+            'x-ratelimit-remaining-requests': '1',
+            'x-ratelimit-reset-requests': '100ms',
+            'x-ratelimit-remaining-tokens': '1000',
+            'x-ratelimit-reset-tokens': '1s',
+        }
+    )
+    limiter.update(200, headers)
+
+    start = time.monotonic()
+    await limiter.acquire(tokens=100)
+    assert time.monotonic() - start < 0.05
+    # the only remaining request is reserved, the next one waits for the requests quota reset
+    await limiter.acquire(tokens=100)
+    assert time.monotonic() - start >= 0.09
+    assert limiter.stats()['requests'] == 2
+
+
+async def test_rate_limiter_pauses_after_too_many_requests() -> None:
+    limiter = AdaptiveRateLimiter()
+    limiter.update(429, httpx.Headers({'retry-after-ms': '100'}))
+
+    start = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+    assert limiter.stats()['throttled'] == 1
+
+
+async def test_transport_caps_requests_in_flight() -> None:
+    in_flight = max_in_flight = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:  # noqa: ARG001
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={'ok': True})
+
+    transport = LimitedTransport(httpx.MockTransport(handler), max_in_flight=2)
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = await asyncio.gather(*(client.get(f'https://api.test/{i}') for i in range(6)))
+
+    assert all(response.json() == {'ok': True} for response in responses)
+    assert max_in_flight == 2
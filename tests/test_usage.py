@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+import src.usage
+from src.usage import ModelUsageCallbackHandler, SpendLimitReachedError, UsageMeter
+
+
+def create_result(total_tokens: int) -> LLMResult:
+    usage = {'input_tokens': total_tokens - 1, 'output_tokens': 1, 'total_tokens': total_tokens}
+    return LLMResult(generations=[[ChatGeneration(message=AIMessage(content='ok', usage_metadata=usage))]])
+
+
+def call_model(handler: ModelUsageCallbackHandler, model: str, tokens: int) -> None:
+    run_id = uuid.uuid4()
+    handler.on_chat_model_start({}, [], run_id=run_id, invocation_params={'model': model})
+    handler.on_llm_end(create_result(tokens), run_id=run_id)
+
+
+@pytest.fixture
+def charges(monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, int]]:
+    charges: list[tuple[str, int]] = []
+
+    async def charge_for_model_tokens(model_name: str, tokens: int) -> SimpleNamespace:
+        charges.append((model_name, tokens))
+        await asyncio.sleep(0)
+        return SimpleNamespace(event_charge_limit_reached=False)
+
+    monkeypatch.setattr(src.usage, 'charge_for_model_tokens', charge_for_model_tokens)
+    return charges
+
+
+def test_tokens_are_counted_per_model() -> None:
+    handler = ModelUsageCallbackHandler()
+    for model, tokens in [('gpt-4o-mini', 100), ('gpt-4o', 30), ('gpt-4o-mini', 50)]:
+        call_model(handler, model, tokens)
+
+    assert handler.tokens_by_model == {'gpt-4o-mini': 150, 'gpt-4o': 30}
+    assert handler.total_tokens == 180
+
+
+async def test_meter_charges_whole_hundreds_incrementally(charges: list[tuple[str, int]]) -> None:
+    meter = UsageMeter(charge_batch_tokens=200, charge_interval_secs=60)
+    handlers = [ModelUsageCallbackHandler(meter=meter, ticker=ticker) for ticker in ('TSLA', 'AAPL')]
+    for handler in handlers:
+        call_model(handler, 'gpt-4o-mini', 120)
+    call_model(handlers[0], 'gpt-4o', 30)
+    # the full batch is charged without waiting for the interval
+    await asyncio.sleep(0.01)
+    assert charges == [('gpt-4o-mini', 200)]
+
+    await meter.flush(final=True)
+    # the flush scheduled after the interval does not outlive the final flush
+    assert meter._flush_task is not None
+    assert meter._flush_task.done()
+    assert sorted(charges[1:]) == [('gpt-4o', 30), ('gpt-4o-mini', 40)]
+    assert meter.stats()['tokens_by_ticker'] == {'TSLA': 150, 'AAPL': 120}
+    assert meter.charged_tokens == meter.total_tokens == 270
+
+    await meter.flush(final=True)
+    assert len(charges) == 3
+
+
+@pytest.mark.usefixtures('charges')
+async def test_meter_stops_llm_calls_at_the_spend_limit() -> None:
+    meter = UsageMeter(max_total_tokens=1000)
+    handler = ModelUsageCallbackHandler(meter=meter)
+    call_model(handler, 'gpt-4o', 600)
+    call_model(handler, 'gpt-4o', 600)
+
+    with pytest.raises(SpendLimitReachedError):
+        call_model(handler, 'gpt-4o', 600)
+    assert meter.total_tokens == 1200
+    await meter.flush(final=True)
+
+
+async def test_tokens_of_failed_charge_are_charged_by_next_flush(monkeypatch: pytest.MonkeyPatch) -> None:
+    charges: list[tuple[str, int]] = []
+    fail = True
+
+    async def charge_for_model_tokens(model_name: str, tokens: int) -> SimpleNamespace:  # noqa: RUF029
+        if fail:
+            msg = 'Charging failed'
+            raise RuntimeError(msg)
+        charges.append((model_name, tokens))
+        return SimpleNamespace(event_charge_limit_reached=False)
+
+    monkeypatch.setattr(src.usage, 'charge_for_model_tokens', charge_for_model_tokens)
+    meter = UsageMeter(charge_interval_secs=60)
+    call_model(ModelUsageCallbackHandler(meter=meter), 'gpt-4o', 250)
+
+    await meter.flush(final=True)
+    assert meter.charged_tokens == 0
+
+    fail = False
+    await meter.flush(final=True)
+    assert charges == [('gpt-4o', 250)]
+    assert meter.charged_tokens == 250
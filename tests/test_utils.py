@@ -0,0 +1,78 @@
+from contextlib import aclosing
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from apify_client import ApifyClientAsync
+
+import src.utils
+from src.transport import LimitedTransport
+from src.utils import iterate_dataset_items, setup_apify_http_client
+
+
+class FakeDatasetClient:
+    def __init__(self, items: list[dict]) -> None:
+        self.items = items
+        self.requests: list[dict] = []
+
+    async def list_items(
+        self, *, offset: int, limit: int, fields: list[str] | None, omit: list[str] | None
+    ) -> SimpleNamespace:
+        self.requests.append({'offset': offset, 'limit': limit, 'fields': fields, 'omit': omit})
+        items = [
+            {key: value for key, value in item.items() if (fields is None or key in fields) and key not in (omit or [])}
+            for item in self.items[offset : offset + limit]
+        ]
+        return SimpleNamespace(items=items)
+
+
+@pytest.fixture
+def dataset(monkeypatch: pytest.MonkeyPatch) -> FakeDatasetClient:
+    dataset = FakeDatasetClient([{'title': f'News {i}', 'link': f'https://n/{i}', 'image': 'x'} for i in range(7)])
+    monkeypatch.setattr(src.utils, 'Actor', SimpleNamespace(apify_client=SimpleNamespace(dataset=lambda _: dataset)))
+    return dataset
+
+
+async def test_dataset_items_are_paginated_with_projection(dataset: FakeDatasetClient) -> None:
+    items = [item async for item in iterate_dataset_items('dataset', fields=['title'], limit=5, page_size=3)]
+
+    assert items == [{'title': f'News {i}'} for i in range(5)]
+    assert [(request['offset'], request['limit']) for request in dataset.requests] == [(0, 3), (3, 2)]
+    assert dataset.requests[0]['fields'] == ['title']
+
+
+async def test_dataset_iteration_stops_early(dataset: FakeDatasetClient) -> None:
+    items = []
+    async with aclosing(iterate_dataset_items('dataset', omit=['image'], page_size=3)) as dataset_items:
+        async for item in dataset_items:
+            items.append(item)
+            if len(items) == 2:
+                break
+
+    assert items == [{'title': 'News 0', 'link': 'https://n/0'}, {'title': 'News 1', 'link': 'https://n/1'}]
+    # the next page is not requested once the iteration stops
+    assert len(dataset.requests) == 1
+
+    all_items = [item async for item in iterate_dataset_items('dataset', page_size=3)]
+    assert len(all_items) == 7
+    assert [request['offset'] for request in dataset.requests[1:]] == [0, 3, 6]
+
+
+async def test_apify_client_uses_shared_http_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={'data': {'id': 'dataset'}})
+
+    apify_client = ApifyClientAsync(token='test')
+    monkeypatch.setattr(src.utils, 'Actor', SimpleNamespace(apify_client=apify_client))
+    await setup_apify_http_client(max_in_flight=2)
+
+    http_client = apify_client.http_client.httpx_async_client
+    assert isinstance(http_client._transport, LimitedTransport)
+    http_client._transport.transport = httpx.MockTransport(handler)
+    assert await apify_client.dataset('dataset').get() == {'id': 'dataset'}
+    # the headers of the Apify client are kept
+    assert requests[0].headers['Authorization'] == 'Bearer test'
+    await http_client.aclose()